@@ -0,0 +1,90 @@
+"""
+Benchmarks the import of the plugin's entry point, which Stencila waits for before its
+handshake with the plugin. Each run imports the plugin in a fresh interpreter with
+`-X importtime` and reports the median import time and the slowest modules:
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --runs 10 --budget 150
+
+With `--budget`, exits with status 1 when the plugin's own import time (excluding the
+Stencila libraries it is built on) is over the budget, in milliseconds, or when a module
+that should only be loaded on first use (see `DEFERRED_MODULES`) is imported.
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+MODULE = "plugin_python_template.plugin"
+# Modules the plugin should only load once a document needs the RO-Crates.
+DEFERRED_MODULES = ("rocrate", "logic.rocrate_manager", "logic.cache_manager", "stencila_types.shortcuts", "PIL")
+# The libraries the plugin is built on, which every plugin has to import.
+BASE_PREFIX = "stencila_"
+
+
+def import_times(module=MODULE, python=sys.executable) -> list:
+    """
+    Imports `module` in a fresh interpreter, in an empty directory with an empty cache, and
+    returns the `-X importtime` report as `(name, depth, self_us, cumulative_us)` tuples.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, PYTHONPATH=str(SRC_DIR), XDG_CACHE_HOME=directory)
+        result = subprocess.run([python, "-X", "importtime", "-c", f"import {module}"],
+                                cwd=directory, env=env, capture_output=True, text=True, check=True)
+    report = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # the header
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        report.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return report
+
+
+def summarise(report, module=MODULE) -> dict:
+    """Returns the total and own (excluding the Stencila libraries) import time of `module`, in ms."""
+    total = next(cumulative for name, depth, _, cumulative in report if name == module and depth == 0)
+    base = sum(cumulative for name, depth, _, cumulative in report if depth == 1 and name.startswith(BASE_PREFIX))
+    imported = { name for name, *_ in report }
+    return {
+        "total_ms": total / 1000,
+        "own_ms": (total - base) / 1000,
+        "deferred_imported": [name for name in DEFERRED_MODULES if name in imported],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="number of fresh interpreters to import in")
+    parser.add_argument("--top", type=int, default=10, help="number of slowest modules to list")
+    parser.add_argument("--budget", type=float, help="fail when the plugin's own import takes longer (ms)")
+    args = parser.parse_args()
+
+    import_times()  # warm up the file system cache and the bytecode of the dependencies
+    reports = [import_times() for _ in range(args.runs)]
+    summaries = [summarise(report) for report in reports]
+    total = statistics.median(summary["total_ms"] for summary in summaries)
+    own = statistics.median(summary["own_ms"] for summary in summaries)
+    print(f"import {MODULE}: {total:.1f}ms in total, {own:.1f}ms excluding the Stencila libraries "
+          f"(median of {args.runs} runs)")
+
+    print("slowest modules (self time, last run):")
+    for name, _, self_us, cumulative_us in sorted(reports[-1], key=lambda entry: -entry[2])[:args.top]:
+        print(f"  {self_us / 1000:8.1f}ms  {cumulative_us / 1000:8.1f}ms cumulative  {name}")
+
+    deferred = summaries[-1]["deferred_imported"]
+    if deferred:
+        print(f"modules that should be deferred were imported: {', '.join(deferred)}")
+    if args.budget is not None and (own > args.budget or deferred):
+        print(f"over budget: {own:.1f}ms > {args.budget:.1f}ms" if own > args.budget else "over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmarks the JSON codec on synthetic RO-Crate metadata from 1 KB to 500 MB, comparing
+parse and serialise throughput of the standard library and orjson (when installed), and
+the streaming `GraphReader`:
+
+    python benchmarks/bench_json.py
+    python benchmarks/bench_json.py --sizes 1K,1M,50M --min-time 1
+"""
+import io
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from logic import json_codec  # noqa: E402
+from logic.json_codec import GraphReader  # noqa: E402
+
+UNITS = { "K": 1000, "M": 1000 ** 2, "G": 1000 ** 3 }
+
+
+def parse_size(value) -> int:
+    value = value.strip().upper().rstrip("B")
+    if value and value[-1] in UNITS:
+        return int(float(value[:-1]) * UNITS[value[-1]])
+    return int(value)
+
+
+def make_metadata(size) -> dict:
+    """Returns RO-Crate metadata of about `size` bytes (serialised compact), of File entities."""
+    graph = [
+        { "@id": "ro-crate-metadata.json", "@type": "CreativeWork", "about": { "@id": "./" },
+          "conformsTo": { "@id": "https://w3id.org/ro/crate/1.1" } },
+        { "@id": "./", "@type": "Dataset", "name": "Synthetic", "hasPart": [] },
+    ]
+    written, number = 400, 0
+    while written < size:
+        entity = {
+            "@id": f"data/file-{number}.csv", "@type": "File", "name": f"Results {number}",
+            "encodingFormat": "text/csv", "contentSize": number * 37, "dateModified": "2024-05-01T12:00:00Z",
+            "author": { "@id": "https://orcid.org/0000-0002-1825-0097" }, "description": "Measurements, ±0.5 °C",
+        }
+        graph.append(entity)
+        graph[1]["hasPart"].append({ "@id": entity["@id"] })
+        written += 280
+        number += 1
+    return { "@context": "https://w3id.org/ro/crate/1.1/context", "@graph": graph }
+
+
+def throughput(function, size, min_time) -> float:
+    """Runs `function` until `min_time` seconds have passed, returning MB/s over `size` bytes."""
+    runs, start = 0, time.perf_counter()
+    while True:
+        function()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return size * runs / elapsed / UNITS["M"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1K,100K,10M,500M", help="sizes of the metadata, e.g. 1K,1M,500M")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds to repeat each measurement for")
+    args = parser.parse_args()
+
+    backends = ["json"] + (["orjson"] if json_codec.orjson is not None else [])
+    print(f"{'size':>10} {'backend':>8} {'parse MB/s':>11} {'serialise MB/s':>15} {'stream MB/s':>12}")
+    for size in map(parse_size, args.sizes.split(",")):
+        document = make_metadata(size)
+        for backend in backends:
+            json_codec.BACKEND = backend
+            data = json_codec.dumps(document)
+            parse = throughput(lambda: json_codec.loads(data), len(data), args.min_time)
+            serialise = throughput(lambda: json_codec.dumps(document), len(data), args.min_time)
+            stream = (throughput(lambda: sum(1 for _ in GraphReader(io.BytesIO(data))), len(data), args.min_time)
+                      if backend == "json" else None)  # the reader does not depend on the backend
+            print(f"{len(data) / UNITS['M']:>9.3f}M {backend:>8} {parse:>11.1f} {serialise:>15.1f} "
+                  f"{'' if stream is None else f'{stream:.1f}':>12}")
+        del document
+
+
+if __name__ == "__main__":
+    main()
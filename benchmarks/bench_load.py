@@ -0,0 +1,380 @@
+"""
+Load-tests the plugin's kernel over the stdio and http transports.
+
+Starts the plugin (`Plugin(kernels=[EchoKernel])`) in a subprocess in the workspace, then
+fires a weighted mix of concurrent kernel requests at it for a while, optionally while the
+RO-Crate cache is being updated (with the kernel's `update` command, every
+`--update-interval` seconds), and reports the throughput and the p50/p95/p99 latency of
+each kind of request:
+
+    python benchmarks/bench_load.py --workspace path/to/workspace
+    python benchmarks/bench_load.py --transport http --concurrency 32 --duration 30
+    python benchmarks/bench_load.py --mix list=1,get=4,execute=2,health=1 --update-interval 2
+    python benchmarks/bench_load.py --max-p99 health=50 --json results.json
+
+`health` requests do no work in the plugin, so their latency is the time requests wait
+for the event loop: a high `health` p99 means a kernel method blocks the loop. The kernel
+sets up the RO-Crate manager (building the cache on a cold start) when it starts, so the
+start of the kernel and its first listing, and `health` probes sent every
+`--probe-interval` seconds until that listing is answered, are reported separately as the
+`setup` phase. The stdio
+transport serves one request at a time, so its requests are pipelined and queue behind
+each other, the http transport serves them concurrently.
+
+With `--max-p99 kind=ms,...` the script exits with status 1 if a p99 latency is over its
+budget (`setup.kind=ms` for the setup phase, e.g. `setup.health=50`), so it can catch
+latency regressions in CI.
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import secrets
+import argparse
+import statistics
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+KERNEL = "echo-python"
+# The plugin, started as the Stencila plugin runner would.
+LAUNCHER = """
+import asyncio
+from stencila_plugin import Plugin
+from plugin_python_template.plugin import EchoKernel
+
+asyncio.run(Plugin(kernels=[EchoKernel]).run())
+"""
+DEFAULT_MIX = "list=2,get=4,execute=2,health=1"
+OPERATIONS = ("list", "get", "execute", "health")
+
+
+class RPCError(Exception):
+    """Raised when the plugin answers a request with an error."""
+
+
+class StdioClient:
+    """
+    A JSON-RPC client over the plugin's stdin and stdout. Requests are written as soon as
+    they are made and their responses matched by id, so many can be in flight at once.
+    """
+    def __init__(self, process):
+        self.process = process
+        self.next_id = 0
+        self.pending = {}
+        self.reader = asyncio.create_task(self._read())
+        self._write_lock = asyncio.Lock()
+
+    async def _read(self):
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                error = RPCError("The plugin closed its stdout, it possibly crashed.")
+                for future in self.pending.values():
+                    if not future.done():
+                        future.set_exception(error)
+                return
+            if not line.strip():
+                continue
+            response = json.loads(line)
+            future = self.pending.pop(response.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+
+    async def call(self, method, **params):
+        self.next_id += 1
+        request = { "jsonrpc": "2.0", "method": method, "params": params or None, "id": self.next_id }
+        future = asyncio.get_running_loop().create_future()
+        self.pending[self.next_id] = future
+        async with self._write_lock:
+            self.process.stdin.write(json.dumps(request).encode() + b"\n")
+            await self.process.stdin.drain()
+        return result_of(await future)
+
+    async def close(self):
+        self.reader.cancel()
+
+
+class HttpClient:
+    """A JSON-RPC client over the plugin's http transport."""
+    def __init__(self, port, token):
+        import aiohttp
+        self.url = f"http://localhost:{port}"
+        self.headers = { "Authorization": f"Bearer {token}" }
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0))
+        self.next_id = 0
+
+    async def call(self, method, **params):
+        self.next_id += 1
+        request = { "jsonrpc": "2.0", "method": method, "params": params or None, "id": self.next_id }
+        async with self.session.post(self.url, json=request, headers=self.headers) as response:
+            if response.status != 200:
+                raise RPCError(f"HTTP status {response.status}")
+            return result_of(await response.json())
+
+    async def close(self):
+        await self.session.close()
+
+
+def result_of(response):
+    if "error" in response:
+        raise RPCError(response["error"].get("message"))
+    return response["result"]
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def start_plugin(transport, workspace):
+    """Starts the plugin in `workspace`, returning the process and a connected client."""
+    env = dict(os.environ, STENCILA_TRANSPORT=transport,
+               PYTHONPATH=os.pathsep.join(filter(None, [str(SRC_DIR), os.environ.get("PYTHONPATH")])))
+    if transport == "stdio":
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-c", LAUNCHER, cwd=workspace, env=env, limit=2 ** 26,
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+        return process, StdioClient(process)
+
+    port, token = free_port(), secrets.token_hex(16)
+    env.update(STENCILA_PORT=str(port), STENCILA_TOKEN=token)
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-c", LAUNCHER, cwd=workspace, env=env, stderr=asyncio.subprocess.DEVNULL)
+    client = HttpClient(port, token)
+    deadline = time.monotonic() + 30
+    while True:  # wait for the server to listen
+        try:
+            await client.call("health")
+            return process, client
+        except Exception:
+            if process.returncode is not None or time.monotonic() > deadline:
+                await client.close()
+                raise RuntimeError("The plugin did not start its http server.")
+            await asyncio.sleep(0.1)
+
+
+async def stop_plugin(process, client):
+    await client.close()
+    if process.returncode is None:
+        process.terminate()
+        await process.wait()
+
+
+def parse_mix(value) -> dict:
+    """Parses a request mix such as `list=2,get=4`, into weights by operation."""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {name}, expected one of {', '.join(OPERATIONS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def parse_budgets(value) -> dict:
+    """
+    Parses p99 budgets such as `health=50,get=200,setup.health=100` (milliseconds), those
+    prefixed with `setup.` applying to the setup phase.
+    """
+    return { name.strip(): float(budget) for name, _, budget in (part.partition("=") for part in value.split(",")) }
+
+
+def percentile(values, q) -> float | None:
+    """The `q` percentile (0 to 100) of `values`, by the nearest rank."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def summarise(latencies, errors, elapsed) -> dict:
+    """Summarises the latencies (seconds) and errors of each operation, in milliseconds."""
+    summary = {}
+    for name in sorted(set(latencies) | set(errors)):
+        values = latencies.get(name, [])
+        summary[name] = {
+            "requests": len(values),
+            "errors": errors.get(name, 0),
+            "throughput": len(values) / elapsed if elapsed else 0.0,
+            "mean": statistics.fmean(values) * 1000 if values else None,
+            "p50": percentile(values, 50) * 1000 if values else None,
+            "p95": percentile(values, 95) * 1000 if values else None,
+            "p99": percentile(values, 99) * 1000 if values else None,
+            "max": max(values) * 1000 if values else None,
+        }
+    return summary
+
+
+async def timed_call(latencies, errors, kind, call):
+    """Awaits `call()`, recording its latency (or error) under `kind`, and returns its result."""
+    started = time.perf_counter()
+    try:
+        result = await call()
+    except Exception:
+        errors[kind] = errors.get(kind, 0) + 1
+        raise
+    latencies.setdefault(kind, []).append(time.perf_counter() - started)
+    return result
+
+
+async def run_setup(client, args) -> tuple:
+    """
+    Starts the kernel, which sets up the RO-Crate manager, and lists its artifacts (which
+    waits for the setup), while probing `health` every `--probe-interval` seconds. Returns
+    the kernel instance, the listed variables, the setup's duration and its summary.
+    """
+    latencies, errors = { "start": [], "list": [], "health": [] }, {}
+    done = asyncio.Event()
+    probes = []
+
+    async def probe():
+        while not done.is_set():
+            probes.append(asyncio.create_task(timed_call(latencies, errors, "health", lambda: client.call("health"))))
+            try:
+                await asyncio.wait_for(done.wait(), args.probe_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    start = time.perf_counter()
+    prober = asyncio.create_task(probe())
+    try:
+        instance = (await timed_call(latencies, errors, "start",
+                                     lambda: client.call("kernel_start", kernel=KERNEL)))["instance"]
+        variables = await timed_call(latencies, errors, "list", lambda: client.call("kernel_list", instance=instance))
+    except RPCError as error:
+        raise SystemExit(f"The plugin could not list the artifacts of {args.workspace}: {error}")
+    finally:
+        done.set()
+        await prober
+        await asyncio.gather(*probes, return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    return instance, variables, elapsed, summarise(latencies, errors, elapsed)
+
+
+async def run_load(transport, args) -> dict:
+    process, client = await start_plugin(transport, args.workspace)
+    try:
+        instance, variables, setup, setup_operations = await run_setup(client, args)
+        names = args.names or [variable.get("value") for variable in variables if isinstance(variable.get("value"), str)]
+        names = names or ["missing"]
+
+        operations = {
+            "list": lambda: client.call("kernel_list", instance=instance),
+            "get": lambda: client.call("kernel_get", instance=instance, name=random.choice(names)),
+            "execute": lambda: client.call("kernel_execute", instance=instance, code=random.choice(args.code)),
+            "health": lambda: client.call("health"),
+        }
+        kinds, weights = zip(*args.mix.items())
+        latencies = { kind: [] for kind in kinds }
+        errors = {}
+        deadline = time.perf_counter() + args.duration
+        remaining = [args.requests]
+
+        async def worker():
+            while time.perf_counter() < deadline and (args.requests is None or remaining[0] > 0):
+                if args.requests is not None:
+                    remaining[0] -= 1
+                kind = random.choices(kinds, weights)[0]
+                try:
+                    await timed_call(latencies, errors, kind, operations[kind])
+                except Exception:
+                    continue
+
+        async def updater():
+            # Updates go through the kernel, as other requests do, and are timed as `update`.
+            while args.update_interval and time.perf_counter() + args.update_interval < deadline:
+                await asyncio.sleep(args.update_interval)
+                try:
+                    await timed_call(latencies, errors, "update",
+                                     lambda: client.call("kernel_execute", instance=instance, code="update"))
+                except Exception:
+                    pass
+
+        start = time.perf_counter()
+        await asyncio.gather(updater(), *(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+        all_latencies = [value for values in latencies.values() for value in values]
+        return {
+            "transport": transport,
+            "concurrency": args.concurrency,
+            "update_interval": args.update_interval,
+            "setup_seconds": setup,
+            "setup": setup_operations,
+            "elapsed_seconds": elapsed,
+            "variables": len(variables),
+            "operations": summarise(latencies, errors, elapsed),
+            "total": summarise({ "all": all_latencies }, { "all": sum(errors.values()) }, elapsed)["all"],
+        }
+    finally:
+        await stop_plugin(process, client)
+
+
+def format_ms(value) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+
+def print_report(result) -> None:
+    print(f"\n{result['transport']}: {result['concurrency']} concurrent clients for {result['elapsed_seconds']:.1f}s"
+          f" (setup {result['setup_seconds']:.1f}s, {result['variables']} variables"
+          f"{', updating every %gs' % result['update_interval'] if result['update_interval'] else ''})")
+    print(f"{'operation':<13} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    rows = [(f"setup.{name}", row) for name, row in result["setup"].items()]
+    for name, row in rows + list(result["operations"].items()) + [("total", result["total"])]:
+        print(f"{name:<13} {row['requests']:>9} {row['errors']:>7} {row['throughput']:>8.1f} {format_ms(row['p50']):>8}"
+              f" {format_ms(row['p95']):>8} {format_ms(row['p99']):>8} {format_ms(row['max']):>8}")
+
+
+def over_budget(result, budgets) -> list:
+    """Returns the operations whose p99 latency is over its budget."""
+    rows = dict(result["operations"], total=result["total"])
+    rows.update((f"setup.{name}", row) for name, row in result["setup"].items())
+    return [
+        f"{result['transport']} {name} p99 {rows[name]['p99']:.1f}ms > {budget:g}ms"
+        for name, budget in budgets.items()
+        if name in rows and rows[name]["p99"] is not None and rows[name]["p99"] > budget
+    ]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workspace", default=os.getcwd(), help="the directory of RO-Crates to serve (default: the current directory)")
+    parser.add_argument("--transport", choices=("stdio", "http", "both"), default="both")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight at once")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run for")
+    parser.add_argument("--requests", type=int, help="stop after this many requests")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"operation weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--code", action="append", help="code for execute requests (default: a query command)")
+    parser.add_argument("--names", nargs="+", help="variable names for get requests (default: the listed artifacts)")
+    parser.add_argument("--update-interval", type=float, default=0, help="update the cache every this many seconds while loading")
+    parser.add_argument("--probe-interval", type=float, default=0.05, help="seconds between health probes during the setup")
+    parser.add_argument("--max-p99", type=parse_budgets, default={}, help="p99 budgets in ms, e.g. health=50,get=200")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    args.workspace = os.path.abspath(args.workspace)
+    args.code = args.code or ["query limit=10"]
+    random.seed(args.seed)
+
+    results, failures = [], []
+    for transport in (("stdio", "http") if args.transport == "both" else (args.transport,)):
+        result = asyncio.run(run_load(transport, args))
+        print_report(result)
+        results.append(result)
+        failures.extend(over_budget(result, args.max_p99))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    for failure in failures:
+        print(f"over budget: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Benchmarks loading a large tabular artifact into columnar buffers.
+
+Writes a synthetic CSV of the requested size (2 GiB by default), then measures the load
+of its first rows (as `get_variable` does), the first full (parsing) load, and a repeated
+full load, served by the table cache only if the table fits its budget (the plugin's
+default unless `--budget` is given):
+
+    python benchmarks/bench_tabular.py --size 2G
+    python benchmarks/bench_tabular.py --size 200M --keep /tmp/bench.csv
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import resource
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from logic.tabular import TABLE_CACHE_BUDGET, TableCache, load_table  # noqa: E402
+from logic.fingerprint import file_fingerprint  # noqa: E402
+
+UNITS = { "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3 }
+
+
+def parse_size(value) -> int:
+    value = value.strip().upper().rstrip("B")
+    if value and value[-1] in UNITS:
+        return int(float(value[:-1]) * UNITS[value[-1]])
+    return int(value)
+
+
+def write_csv(path, size, seed=0) -> int:
+    """Writes a CSV of about `size` bytes with integer, number and string columns."""
+    generator = random.Random(seed)
+    words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta"]
+    rows = 0
+    with open(path, "w") as f:
+        f.write("id,value,count,label,score\n")
+        written = 0
+        while written < size:
+            lines = []
+            for _ in range(10000):
+                lines.append(f"{rows},{generator.random() * 1000:.6f},{generator.randint(0, 1 << 20)},"
+                             f"{generator.choice(words)},{generator.gauss(0, 1):.4f}\n")
+                rows += 1
+            chunk = "".join(lines)
+            f.write(chunk)
+            written += len(chunk)
+    return rows
+
+
+def peak_rss() -> int:
+    """The peak resident set size of this process, in bytes."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", default="2G", help="size of the synthetic CSV, e.g. 500M or 2G")
+    parser.add_argument("--keep", help="write the CSV here and keep it (it is reused if it exists)")
+    parser.add_argument("--budget", default=str(TABLE_CACHE_BUDGET),
+                        help="memory budget of the table cache, the plugin's by default")
+    parser.add_argument("--preview-rows", type=int, default=1000, help="rows kept by the preview load")
+    args = parser.parse_args()
+
+    directory = None
+    if args.keep:
+        path = args.keep
+    else:
+        directory = tempfile.TemporaryDirectory()
+        path = os.path.join(directory.name, "synthetic.csv")
+
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        rows = write_csv(path, parse_size(args.size))
+        print(f"wrote {rows} rows ({os.path.getsize(path) / UNITS['M']:.0f} MiB) in {time.perf_counter() - start:.1f}s")
+
+    size = os.path.getsize(path)
+    cache = TableCache(parse_size(args.budget))
+
+    # First, as the peak RSS only grows: the preview must not hold the whole table.
+    start = time.perf_counter()
+    preview = load_table(path, max_rows=args.preview_rows)
+    elapsed = time.perf_counter() - start
+    print(f"preview of {preview.kept_rows} of {preview.num_rows} rows in {elapsed:.2f}s, "
+          f"buffers: {preview.nbytes / UNITS['K']:.0f} KiB, peak RSS: {peak_rss() / UNITS['M']:.0f} MiB")
+
+    start = time.perf_counter()
+    table = cache.get_or_load(file_fingerprint(path), lambda: load_table(path))
+    elapsed = time.perf_counter() - start
+    print(f"parsed {table.num_rows} rows x {len(table.columns)} columns in {elapsed:.2f}s "
+          f"({size / UNITS['M'] / elapsed:.1f} MiB/s, {table.num_rows / elapsed:,.0f} rows/s)")
+    print(f"columns: {', '.join(f'{column.name}:{column.type}' for column in table.columns)}")
+    print(f"table buffers: {table.nbytes / UNITS['M']:.0f} MiB, peak RSS: {peak_rss() / UNITS['M']:.0f} MiB")
+
+    start = time.perf_counter()
+    cache.get_or_load(file_fingerprint(path), lambda: load_table(path))
+    label = "cached load" if cache.hits else "repeated load (over the cache budget)"
+    print(f"{label}: {(time.perf_counter() - start) * 1000:.3f}ms, cache: {cache.stats()}")
+
+    if directory is not None:
+        directory.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -14,9 +14,13 @@
 
 from logic.logger import Logger
 from logic.cache_manager import ARTIFACTS_DIR
+from logic.remote_resolver import is_remote
+from logic.content_access import CHUNK_SIZE, shared_registry
 from pathlib import Path
 from enum import Enum
 import os
+import json
+import hashlib
 
 # Logger to help keep a trace of any events that occur.
 logger = Logger(__name__).get_logger()
@@ -34,10 +38,36 @@ class EntityType(Enum):
         return cls.UNKNOWN
 
 
+def as_list(value) -> list:
+    """Returns a JSON-LD property value as a list, as properties may hold one value or many."""
+    if value is None or value == "":
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def reference_id(value) -> str | None:
+    """Returns the `@id` of a JSON-LD reference, which may be an entity, a dict or a plain string."""
+    if hasattr(value, "id"):
+        return value.id
+    if isinstance(value, dict):
+        return value.get("@id")
+    return value if isinstance(value, str) else None
+
+
+def reference_name(value) -> str | None:
+    """Returns the name of a referenced entity, falling back to its `@id` or plain string value."""
+    if hasattr(value, "get") and not isinstance(value, dict):
+        return value.get("name") or reference_id(value)
+    if isinstance(value, dict):
+        return value.get("name") or value.get("@id")
+    return value if isinstance(value, str) else None
+
+
 class Artifact:
-    def __init__(self, rocrate, entity):
+    def __init__(self, rocrate, entity, artifacts_dir=None):
         self.rocrate = rocrate
         self.entity = entity
+        self.artifacts_dir = Path(artifacts_dir) if artifacts_dir is not None else ARTIFACTS_DIR
     
     def __eq__(self, other):
         return self.rocrate == other.rocrate and self.entity == other.entity 
@@ -45,34 +75,118 @@ class Artifact:
     def __hash__(self):
         return hash((self.rocrate, self.entity)) 
     
-    def extract_artifact(self):
+    def extract_artifact(self, remote=None, provenance=None):
+        """
+        Extracts the artifact's information for the cache.
+
+        params:
+            remote: dict | None - the resolved metadata of a remote (web) entity, see
+                `RemoteResolver`. Remote entities are not symbolically linked.
+            provenance: dict | None - the entity's direct "inputs" and "outputs", see
+                `ProvenanceGraph`.
+        """
+        if is_remote(self.entity.id) or self.is_zipped():
+            symbolic_link = None
+        else:
+            symbolic_link = self.create_symlink(self.entity.id, Path.joinpath(self.rocrate.source, self.entity.id))
+
         artifact = {
             "id": self.entity.id if hasattr(self.entity, "id") else "",
-            "name": self.entity.name if hasattr(self.entity, "name") else "",
+            "name": self.entity.name if hasattr(self.entity, "name") else self.entity.get("name", ""),
             "type": self.entity.type if hasattr(self.entity, "type") else "",
             "path": self.rocrate.path if hasattr(self.rocrate, "path") else "",
-            "description": self.entity.description if hasattr(self.entity, "description") else "",
+            "description": self.entity.description if hasattr(self.entity, "description") else self.entity.get("description", ""),
             "pseudonym": self.create_pseudonym(),
             "version": "1.0",
-            # "provenance:": None, TODO: implement provenance
-            "metadata": hash(self.entity.properties),
-            "symbolic_link": self.create_symlink(self.entity.id, Path.joinpath(self.rocrate.source, self.entity.id))
+            "provenance": provenance,
+            "metadata": self.hash_properties(),
+            "symbolic_link": symbolic_link,
+            "encoding_format": self.get_encoding_format(),
+            "author": self.get_authors(),
+            "date": self.get_date(),
+            "size": self.get_size(remote),
+            "parts": self.get_parts(),
         }
+        if is_remote(self.entity.id):
+            artifact["remote"] = remote
+        elif self.is_zipped():
+            # Artifacts inside a zipped RO-Crate are read from the archive on demand.
+            artifact["archive"] = {
+                "path": str(self.rocrate.source),
+                "member": self.rocrate.member_name(self.entity.id),
+            }
         return artifact
+
+    def hash_properties(self) -> str:
+        """
+        Returns the hash of the entity's (JSON-LD) properties. Unlike `hash`, it is the same
+        in every process, so unchanged metadata always has the same hash.
+        """
+        properties = self.entity.properties
+        if callable(properties):
+            properties = properties()
+        if not isinstance(properties, str):
+            properties = json.dumps(properties, sort_keys=True, default=str)
+        return hashlib.sha256(properties.encode()).hexdigest()
+
+    def is_zipped(self) -> bool:
+        """Returns whether the artifact is inside a zipped RO-Crate."""
+        return getattr(self.rocrate, "is_zipped", False) is True
+
+    def get_encoding_format(self) -> list:
+        """Returns the entity's encoding formats (e.g. MIME types) as a list of strings."""
+        return [value for value in map(reference_name, as_list(self.entity.get("encodingFormat"))) if value]
+
+    def get_authors(self) -> list:
+        """Returns the ids, and names where known, of the entity's authors and creators."""
+        authors = []
+        for reference in as_list(self.entity.get("author")) + as_list(self.entity.get("creator")):
+            for value in (reference_id(reference), reference_name(reference)):
+                if value and value not in authors:
+                    authors.append(value)
+        return authors
+
+    def get_date(self) -> str | None:
+        """Returns the most relevant date of the entity, as given in its metadata."""
+        for key in ("dateModified", "dateCreated", "datePublished"):
+            value = self.entity.get(key)
+            if value and isinstance(value, str):
+                return value
+        return None
+
+    def get_parts(self) -> list:
+        """Returns the ids of the entities the artifact (a Dataset) lists in its `hasPart`."""
+        return [value for value in map(reference_id, as_list(self.entity.get("hasPart"))) if value]
+
+    def get_size(self, remote=None) -> int | None:
+        """Returns the size of the artifact in bytes, if it can be found cheaply."""
+        content_size = self.entity.get("contentSize")
+        if isinstance(content_size, int) or (isinstance(content_size, str) and content_size.isdigit()):
+            return int(content_size)
+
+        try:
+            if is_remote(self.entity.id):
+                return (remote or {}).get("content_length")
+            if self.is_zipped():
+                return self.rocrate.size(self.entity.id)
+            path = Path.joinpath(Path(self.rocrate.source), self.entity.id)
+            return path.stat().st_size if path.is_file() else None
+        except (KeyError, OSError, TypeError):
+            return None
     
     def create_symlink(self, id, original_path) -> str | None:
         """
         Creates a symbolic link for the entity from the original path to a symbolic path.
         """
         logger.info(f"Creating symbolic link for entity: {id}")
-        symlink_path = Path.joinpath(ARTIFACTS_DIR, self.create_pseudonym())
+        symlink_path = Path.joinpath(self.artifacts_dir, self.create_pseudonym())
 
         try:
             if os.path.islink(symlink_path):
                 current_target = os.readlink(symlink_path)
-                if current_target == original_path:
+                if current_target == str(original_path):
                     logger.info(f"Symlink already exists and points to the correct target: {symlink_path} -> {original_path}. Skipping re-creation.")
-                    return
+                    return str(symlink_path)
                 else:
                     logger.info(f"Symlink {symlink_path} points to a different target. Removing it.")
                     os.remove(symlink_path)
@@ -132,7 +246,7 @@ class Artifact:
         returns:
             str - the path of the symbolic link or None if the symlink does not exist.
         """
-        symlink_path = ARTIFACTS_DIR.joinpath(pseudonym)
+        symlink_path = self.artifacts_dir.joinpath(pseudonym)
         logger.info(f"Resolving symlink for artifact: {pseudonym}")
         
         try:
@@ -143,3 +257,30 @@ class Artifact:
         except Exception as error:
             logger.error(f"Failed to resolve symlink for artifact {pseudonym}: {error}.")
             return None
+
+    def open_content(self, registry=None):
+        """
+        Opens the artifact's content for zero-copy reads, see `logic.content_access`.
+        
+        params:
+            registry: ContentRegistry - the registry sharing the memory mappings, by
+                default the one shared by every artifact.
+        returns:
+            Content - a handle to close (or use as a context manager) when done reading.
+        """
+        registry = registry if registry is not None else shared_registry
+        if is_remote(self.entity.id):
+            raise ValueError(f"The artifact {self.entity.id} is remote, its content is not available locally.")
+        if self.is_zipped():
+            return registry.open_member(self.rocrate, self.entity.id)
+        return registry.open_file(Path.joinpath(self.rocrate.source, self.entity.id))
+
+    def read(self, offset=0, length=None) -> bytes:
+        """Reads `length` bytes (or up to the end) of the artifact's content from `offset`."""
+        with self.open_content() as content:
+            return bytes(content.read(offset, length))
+
+    def iter_content(self, chunk_size=CHUNK_SIZE, offset=0, length=None):
+        """Yields the artifact's content in chunks, as views of its memory mapping."""
+        with self.open_content() as content:
+            yield from content.iter_chunks(chunk_size, offset, length)
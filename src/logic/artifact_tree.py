@@ -0,0 +1,194 @@
+# Copyright 2024 victoriahendersonn
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A hierarchical view of the artifacts: the workspace holds the RO-Crates, an RO-Crate holds
+its (nested RO-Crates and) top level artifacts, and a Dataset holds its parts.
+
+The parent of an artifact is the Dataset that lists it in its `hasPart`, or otherwise
+the Dataset whose id is the closest prefix of its id (e.g. `results/` for
+`results/table.csv`). Artifacts without either belong to the RO-Crate itself.
+
+The tree is indexed once, when the artifacts are indexed, into a sorted list of children
+per node, so a page of children is found by bisecting the list at the page's cursor: the
+time to list a page depends on the size of the page, not of the RO-Crate.
+
+Nodes are referred to by id: "" for the workspace, the workspace-relative path of an
+RO-Crate, and `<RO-Crate path>#<entity id>` for an artifact.
+"""
+import bisect
+from logic.bundle import relative_path
+from logic.logger import Logger
+
+# Logger to help keep a trace of any events that occur.
+logger = Logger(__name__).get_logger()
+
+
+ROOT = ""
+SEPARATOR = "#"
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+KIND_ORDER = { "crate": 0, "dataset": 1, "file": 2 }  # containers are listed first
+
+
+def as_list(value) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def is_dataset(artifact) -> bool:
+    return "Dataset" in as_list(artifact.get("type"))
+
+
+def node_id(crate, entity_id=None) -> str:
+    return crate if entity_id is None else f"{crate}{SEPARATOR}{entity_id}"
+
+
+def normalise(entity_id) -> str:
+    """Returns the entity id without a leading `./`, as `hasPart` references may have it."""
+    return entity_id[2:] if entity_id.startswith("./") and entity_id != "./" else entity_id
+
+
+def path_parent(entity_id, datasets) -> str | None:
+    """Returns the id of the Dataset in `datasets` whose id is the closest prefix of `entity_id`."""
+    parts = normalise(entity_id).rstrip("/").split("/")[:-1]
+    while parts:
+        candidate = "/".join(parts) + "/"
+        if candidate in datasets:
+            return datasets[candidate]
+        parts.pop()
+    return None
+
+
+class ArtifactTree:
+    def __init__(self):
+        self.nodes = { ROOT: { "id": ROOT, "kind": "workspace", "name": "" } }
+        self.children = { ROOT: [] }  # node id -> sorted (sort key, child id) pairs
+        self.parents = {}  # node id -> parent node id
+
+    def __len__(self):
+        return len(self.nodes) - 1
+
+    @classmethod
+    def from_rocrates(cls, rocrates, directory) -> "ArtifactTree":
+        """
+        Builds the tree for the RO-Crate entries of the cache (see `make_rocrate_info`),
+        whose paths are made relative to the workspace `directory`.
+        """
+        tree = cls()
+        for rocrate in rocrates:
+            tree.add_rocrate(rocrate, directory)
+        for children in tree.children.values():
+            children.sort()
+        logger.info(f"Indexed {len(tree)} nodes of the artifact tree.")
+        return tree
+
+    def add_node(self, node, parent) -> None:
+        self.nodes[node["id"]] = node
+        self.parents[node["id"]] = parent
+        self.children.setdefault(node["id"], [])
+        self.children.setdefault(parent, []).append(
+            ((KIND_ORDER.get(node["kind"], len(KIND_ORDER)), node["name"].lower(), node["id"]), node["id"]))
+
+    def add_rocrate(self, rocrate, directory) -> None:
+        crate = relative_path(rocrate["path"], directory)
+        self.add_node({ "id": crate, "kind": "crate", "name": crate, "path": rocrate["path"], "valid": rocrate["valid"] }, ROOT)
+        for child in rocrate.get("children", []):
+            nested = relative_path(child, directory)
+            self.add_node({ "id": nested, "kind": "crate", "name": relative_path(child, rocrate["path"]), "path": child, "nested": True }, crate)
+
+        artifacts = [artifact for artifact in rocrate.get("artifacts") or [] if normalise(artifact["id"]) != "./"]
+        ids = { normalise(artifact["id"]): artifact["id"] for artifact in artifacts }
+        datasets = { normalise(artifact["id"]).rstrip("/") + "/": artifact["id"] for artifact in artifacts if is_dataset(artifact) }
+
+        # The parent declared by `hasPart` takes precedence over the one implied by the path.
+        declared = {}
+        for artifact in artifacts:
+            for part in as_list(artifact.get("parts")):
+                part = ids.get(normalise(part))
+                if part is not None and part != artifact["id"]:
+                    declared.setdefault(part, artifact["id"])
+
+        for artifact in artifacts:
+            parent = declared.get(artifact["id"]) or path_parent(artifact["id"], datasets)
+            if parent is not None and self.is_ancestor(artifact["id"], parent, declared, datasets):
+                parent = None  # a cycle in `hasPart`, so attach it to the RO-Crate instead
+            self.add_node({
+                "id": node_id(crate, artifact["id"]),
+                "kind": "dataset" if is_dataset(artifact) else "file",
+                "name": normalise(artifact["id"]).rstrip("/").rsplit("/", 1)[-1] or artifact["id"],
+                "entity": artifact["id"],
+                "pseudonym": artifact.get("pseudonym"),
+                "size": artifact.get("size"),
+                "encoding_format": artifact.get("encoding_format"),
+            }, crate if parent is None else node_id(crate, parent))
+
+    @staticmethod
+    def is_ancestor(entity_id, parent, declared, datasets) -> bool:
+        """Returns whether `entity_id` is an ancestor of (or is) `parent`."""
+        seen = set()
+        while parent is not None and parent not in seen:
+            if parent == entity_id:
+                return True
+            seen.add(parent)
+            parent = declared.get(parent) or path_parent(parent, datasets)
+        return False
+
+    def children_page(self, node=ROOT, limit=PAGE_SIZE, cursor=None) -> dict:
+        """
+        Returns one page of the children of `node`, in a stable order (RO-Crates, then
+        Datasets, then files, each by name).
+
+        params:
+            node: str - the id of the node to expand, the workspace by default.
+            limit: int - the size of the page, at most `MAX_PAGE_SIZE`.
+            cursor: str - the `next` cursor of the previous page, to continue after it.
+        returns:
+            dict - the "node", the "children" on the page, the "total" number of children
+                and the "next" cursor, None on the last page.
+        """
+        if node not in self.nodes:
+            raise ValueError(f"No node {node} was found in the artifact tree.")
+        limit = min(max(int(limit), 1), MAX_PAGE_SIZE)
+        children = self.children.get(node, [])
+
+        start = 0
+        if cursor:
+            if cursor not in self.nodes or self.parents.get(cursor) != node:
+                raise ValueError(f"Invalid cursor {cursor} for the node {node}.")
+            start = bisect.bisect_right(children, (self.sort_key(cursor), cursor))
+
+        page = children[start:start + limit]
+        more = start + limit < len(children)
+        return {
+            "node": self.nodes[node],
+            "children": [dict(self.nodes[child], children=len(self.children.get(child, []))) for _, child in page],
+            "total": len(children),
+            "next": page[-1][1] if more and page else None,
+        }
+
+    def sort_key(self, node) -> tuple:
+        node = self.nodes[node]
+        return KIND_ORDER.get(node["kind"], len(KIND_ORDER)), node["name"].lower(), node["id"]
+
+    def path(self, node) -> list:
+        """Returns the ids of the ancestors of `node`, from the workspace down to its parent."""
+        if node not in self.nodes:
+            raise ValueError(f"No node {node} was found in the artifact tree.")
+        ancestors = []
+        while node in self.parents:
+            node = self.parents[node]
+            ancestors.append(node)
+        return ancestors[::-1]
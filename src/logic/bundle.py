@@ -0,0 +1,226 @@
+# Copyright 2024 victoriahendersonn
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Relocatable cache bundles.
+
+The cache (`rocrate_data.json`) stores the paths of RO-Crates relative to the workspace,
+and symbolic links relative to the artifacts directory, so the cache of one checkout can
+be reused by another checkout of the same workspace, e.g. one built by a CI job and
+imported on a workstation.
+
+A bundle is a `.tar.gz` of the cache data, the remote entity metadata and the previews
+(with their thumbnails, whose paths are stored relative to the previews directory),
+with a manifest of the RO-Crates it holds and the hashes of their metadata. On import,
+only the RO-Crates whose metadata matches the local workspace are kept (the others are
+validated again as usual), and their symbolic links are recreated locally.
+"""
+import io
+import os
+import copy
+import time
+import hashlib
+import tarfile
+from pathlib import Path, PurePosixPath
+from logic.cache_manager import FILENAME as DATA_FILENAME
+from logic.remote_resolver import FILENAME as REMOTE_FILENAME, RemoteResolver
+from logic.preview import PREVIEWS_DIRNAME
+from logic.validator import read_metadata
+from logic.file_lock import atomic_write
+from logic import json_codec
+from logic.logger import Logger
+
+# Logger to help keep a trace of any events that occur.
+logger = Logger(__name__).get_logger()
+
+
+BUNDLE_FORMAT = 1
+MANIFEST_FILENAME = "manifest.json"
+RELATIVE_PATHS = "relative"  # the value of "paths" in cache data holding relative paths
+
+
+def relative_path(path, root) -> str:
+    return PurePosixPath(Path(os.path.relpath(path, root))).as_posix()
+
+
+def absolute_path(path, root) -> str:
+    return os.path.normpath(os.path.join(root, path))
+
+
+def relocate(data, workspace, artifacts_dir, to_relative) -> dict:
+    """
+    Returns a copy of the cache `data` with its paths made relative to (or absolute from)
+    the `workspace` and the `artifacts_dir`. Data already in the requested form is
+    returned unchanged.
+    """
+    if (data.get("paths") == RELATIVE_PATHS) == to_relative:
+        return data
+    convert = relative_path if to_relative else absolute_path
+    data = copy.deepcopy(data)
+
+    for rocrate in data.get("rocrates", []):
+        rocrate["path"] = convert(rocrate["path"], workspace)
+        rocrate["children"] = [convert(child, workspace) for child in rocrate.get("children", [])]
+        for artifact in rocrate.get("artifacts") or []:
+            if artifact.get("symbolic_link"):
+                artifact["symbolic_link"] = convert(artifact["symbolic_link"], artifacts_dir)
+            if artifact.get("archive"):
+                artifact["archive"]["path"] = convert(artifact["archive"]["path"], workspace)
+
+    if to_relative:
+        data["paths"] = RELATIVE_PATHS
+    else:
+        data.pop("paths", None)
+    return data
+
+
+def relocate_preview(data, previews_dir, to_relative) -> bytes:
+    """
+    Returns the stored preview `data` with the path of its thumbnail made relative to (or
+    absolute from) the `previews_dir`. Unreadable data is returned unchanged.
+    """
+    try:
+        preview = json_codec.loads(data)
+    except ValueError:
+        return data
+    if not isinstance(preview, dict) or not preview.get("thumbnail"):
+        return data
+    convert = relative_path if to_relative else absolute_path
+    return json_codec.dumps(dict(preview, thumbnail=convert(preview["thumbnail"], previews_dir)))
+
+
+def metadata_hash(rocrate_path) -> str | None:
+    """Returns the hash of the RO-Crate's metadata, as `ROCratesManager.hash_metadata` does."""
+    try:
+        return hashlib.sha256(read_metadata(rocrate_path)).hexdigest()
+    except (OSError, ValueError):
+        return None
+
+
+def read_cache_data(cache_manager) -> dict:
+    """Returns the cache data of the workspace in its relative (relocatable) form."""
+    data = cache_manager.load_data_from_json()
+    return relocate(data, cache_manager.workspace, cache_manager.artifacts_dir, to_relative=True)
+
+
+def add_bytes(archive, name, data) -> None:
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    archive.addfile(info, io.BytesIO(data))
+
+
+def export_bundle(cache_manager, output) -> dict:
+    """
+    Packs the workspace's cache into the bundle `output` (a `.tar.gz`).
+
+    returns:
+        dict - the bundle's manifest.
+    """
+    data = read_cache_data(cache_manager)
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "version": data.get("version"),
+        "rocrates": [
+            { "path": rocrate["path"], "metadata": rocrate["metadata"], "valid": rocrate["valid"] }
+            for rocrate in data.get("rocrates", [])
+        ],
+    }
+
+    with cache_manager.data_lock(shared=True), tarfile.open(output, "w:gz") as archive:
+        add_bytes(archive, MANIFEST_FILENAME, json_codec.dumps(manifest, indent=True))
+        add_bytes(archive, DATA_FILENAME, json_codec.dumps(data))
+        remote = Path(cache_manager.data_dir) / REMOTE_FILENAME
+        if remote.exists():
+            archive.add(remote, REMOTE_FILENAME)
+        previews = Path(cache_manager.data_dir) / PREVIEWS_DIRNAME
+        if previews.is_dir():
+            for path in sorted(previews.rglob("*")):
+                name = f"{PREVIEWS_DIRNAME}/{path.relative_to(previews).as_posix()}"
+                if path.is_file() and path.suffix == ".json":
+                    add_bytes(archive, name, relocate_preview(path.read_bytes(), previews, to_relative=True))
+                elif path.is_file():
+                    archive.add(path, name)
+
+    logger.info(f"Exported the cache of {len(manifest['rocrates'])} RO-Crates to {output}.")
+    return manifest
+
+
+def safe_member(member) -> bool:
+    """Returns whether a bundle member is a regular file that extracts inside the cache."""
+    path = PurePosixPath(member.name)
+    return member.isfile() and not path.is_absolute() and ".." not in path.parts
+
+
+def import_bundle(cache_manager, bundle) -> dict:
+    """
+    Imports a bundle made by `export_bundle` into the workspace's cache. RO-Crates whose
+    metadata differs from the local workspace's (or that are missing from it) are left out.
+
+    returns:
+        dict - the paths of the RO-Crates that were "imported" and those that were "stale".
+    """
+    workspace = cache_manager.workspace
+    with tarfile.open(bundle, "r:gz") as archive:
+        members = { member.name: member for member in archive.getmembers() if safe_member(member) }
+        if MANIFEST_FILENAME not in members or DATA_FILENAME not in members:
+            raise ValueError(f"{bundle} is not a cache bundle, it has no {MANIFEST_FILENAME} or {DATA_FILENAME}.")
+        manifest = json_codec.load(archive.extractfile(members[MANIFEST_FILENAME]))
+        if manifest.get("format") != BUNDLE_FORMAT:
+            raise ValueError(f"Unsupported cache bundle format {manifest.get('format')}.")
+        data = json_codec.load(archive.extractfile(members[DATA_FILENAME]))
+
+        imported, stale, rocrates = [], [], []
+        for rocrate in data.get("rocrates", []):
+            local_path = absolute_path(rocrate["path"], workspace)
+            if rocrate["metadata"] is not None and metadata_hash(local_path) == rocrate["metadata"]:
+                rocrates.append(rocrate)
+                imported.append(rocrate["path"])
+            else:
+                stale.append(rocrate["path"])
+        data["rocrates"] = rocrates
+
+        with cache_manager.build_lock():
+            for rocrate in rocrates:
+                link_artifacts(rocrate, workspace, cache_manager.artifacts_dir)
+            cache_manager.save_data_to_json(data)
+
+            if REMOTE_FILENAME in members:
+                entries = json_codec.load(archive.extractfile(members[REMOTE_FILENAME]))
+                RemoteResolver(cache_manager.data_dir).save_cache(entries)
+
+            previews = os.path.join(cache_manager.data_dir, PREVIEWS_DIRNAME)
+            for name, member in members.items():
+                if name.startswith(PREVIEWS_DIRNAME + "/"):
+                    data = archive.extractfile(member).read()
+                    if name.endswith(".json"):
+                        data = relocate_preview(data, previews, to_relative=False)
+                    atomic_write(os.path.join(cache_manager.data_dir, name), data)
+
+    logger.info(f"Imported the cache of {len(imported)} RO-Crates from {bundle}, {len(stale)} were stale.")
+    return { "imported": imported, "stale": stale }
+
+
+def link_artifacts(rocrate, workspace, artifacts_dir) -> None:
+    """Recreates the symbolic links of an imported RO-Crate's artifacts to the local files."""
+    for artifact in rocrate.get("artifacts") or []:
+        if not artifact.get("symbolic_link"):
+            continue
+        link = absolute_path(artifact["symbolic_link"], artifacts_dir)
+        target = os.path.join(absolute_path(rocrate["path"], workspace), artifact["id"])
+        if os.path.lexists(link):
+            os.remove(link)
+        os.makedirs(os.path.dirname(link), exist_ok=True)
+        os.symlink(target, link)
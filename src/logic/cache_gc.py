@@ -0,0 +1,272 @@
+# Copyright 2024 victoriahendersonn
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Garbage collection and integrity checks (fsck) of a workspace's cache.
+
+The cache can drift from the workspace and from itself: RO-Crates are deleted or moved,
+files are removed from under their symbolic links, and links are left behind by artifacts
+that are no longer extracted. `check` finds:
+
+    - "missing_crate": an entry of `rocrate_data.json` whose RO-Crate no longer exists.
+    - "moved_crate": a missing RO-Crate whose metadata is now found at another path.
+    - "dangling_link": a symbolic link whose target no longer exists.
+    - "orphaned_link": a link (or file) in the artifacts directory no artifact refers to.
+    - "missing_link": an artifact whose symbolic link is missing but whose file exists.
+
+`CacheCollector.run` repairs them incrementally: each run stops once its time budget is
+spent and the next run carries on from there. Stale entries are removed from the cache
+(an RO-Crate at its new path is picked up by the next update), dangling and orphaned links
+are removed and missing links are recreated. The collector only runs while no process is
+building the cache, which it never waits for.
+"""
+import os
+import time
+import threading
+from logic.cache_manager import directory_size
+from logic.bundle import metadata_hash, relocate
+from logic.metrics import registry as metrics
+from logic.logger import Logger
+
+# Logger to help keep a trace of any events that occur.
+logger = Logger(__name__).get_logger()
+
+
+GC_BUDGET = 0.5  # seconds spent repairing per run
+GC_INTERVAL = 1.0  # seconds between the runs of a background collection
+
+MISSING_CRATE = "missing_crate"
+MOVED_CRATE = "moved_crate"
+DANGLING_LINK = "dangling_link"
+ORPHANED_LINK = "orphaned_link"
+MISSING_LINK = "missing_link"
+
+REPAIRS = metrics.counter("rocrate_cache_repairs_total", "Issues of the cache repaired, by kind.", ("kind",))
+
+
+def load_data(cache_manager) -> dict | None:
+    """Returns the cache data of the workspace with absolute paths, or None if there is none."""
+    try:
+        data = cache_manager.load_data_from_json()
+    except FileNotFoundError:
+        return None
+    return relocate(data, cache_manager.workspace or "", cache_manager.artifacts_dir, to_relative=False)
+
+
+def crate_issues(data, paths=None) -> list:
+    """
+    Finds the entries of the cache `data` whose RO-Crate is missing. Those whose metadata
+    is found at one of the workspace's current RO-Crate `paths` (not already cached) are
+    reported as moved there.
+    """
+    rocrates = data.get("rocrates", []) if data else []
+    missing = [rocrate for rocrate in rocrates if not os.path.exists(rocrate["path"])]
+    if not missing:
+        return []
+
+    cached = { rocrate["path"] for rocrate in rocrates }
+    candidates = {}
+    for path in paths or []:
+        if str(path) not in cached:
+            candidates.setdefault(metadata_hash(path), str(path))
+
+    issues = []
+    for rocrate in missing:
+        moved_to = candidates.get(rocrate["metadata"]) if rocrate["metadata"] else None
+        if moved_to:
+            issues.append({ "kind": MOVED_CRATE, "path": rocrate["path"], "to": moved_to })
+        else:
+            issues.append({ "kind": MISSING_CRATE, "path": rocrate["path"] })
+    return issues
+
+
+def linked_artifacts(data) -> dict:
+    """Returns the link name of each artifact with a symbolic link, mapped to its link and target."""
+    links = {}
+    for rocrate in data.get("rocrates", []) if data else []:
+        for artifact in rocrate.get("artifacts") or []:
+            if artifact.get("symbolic_link"):
+                link = artifact["symbolic_link"]
+                links[os.path.basename(link)] = (link, os.path.join(rocrate["path"], artifact["id"]))
+    return links
+
+
+def link_issues(artifacts_dir, links, after=None):
+    """
+    Yields the issues of the entries of `artifacts_dir` (in name order, starting after the
+    name `after`), and then those of the artifacts whose link is missing.
+    """
+    try:
+        names = sorted(os.listdir(artifacts_dir))
+    except FileNotFoundError:
+        names = []
+    present = set(names)
+
+    for name in names:
+        if after is not None and name <= after:
+            continue
+        path = os.path.join(artifacts_dir, name)
+        if name not in links:
+            yield { "kind": ORPHANED_LINK, "path": path, "name": name }
+        elif os.path.islink(path) and not os.path.exists(path):
+            yield { "kind": DANGLING_LINK, "path": path, "name": name, "target": os.readlink(path) }
+
+    for name, (link, target) in sorted(links.items()):
+        if name not in present and os.path.exists(target):
+            yield { "kind": MISSING_LINK, "path": link, "name": name, "target": target }
+
+
+def check(cache_manager, paths=None) -> list:
+    """Finds every issue of the workspace's cache (see the module's docstring), without repairing any."""
+    data = load_data(cache_manager)
+    issues = crate_issues(data, paths)
+    if data is not None:
+        issues.extend(link_issues(cache_manager.artifacts_dir, linked_artifacts(data)))
+    return issues
+
+
+def disk_usage(cache_manager) -> dict:
+    """
+    Reports the disk usage of each workspace's namespace in the cache, refreshing the sizes
+    recorded in the workspace index (which the eviction of namespaces relies on).
+
+    returns:
+        dict - the "workspaces" (id, directory, size, last used, and whether the workspace
+            directory still exists), largest first, and their "total" size in bytes.
+    """
+    sizes = {}
+
+    def update(workspaces):
+        for workspace_id, entry in workspaces.items():
+            sizes[workspace_id] = directory_size(cache_manager.namespace_dir(workspace_id))
+            entry["size"] = sizes[workspace_id]
+
+    cache_manager._update_workspaces(update)
+    workspaces = [
+        {
+            "id": workspace_id,
+            "directory": entry.get("directory"),
+            "size": sizes.get(workspace_id, entry.get("size", 0)),
+            "last_used": entry.get("last_used"),
+            "exists": bool(entry.get("directory")) and os.path.isdir(entry["directory"]),
+            "current": workspace_id == cache_manager.workspace_id,
+        }
+        for workspace_id, entry in cache_manager.load_workspaces().items()
+    ]
+    workspaces.sort(key=lambda workspace: -workspace["size"])
+    return { "workspaces": workspaces, "total": sum(workspace["size"] for workspace in workspaces) }
+
+
+class CacheCollector:
+    """
+    Repairs the cache of a workspace incrementally, within a time budget per run.
+
+    params:
+        cache_manager: CacheManager - the cache of the workspace.
+        budget: float - the seconds a run may spend repairing.
+    """
+    def __init__(self, cache_manager, budget=GC_BUDGET):
+        self.cache_manager = cache_manager
+        self.budget = budget
+        self.cursor = None  # the name of the last entry of the artifacts directory checked
+        self.thread = None
+        self._lock = threading.Lock()
+
+    def run(self, paths=None, budget=None) -> dict | None:
+        """
+        Repairs the issues of the cache until they are all repaired or the time `budget`
+        (by default the collector's) is spent. Returns None without doing anything while
+        another process is building the cache.
+
+        params:
+            paths: list - the workspace's current RO-Crate paths, to tell moved RO-Crates.
+        returns:
+            dict - the "repaired" issues, the number of "errors" and whether any issues may
+                be "remaining" for the next run.
+        """
+        deadline = time.monotonic() + (self.budget if budget is None else budget)
+        lock = self.cache_manager.build_lock()
+        if not lock.try_acquire():
+            logger.info("The cache is being built, deferring its garbage collection.")
+            return None
+
+        repaired, errors = [], 0
+        try:
+            data = load_data(self.cache_manager)
+            if data is None:
+                return { "repaired": [], "errors": 0, "remaining": False }
+
+            issues = crate_issues(data, paths)
+            if issues:
+                stale = { issue["path"] for issue in issues }
+                data["rocrates"] = [rocrate for rocrate in data["rocrates"] if rocrate["path"] not in stale]
+                self.cache_manager.save_data_to_json(relocate(
+                    data, self.cache_manager.workspace or "", self.cache_manager.artifacts_dir, to_relative=True))
+                repaired.extend(issues)
+                logger.info(f"Removed {len(issues)} stale RO-Crates from the cache.")
+
+            for issue in link_issues(self.cache_manager.artifacts_dir, linked_artifacts(data), self.cursor):
+                if time.monotonic() >= deadline:
+                    return { "repaired": repaired, "errors": errors, "remaining": True }
+                try:
+                    self.repair_link(issue)
+                    repaired.append(issue)
+                except OSError as error:
+                    errors += 1
+                    logger.warning(f"Error: {error}, encountered when repairing the {issue['kind']} {issue['path']}.")
+                if issue["kind"] != MISSING_LINK:
+                    self.cursor = issue["name"]
+
+            self.cursor = None
+            return { "repaired": repaired, "errors": errors, "remaining": False }
+        finally:
+            lock.release()
+            for issue in repaired:
+                REPAIRS.inc(kind=issue["kind"])
+            if repaired:
+                logger.info(f"Repaired {len(repaired)} issues of the cache.")
+
+    def repair_link(self, issue) -> None:
+        if issue["kind"] in (DANGLING_LINK, ORPHANED_LINK):
+            if os.path.isdir(issue["path"]) and not os.path.islink(issue["path"]):
+                raise IsADirectoryError(f"{issue['path']} is a directory.")
+            os.remove(issue["path"])
+        elif issue["kind"] == MISSING_LINK:
+            os.symlink(issue["target"], issue["path"])
+
+    def collect(self, paths=None, interval=GC_INTERVAL, on_repair=None) -> None:
+        """
+        Runs until the cache has no issues left, sleeping `interval` seconds between runs
+        so that other processes can take the build lock. `on_repair(report)` is called
+        after each run that repaired something.
+        """
+        while True:
+            report = self.run(paths)
+            if report is None:
+                return  # being built, the builder starts a collection once it is done
+            if report["repaired"] and on_repair is not None:
+                on_repair(report)
+            if not report["remaining"]:
+                return
+            time.sleep(interval)
+
+    def start(self, paths=None, on_repair=None) -> threading.Thread:
+        """Starts `collect` in a background thread, unless a collection is already running."""
+        with self._lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.collect, kwargs={ "paths": paths, "on_repair": on_repair },
+                    name="rocrate-cache-gc", daemon=True)
+                self.thread.start()
+            return self.thread
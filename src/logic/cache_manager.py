@@ -1,9 +1,14 @@
 import os
 import platformdirs
-import json
+import time
+import shutil
+import hashlib
 
-from pathlib import Path 
+from pathlib import Path
 from logic.logger import Logger
+from logic.file_lock import FileLock, atomic_write
+from logic import json_codec
+from logic.metrics import registry as metrics
 
 # Logger to help keep a trace of any events that occur.
 logger = Logger(__name__).get_logger()
@@ -14,62 +19,241 @@ USER_CACHE_DIR = Path(platformdirs.user_cache_dir())
 ROCRATE_DATA_DIR = Path.joinpath(USER_CACHE_DIR, "rocrate-cache")
 ARTIFACTS_DIR = Path.joinpath(USER_CACHE_DIR, "rocrate-cache/artifacts")
 FILENAME = "rocrate_data.json"
+DATA_LOCK_FILENAME = "rocrate_data.json.lock"  # guards reads and writes of FILENAME
+BUILD_LOCK_FILENAME = "build.lock"  # held by the process (re)building the cache
+INUSE_LOCK_FILENAME = "inuse.lock"  # held (shared) by every process using a workspace's cache
+
+# Each workspace (the directory a ROCratesManager scans) gets its own namespace in the cache,
+# so switching between projects does not overwrite another project's cache.
+WORKSPACES_DIRNAME = "workspaces"
+WORKSPACES_INDEX_FILENAME = "workspaces.json"
+WORKSPACES_LOCK_FILENAME = "workspaces.json.lock"
+CACHE_SIZE_BUDGET = 512 * 1024 * 1024  # bytes, across all workspace namespaces
+MAX_WORKSPACES = 32
+
+CACHE_IO_SECONDS = metrics.histogram(
+    "rocrate_cache_io_seconds", "Time spent reading or writing rocrate_data.json.", ("operation",))
+CACHE_BYTES = metrics.gauge("rocrate_cache_bytes", "Bytes used by the cache of the workspace.")
+EVICTIONS = metrics.counter("rocrate_cache_evictions_total", "Workspace namespaces evicted from the cache.")
+
+
+def workspace_id(directory) -> str:
+    """Returns a stable identifier for the workspace rooted at `directory`."""
+    resolved = str(Path(directory).resolve())
+    return hashlib.sha256(resolved.encode("utf-8")).hexdigest()[:16]
+
+
+def directory_size(path) -> int:
+    """Returns the number of bytes used by `path`, without following symbolic links."""
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                continue
+    return total
 
 
 class CacheManager():
-    def __init__(self):
-        # Set up the directories for the cache.
-        if not os.path.exists(ROCRATE_DATA_DIR):
-            os.makedirs(ROCRATE_DATA_DIR)
-            os.makedirs(ARTIFACTS_DIR)
+    def __init__(self, directory=None, size_budget=CACHE_SIZE_BUDGET, max_workspaces=MAX_WORKSPACES):
+        """
+        params:
+            directory: str | None - the workspace the cache is for. When given, the cache is
+                namespaced by workspace and least recently used namespaces are evicted to stay
+                within `size_budget` and `max_workspaces`.
+        """
+        self.size_budget = size_budget
+        self.max_workspaces = max_workspaces
+        self.workspace = str(Path(directory).resolve()) if directory is not None else None
+        self.inuse_lock = None
+
+        if self.workspace is None:
+            self.workspace_id = None
+            self.data_dir = ROCRATE_DATA_DIR
+            self.artifacts_dir = ARTIFACTS_DIR
         else:
-            self.clear_cache()
-    
+            self.workspace_id = workspace_id(self.workspace)
+            self.data_dir = self.namespace_dir(self.workspace_id)
+            self.artifacts_dir = self.data_dir / "artifacts"
+
+        # Set up the directories for the cache. The cache is shared between plugin
+        # instances, so it is never cleared here, only by whoever holds the build lock.
+        if self.workspace_id is not None:
+            self.inuse_lock = self.hold_namespace()
+        os.makedirs(self.data_dir, exist_ok=True)
+        os.makedirs(self.artifacts_dir, exist_ok=True)
+
+        if self.workspace_id is not None:
+            self.touch_workspace()
+            self.evict_workspaces()
+
+    @staticmethod
+    def namespace_dir(workspace_id) -> Path:
+        """Returns the directory of the cache namespace of the workspace with `workspace_id`."""
+        return ROCRATE_DATA_DIR / WORKSPACES_DIRNAME / workspace_id
+
+    def hold_namespace(self) -> FileLock | None:
+        """
+        Takes a shared lock on the workspace's namespace, held until `close`, so no other
+        process evicts the namespace while this one reads its cache or follows its links
+        (see `evict_workspaces`). Returns None where shared locks are not supported.
+        """
+        while True:
+            lock = FileLock(self.data_dir / INUSE_LOCK_FILENAME, shared=True)
+            if not lock.supports_shared:
+                return None
+            lock.acquire()
+            # The namespace may have been evicted while waiting, the lock is then taken again
+            # in the recreated namespace.
+            if lock.is_current():
+                return lock
+            lock.release()
+
+    def close(self) -> None:
+        """Releases the namespace, which can then be evicted by other processes."""
+        if self.inuse_lock is not None:
+            self.inuse_lock.release()
+            self.inuse_lock = None
+
+    def __del__(self):
+        self.close()
+
+    def build_lock(self, timeout=None) -> FileLock:
+        """
+        Returns the lock that must be held while building or updating the cache.
+
+        A second process that wants to build the cache waits on this lock and can then
+        reuse what the first process built instead of redoing the work.
+        """
+        return FileLock(self.data_dir / BUILD_LOCK_FILENAME, timeout=timeout)
+
+    def data_lock(self, shared=False, timeout=None) -> FileLock:
+        """Returns the lock guarding `rocrate_data.json`, shared for readers."""
+        return FileLock(self.data_dir / DATA_LOCK_FILENAME, shared=shared, timeout=timeout)
+
+    def load_workspaces(self) -> dict:
+        """Returns the index of workspace namespaces, keyed by workspace id."""
+        index_path = ROCRATE_DATA_DIR / WORKSPACES_INDEX_FILENAME
+        try:
+            with open(index_path, "rb") as f:
+                return json_codec.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as error:
+            logger.error(f"Error: {error}, encountered when loading {WORKSPACES_INDEX_FILENAME}.")
+            return {}
+
+    def _update_workspaces(self, update) -> None:
+        """Applies `update` to the workspace index under its lock and saves it atomically."""
+        with FileLock(ROCRATE_DATA_DIR / WORKSPACES_LOCK_FILENAME):
+            workspaces = self.load_workspaces()
+            update(workspaces)
+            atomic_write(ROCRATE_DATA_DIR / WORKSPACES_INDEX_FILENAME, json_codec.dumps(workspaces))
+
+    def touch_workspace(self, size=None) -> None:
+        """Records that this workspace has just been used, and optionally its size in bytes."""
+        def update(workspaces):
+            entry = workspaces.setdefault(self.workspace_id, { "size": 0 })
+            entry["directory"] = self.workspace
+            entry["last_used"] = time.time()
+            if size is not None:
+                entry["size"] = size
+        self._update_workspaces(update)
+
+    def evict_workspaces(self) -> list:
+        """
+        Removes the least recently used workspace namespaces until the cache is within its
+        size budget and workspace limit. The current workspace and any workspace that another
+        process is using (see `hold_namespace`) or building are never evicted. Returns the
+        evicted workspace ids.
+        """
+        evicted = []
+
+        def update(workspaces):
+            total = sum(entry.get("size", 0) for entry in workspaces.values())
+            by_age = sorted(workspaces.items(), key=lambda item: item[1].get("last_used", 0))
+
+            for candidate, entry in by_age:
+                if total <= self.size_budget and len(workspaces) <= self.max_workspaces:
+                    break
+                if candidate == self.workspace_id:
+                    continue
+
+                namespace = self.namespace_dir(candidate)
+                locks = [FileLock(namespace / INUSE_LOCK_FILENAME), FileLock(namespace / BUILD_LOCK_FILENAME)]
+                try:
+                    if namespace.exists() and not all(lock.try_acquire() for lock in locks):
+                        logger.info(f"Workspace cache {candidate} is in use, not evicting it.")
+                        continue
+                    logger.info(f"Evicting the cache for workspace {entry.get('directory')}.")
+                    shutil.rmtree(namespace, ignore_errors=True)
+                finally:
+                    for lock in locks:
+                        lock.release()
+
+                total -= entry.get("size", 0)
+                del workspaces[candidate]
+                evicted.append(candidate)
+                EVICTIONS.inc()
+
+        self._update_workspaces(update)
+        return evicted
+
     def clear_cache(self):
+        """
+        Removes every symbolic link from the artifacts directory. The RO-Crate manager no
+        longer clears the cache on (re)builds, it repairs it with `logic.cache_gc` instead.
+        """
         logger.info("Clearing the cache of any previous symbolic links.")
         try:
-            artifacts = os.listdir(ARTIFACTS_DIR)
+            artifacts = os.listdir(self.artifacts_dir)
             for artifact in artifacts:
-                artifact_path = os.path.join(ARTIFACTS_DIR, artifact)
+                artifact_path = os.path.join(self.artifacts_dir, artifact)
                 if os.path.islink(artifact_path):
                     os.unlink(artifact_path)
             logger.info("Cache cleared successfully.")
         except OSError:
             logger.error("Error occured when clearing the cache.")
-    
+
     def save_cache(self, artifact):
         pass
-    
+
     def load_cache(self):
-        if not os.path.exists(ARTIFACTS_DIR):
+        if not os.path.exists(self.artifacts_dir):
             logger.error(f"Error: Artifacts cache has not been set up, there are no artifacts to load.")
             return []
         try:
-            return os.listdir(ARTIFACTS_DIR)
+            return os.listdir(self.artifacts_dir)
         except Exception as error:
             logger.error(f"Error: {error}, encountered when loading the cache.")
             return []
-    
+
     def save_data_to_json(self, data) -> None:
         logger.info(f"Saving data to {FILENAME}.")
-        file_path = ROCRATE_DATA_DIR / FILENAME
+        file_path = self.data_dir / FILENAME
 
         try:
-            with open(file_path, "w") as f:
-                json.dump(data, f, indent=4)
+            with CACHE_IO_SECONDS.time(operation="save"), self.data_lock():
+                # Written compact, the cache is read far more often than it is looked at.
+                atomic_write(file_path, json_codec.dumps(data))
                 logger.info(f"Successfully saved data to {FILENAME}.")
+            if self.workspace_id is not None:
+                size = directory_size(self.data_dir)
+                CACHE_BYTES.set(size)
+                self.touch_workspace(size=size)
         except Exception as error:
             logger.error(f"Error: {error}, encountered when saving data to JSON file.")
 
     def load_data_from_json(self):
-        file_path = ROCRATE_DATA_DIR / FILENAME
+        file_path = self.data_dir / FILENAME
         if not file_path.exists():
             raise FileNotFoundError(f"{file_path} does not exist.")
 
         try:
             logger.info(f"Loading data from {FILENAME}.")
-            with open(file_path, "r") as f:
-                return json.load(f)
+            with CACHE_IO_SECONDS.time(operation="load"), self.data_lock(shared=True), open(file_path, "rb") as f:
+                return json_codec.load(f)
         except Exception as error:
             logger.error(f"Error: {error}, encountered when loading {FILENAME} from the cache.")
             return { "version": "0", "rocrates": [] }
@@ -78,6 +262,6 @@ class CacheManager():
         logger.info(f"Printing RO-Crate data from the cache.")
         try:
             data = self.load_data_from_json()
-            print(json.dumps(data, indent=4))
+            print(json_codec.dumps(data, indent=True).decode())
         except Exception as error:
             logger.error(f"Error: {error}, encountered when printing data from the cache.")
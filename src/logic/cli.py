@@ -0,0 +1,153 @@
+# Copyright 2024 victoriahendersonn
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A command line interface for building and moving the RO-Crate cache without running the
+plugin, e.g. to warm the cache in a CI job and import it on a workstation:
+
+    rocrate-cache warm --directory path/to/workspace --offline
+    rocrate-cache export cache.tar.gz --directory path/to/workspace
+    rocrate-cache import cache.tar.gz --directory path/to/other/checkout
+    rocrate-cache stats --directory path/to/other/checkout
+    rocrate-cache fsck --repair --directory path/to/workspace
+    rocrate-cache du
+"""
+import os
+import sys
+import json
+import argparse
+from logic.cache_manager import CacheManager, directory_size
+from logic.bundle import export_bundle, import_bundle
+from logic.cache_gc import CacheCollector, check, disk_usage
+from logic.logger import Logger
+
+# Logger to help keep a trace of any events that occur.
+logger = Logger(__name__).get_logger()
+
+
+def summary(rocrates) -> dict:
+    """Counts the RO-Crates and artifacts of the cache's RO-Crate entries."""
+    return {
+        "rocrates": len(rocrates),
+        "valid": sum(1 for rocrate in rocrates if rocrate["valid"]),
+        "invalid": sum(1 for rocrate in rocrates if not rocrate["valid"]),
+        "artifacts": sum(len(rocrate.get("artifacts") or []) for rocrate in rocrates),
+    }
+
+
+def warm(args) -> dict:
+    """Builds the cache of the workspace, validating and extracting every RO-Crate."""
+    from logic.rocrate_manager import ROCratesManager
+    manager = ROCratesManager(args.directory, offline=args.offline or None)
+    manager.close_archives()
+    return summary(manager.load_cache_data()["rocrates"])
+
+
+def update(args) -> dict:
+    """Brings the cache of the workspace up to date with its RO-Crates."""
+    from logic.rocrate_manager import ROCratesManager
+    manager = ROCratesManager(args.directory, offline=args.offline or None)
+    manager.update()
+    manager.close_archives()
+    return summary(manager.load_cache_data()["rocrates"])
+
+
+def stats(args) -> dict:
+    """Describes the cache of the workspace, without validating anything."""
+    cache_manager = CacheManager(args.directory)
+    try:
+        data = cache_manager.load_data_from_json()
+    except FileNotFoundError:
+        data = { "version": None, "rocrates": [] }
+    return dict(
+        summary(data["rocrates"]),
+        workspace=cache_manager.workspace,
+        workspace_id=cache_manager.workspace_id,
+        cache_dir=str(cache_manager.data_dir),
+        version=data.get("version"),
+        size=directory_size(cache_manager.data_dir),
+        workspaces=len(cache_manager.load_workspaces()),
+    )
+
+
+def fsck(args) -> dict:
+    """Checks the integrity of the cache of the workspace, repairing it with `--repair`."""
+    from logic.scanner import scan_crates
+    cache_manager = CacheManager(args.directory)
+    paths = list(scan_crates(args.directory, include_zipped=True))
+    issues = check(cache_manager, paths)
+    result = { "issues": issues }
+    if args.repair and issues:
+        report = CacheCollector(cache_manager).run(paths, budget=args.budget)
+        if report is None:
+            raise RuntimeError("the cache is being built, try again once it is done")
+        result.update(repaired=len(report["repaired"]), errors=report["errors"], remaining=report["remaining"])
+    return result
+
+
+def du(args) -> dict:
+    """Reports the disk usage of the cache of each workspace."""
+    return disk_usage(CacheManager(args.directory))
+
+
+def export(args) -> dict:
+    """Packs the cache of the workspace into a bundle."""
+    manifest = export_bundle(CacheManager(args.directory), args.bundle)
+    return { "bundle": os.path.abspath(args.bundle), "rocrates": len(manifest["rocrates"]) }
+
+
+def import_(args) -> dict:
+    """Imports a bundle into the cache of the workspace."""
+    result = import_bundle(CacheManager(args.directory), args.bundle)
+    return { "imported": len(result["imported"]), "stale": result["stale"] }
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="rocrate-cache", description="Build and move the RO-Crate cache.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_command(name, function, description):
+        command = commands.add_parser(name, help=description)
+        command.add_argument("--directory", "-d", default=os.getcwd(), help="the workspace (default: the current directory)")
+        command.set_defaults(function=function)
+        return command
+
+    for name, function, description in (("warm", warm, "build the cache"), ("update", update, "update the cache")):
+        add_command(name, function, description).add_argument(
+            "--offline", action="store_true", help="do not resolve remote (web) entities")
+    add_command("stats", stats, "describe the cache")
+    command = add_command("fsck", fsck, "check (and repair) the integrity of the cache")
+    command.add_argument("--repair", action="store_true", help="repair the issues found")
+    command.add_argument("--budget", type=float, default=float("inf"), help="seconds to spend repairing (default: no limit)")
+    add_command("du", du, "report the disk usage of the cache of each workspace")
+    add_command("export", export, "pack the cache into a bundle").add_argument("bundle", help="the bundle to write (.tar.gz)")
+    add_command("import", import_, "import a bundle into the cache").add_argument("bundle", help="the bundle to read")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = make_parser().parse_args(argv)
+    args.directory = os.path.abspath(args.directory)
+    try:
+        result = args.function(args)
+    except Exception as error:
+        logger.error(f"Error: {error}, encountered when running the {args.command} command.")
+        print(f"rocrate-cache {args.command}: {error}", file=sys.stderr)
+        return 1
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
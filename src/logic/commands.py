@@ -0,0 +1,133 @@
+# Copyright 2024 victoriahendersonn
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The commands that document authors can run through the kernel's `execute`/`evaluate`.
+
+A command is a line of the form `name arg ... key=value ...`, e.g.
+
+    query type=File encoding_format=text/csv text="survey responses"
+
+Quoting follows shell rules. Positional arguments and `key=value` options are passed to
+the registered function as strings, options under the name of the function's parameter
+where a command's keyword differs from it (see `Commands.register`).
+"""
+import shlex
+import inspect
+from logic.logger import Logger
+
+# Logger to help keep a trace of any events that occur.
+logger = Logger(__name__).get_logger()
+
+
+class CommandError(ValueError):
+    """Raised when a command cannot be parsed or its arguments are invalid."""
+
+
+def parse_bool(value) -> bool:
+    """Parses a boolean command option, e.g. `transitive=false`."""
+    if isinstance(value, bool):
+        return value
+    if str(value).lower() in ("1", "true", "yes", "on"):
+        return True
+    if str(value).lower() in ("0", "false", "no", "off"):
+        return False
+    raise CommandError(f"Expected true or false, got {value}.")
+
+
+class Commands:
+    def __init__(self):
+        self.commands = {}  # command functions, keyed by name
+        self.resolvers = {}  # functions returning the command functions registered lazily, keyed by name
+        self.keywords = {}  # parameter names of the options whose keyword differs, keyed by command name
+
+    def __contains__(self, name):
+        return name in self.commands or name in self.resolvers
+
+    def register(self, name, function, keywords=None) -> None:
+        """
+        Registers `function` as the command `name`. `keywords` maps the command's option
+        keywords to the function's parameter names where they differ, e.g. `{"type":
+        "entity_type"}` for a parameter named so as not to shadow a builtin.
+        """
+        self.commands[name] = function
+        self.keywords[name] = dict(keywords or {})
+
+    def register_lazy(self, name, resolve, keywords=None) -> None:
+        """
+        Registers a command whose function is only looked up, by calling `resolve()`, when
+        the command is first run, e.g. a method of an object that is expensive to create.
+        `keywords` is as for `register`.
+        """
+        self.resolvers[name] = resolve
+        self.keywords[name] = dict(keywords or {})
+
+    def function(self, name):
+        """Returns the function of the command `name`, resolving it if it was registered lazily."""
+        function = self.commands.get(name)
+        if function is None:
+            function = self.commands.setdefault(name, self.resolvers[name]())
+        return function
+
+    def names(self) -> list:
+        return sorted(set(self.commands) | set(self.resolvers))
+
+    def is_command(self, code) -> bool:
+        """Returns whether `code` starts with the name of a registered command."""
+        words = code.split(maxsplit=1) if isinstance(code, str) else []
+        return bool(words) and words[0] in self
+
+    def parse(self, code):
+        """
+        Parses `code` into `(name, args, kwargs)`, or returns None when it is not one of
+        the registered commands.
+        """
+        try:
+            tokens = shlex.split(code.strip())
+        except ValueError as error:
+            if code.strip().split(" ", 1)[0] in self:
+                raise CommandError(f"Could not parse the command: {error}.") from error
+            return None
+        if not tokens or tokens[0] not in self:
+            return None
+
+        args, kwargs = [], {}
+        for token in tokens[1:]:
+            key, separator, value = token.partition("=")
+            if separator and key.isidentifier():
+                kwargs[key] = value
+            else:
+                args.append(token)
+        return tokens[0], args, kwargs
+
+    def run(self, code):
+        """Runs the command in `code`, raising `CommandError` if it is not a known command."""
+        parsed = self.parse(code)
+        if parsed is None:
+            raise CommandError(f"Unknown command, the available commands are: {', '.join(self.names())}.")
+
+        name, args, kwargs = parsed
+        keywords = self.keywords.get(name, {})
+        if any(keyword in kwargs for keyword in keywords.values() if keyword not in keywords):
+            # Only the command's own keyword is accepted, e.g. `type=` rather than `entity_type=`.
+            raise CommandError(f"Invalid arguments for {name}: use {', '.join(sorted(keywords))}.")
+        kwargs = { keywords.get(key, key): value for key, value in kwargs.items() }
+        function = self.function(name)
+        try:
+            inspect.signature(function).bind(*args, **kwargs)
+        except TypeError as error:
+            raise CommandError(f"Invalid arguments for {name}: {error}.") from error
+
+        logger.info(f"Running the kernel command: {name}.")
+        return function(*args, **kwargs)
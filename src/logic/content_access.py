@@ -0,0 +1,196 @@
+# Copyright 2024 victoriahendersonn
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Zero-copy access to the content of artifacts.
+
+Files are memory-mapped and read through `memoryview`s, so byte ranges and chunks of a
+large artifact are handed out without copying it into Python memory. Mappings are shared:
+the `ContentRegistry` keeps one mapping per file (per version of the file), reference
+counted by the open `Content` handles, so concurrent kernel requests for the same artifact
+use the same mapping. A mapping is closed once its last handle is closed and every view of
+it has been released.
+
+Artifacts stored uncompressed in a zipped RO-Crate are mapped in place in the archive,
+compressed ones are streamed from the archive.
+"""
+import mmap
+import threading
+from logic.fingerprint import stat_signature
+from logic.logger import Logger
+
+# Logger to help keep a trace of any events that occur.
+logger = Logger(__name__).get_logger()
+
+
+CHUNK_SIZE = 1024 * 1024  # bytes per chunk when iterating over content
+
+
+def clamp_range(size, offset=0, length=None) -> tuple:
+    """Returns the `(start, end)` of a byte range, clamped to the content's `size`."""
+    if offset < 0 or (length is not None and length < 0):
+        raise ValueError("The offset and length of a byte range cannot be negative.")
+    end = size if length is None else min(size, offset + length)
+    return min(offset, end), end
+
+
+class Content:
+    """An open handle on the memory-mapped content of an artifact."""
+
+    def __init__(self, registry, key, view):
+        self.registry = registry
+        self.key = key
+        self._view = view
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def size(self) -> int:
+        return len(self._view)
+
+    def read(self, offset=0, length=None) -> memoryview:
+        """Returns a zero-copy view of `length` bytes (or up to the end) from `offset`."""
+        if self.closed:
+            raise ValueError("The content has been closed.")
+        start, end = clamp_range(self.size, offset, length)
+        return self._view[start:end]
+
+    def iter_chunks(self, chunk_size=CHUNK_SIZE, offset=0, length=None):
+        """Yields zero-copy views of consecutive chunks of the byte range."""
+        start, end = clamp_range(self.size, offset, length)
+        for position in range(start, end, chunk_size):
+            yield self.read(position, min(chunk_size, end - position))
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self._view.release()
+            self.registry.release(self.key)
+
+
+class StreamedContent:
+    """An open handle on an artifact compressed in a zipped RO-Crate, read by streaming."""
+
+    def __init__(self, crate, entity_id):
+        self.crate = crate
+        self.entity_id = entity_id
+        self.size = crate.size(entity_id)
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def read(self, offset=0, length=None) -> bytes:
+        if self.closed:
+            raise ValueError("The content has been closed.")
+        start, end = clamp_range(self.size, offset, length)
+        return self.crate.read(self.entity_id, start, end - start)
+
+    def iter_chunks(self, chunk_size=CHUNK_SIZE, offset=0, length=None):
+        start, end = clamp_range(self.size, offset, length)
+        with self.crate.open(self.entity_id) as member:
+            member.seek(start)
+            while start < end:
+                chunk = member.read(min(chunk_size, end - start))
+                if not chunk:
+                    break
+                start += len(chunk)
+                yield chunk
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class ContentRegistry:
+    """Shares reference counted memory mappings of files between `Content` handles."""
+
+    def __init__(self):
+        self.mappings = {}  # stat signature -> [mmap, number of open handles]
+        self.released = []  # mappings without handles whose views are still in use
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.mappings)
+
+    def open_file(self, path) -> Content:
+        """Opens the content of the file at `path`."""
+        return self._open(stat_signature(path), path, 0, None)
+
+    def open_member(self, crate, entity_id):
+        """Opens the content of the artifact `entity_id` in the (open) `ZipCrate` `crate`."""
+        span = crate.data_span(entity_id)
+        if span is None:
+            return StreamedContent(crate, entity_id)
+        return self._open(stat_signature(crate.source), crate.source, *span)
+
+    def _open(self, key, path, offset, size) -> Content:
+        with self._lock:
+            self._close_released()
+            entry = self.mappings.get(key)
+            if entry is None:
+                with open(path, "rb") as f:
+                    try:
+                        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    except ValueError:
+                        # Empty files cannot be mapped, there is nothing to share.
+                        return Content(self, None, memoryview(b""))
+                entry = self.mappings[key] = [mapping, 0]
+            entry[1] += 1
+            mapping = entry[0]
+        end = len(mapping) if size is None else offset + size
+        return Content(self, key, memoryview(mapping)[offset:end])
+
+    def release(self, key) -> None:
+        """Releases a handle on the mapping for `key`, closing it when it was the last one."""
+        if key is None:
+            return
+        with self._lock:
+            entry = self.mappings.get(key)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self.mappings[key]
+                self.released.append(entry[0])
+            self._close_released()
+
+    def _close_released(self) -> None:
+        still_in_use = []
+        for mapping in self.released:
+            try:
+                mapping.close()
+            except BufferError:
+                still_in_use.append(mapping)
+        self.released = still_in_use
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mappings": len(self.mappings),
+                "handles": sum(handles for _, handles in self.mappings.values()),
+                "bytes": sum(len(mapping) for mapping, _ in self.mappings.values()),
+                "released_in_use": len(self.released),
+            }
+
+
+# The registry shared by every artifact, so all requests for a file share its mapping.
+shared_registry = ContentRegistry()
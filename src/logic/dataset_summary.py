@@ -0,0 +1,221 @@
+# Copyright 2024 victoriahendersonn
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Summaries of the content of Dataset (directory) artifacts: their total size, number of
+files and directories, newest modification time and a histogram of the files' media types.
+
+Directories are scanned in parallel with `os.scandir`, one directory per task. The result
+of each directory's scan is cached on disk with the directory's mtime, so a summary is
+brought up to date by checking the mtime of each directory and only rescanning those that
+changed (an entry was added, removed or renamed in them). Files rewritten in place do not
+change their directory's mtime, `refresh=True` rescans every directory.
+
+Artifacts inside a zipped RO-Crate are summarised from the archive's central directory.
+"""
+import os
+import time
+import calendar
+import mimetypes
+import threading
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from logic import json_codec
+from logic.file_lock import FileLock, atomic_write
+from logic.logger import Logger
+
+# Logger to help keep a trace of any events that occur.
+logger = Logger(__name__).get_logger()
+
+
+FILENAME = "dataset_summaries.json"
+LOCK_FILENAME = "dataset_summaries.json.lock"
+WORKERS = 8  # directories scanned at once
+UNKNOWN_TYPE = "application/octet-stream"
+
+
+def media_type(name) -> str:
+    return mimetypes.guess_type(name)[0] or UNKNOWN_TYPE
+
+
+def scan_directory(path) -> dict:
+    """
+    Scans one directory, without descending into its subdirectories. Symbolic links are
+    not followed, so a link cannot make the walk loop.
+
+    returns:
+        dict - the directory's "mtime" (ns), the "bytes", "files", "newest" mtime (ns) and
+            "types" (media type -> count) of the files directly in it, and the names of its
+            "directories".
+    """
+    record = { "mtime": os.stat(path).st_mtime_ns, "bytes": 0, "files": 0, "newest": 0, "types": {}, "directories": [] }
+    types = Counter()
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    record["directories"].append(entry.name)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    record["bytes"] += stat.st_size
+                    record["files"] += 1
+                    record["newest"] = max(record["newest"], stat.st_mtime_ns)
+                    types[media_type(entry.name)] += 1
+            except OSError:
+                continue  # e.g. removed while scanning
+    record["types"] = dict(types)
+    return record
+
+
+def make_summary(size=0, files=0, directories=0, newest=0, types=None) -> dict:
+    """Returns a summary, with the newest mtime (ns) as an ISO 8601 date and the types by count."""
+    types = types or {}
+    return {
+        "bytes": size,
+        "files": files,
+        "directories": directories,
+        "newest_modified": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(newest / 1e9)) if newest else None,
+        "types": dict(sorted(types.items(), key=lambda item: (-item[1], item[0]))),
+    }
+
+
+def summarise_members(infos, prefix="") -> dict:
+    """
+    Summarises the members (`zipfile.ZipInfo`) of a zipped RO-Crate under the directory
+    `prefix`, e.g. those of `ZipCrate.members`.
+    """
+    size = files = newest = 0
+    directories, types = set(), Counter()
+    for info in infos:
+        name = info.filename[len(prefix):].strip("/")
+        parent = os.path.dirname(name)
+        # Archives may or may not have entries for their directories, so they are also
+        # taken from the paths of the files.
+        while parent:
+            directories.add(parent)
+            parent = os.path.dirname(parent)
+        if info.is_dir():
+            if name:
+                directories.add(name)
+            continue
+        size += info.file_size
+        files += 1
+        types[media_type(name)] += 1
+        newest = max(newest, calendar.timegm(info.date_time) * 1_000_000_000)
+    return make_summary(size, files, len(directories), newest, types)
+
+
+class DatasetSummaries:
+    """
+    Summarises directories, caching the scan of each directory on disk (in `cache_dir`)
+    for incremental updates.
+    """
+    def __init__(self, cache_dir, workers=WORKERS):
+        self.cache_dir = Path(cache_dir)
+        self.workers = workers
+        self.records = None  # the scan of each directory, keyed by path, loaded on first use
+        self._lock = threading.Lock()
+
+    def load_cache(self) -> dict:
+        try:
+            with FileLock(self.cache_dir / LOCK_FILENAME, shared=True), open(self.cache_dir / FILENAME, "rb") as f:
+                return json_codec.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as error:
+            logger.error(f"Error: {error}, encountered when loading {FILENAME}.")
+            return {}
+
+    def save_cache(self, records) -> None:
+        try:
+            with FileLock(self.cache_dir / LOCK_FILENAME):
+                atomic_write(self.cache_dir / FILENAME, json_codec.dumps(records))
+        except Exception as error:
+            logger.error(f"Error: {error}, encountered when saving {FILENAME}.")
+
+    def summarise(self, path, refresh=False) -> dict:
+        """
+        Returns the summary of the directory at `path`, rescanning only the directories that
+        changed since it was last summarised (all of them with `refresh`).
+        """
+        root = os.path.realpath(path)
+        if not os.path.isdir(root):
+            raise ValueError(f"{path} is not a directory.")
+
+        with self._lock:
+            if self.records is None:
+                self.records = self.load_cache()
+            scanned = self.update(root, refresh)
+            if scanned:
+                logger.info(f"Rescanned {scanned} directories of {root}.")
+                self.save_cache(self.records)
+            return self.aggregate(root)
+
+    def update(self, root, refresh=False) -> int:
+        """
+        Brings the cached scans of the directories under `root` up to date, scanning the
+        directories in parallel. Returns the number of directories that were rescanned or
+        forgotten (as they no longer exist).
+        """
+        def visit(path):
+            cached = self.records.get(path)
+            try:
+                if not refresh and cached is not None and cached["mtime"] == os.stat(path).st_mtime_ns:
+                    return path, cached, False
+                return path, scan_directory(path), True
+            except OSError as error:
+                logger.warning(f"Could not scan {path}: {error}")
+                return path, None, False
+
+        fresh, scanned = {}, 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = { pool.submit(visit, root) }
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, record, was_scanned = future.result()
+                    if record is None:
+                        continue
+                    fresh[path] = record
+                    scanned += was_scanned
+                    for name in record["directories"]:
+                        pending.add(pool.submit(visit, os.path.join(path, name)))
+
+        # Forget the directories under `root` that no longer exist.
+        prefix = root.rstrip(os.sep) + os.sep
+        for path in [path for path in self.records if path == root or path.startswith(prefix)]:
+            if path not in fresh:
+                del self.records[path]
+                scanned += 1
+        self.records.update(fresh)
+        return scanned
+
+    def aggregate(self, root) -> dict:
+        """Adds up the cached scans of `root` and every directory under it."""
+        size = files = directories = newest = 0
+        types = Counter()
+        pending = [root]
+        while pending:
+            path = pending.pop()
+            record = self.records.get(path)
+            if record is None:
+                continue
+            size += record["bytes"]
+            files += record["files"]
+            newest = max(newest, record["newest"])
+            types.update(record["types"])
+            directories += len(record["directories"])
+            pending.extend(os.path.join(path, name) for name in record["directories"])
+        return make_summary(size, files, directories, newest, types)
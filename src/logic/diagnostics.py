@@ -0,0 +1,157 @@
+# Copyright 2024 victoriahendersonn
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Structured diagnostics from the rocrate-validator's reports, so users can be told why an
+RO-Crate is invalid.
+
+Each issue is recorded as a dict:
+
+    {
+        "severity": "REQUIRED" | "RECOMMENDED" | "OPTIONAL",
+        "profile": the identifier of the profile, e.g. "ro-crate-1.1",
+        "requirement": the name of the requirement that was not met,
+        "check": the identifier of the failed check, e.g. "ro-crate-1.1_5.1",
+        "focus_node": the `@id` of the offending entity, or None,
+        "message": the explanation of the issue,
+    }
+
+The validator's JSON report (`--output-format json`) is parsed when it is available,
+otherwise the issues are recovered from its text report.
+"""
+import re
+from logic import json_codec
+from logic.logger import Logger
+
+# Logger to help keep a trace of any events that occur.
+logger = Logger(__name__).get_logger()
+
+
+STRUCTURE_PROFILE = "ro-crate-structure"  # the profile of the issues found by `check_structure`
+VALIDATOR_PROFILE = "rocrate-validator"  # the profile of the issues with running the validator itself
+MAX_MESSAGE_LENGTH = 2000
+
+# Text report patterns, e.g. "[Profile: ro-crate-1.1]", "[REQUIRED] Root Data Entity",
+# "[ro-crate-1.1_5.1]: Root Data Entity type: ..." and "[Violating entity: ./] ...".
+PROFILE_PATTERN = re.compile(r"\[\s*Profile:\s*([^\]]+?)\s*\]", re.IGNORECASE)
+SEVERITY_PATTERN = re.compile(r"\[(REQUIRED|RECOMMENDED|OPTIONAL)\]\s*(.*)")
+CHECK_PATTERN = re.compile(r"\[([\w.-]+_[\d.]+)\]:?\s*(.*)")
+ISSUE_PATTERN = re.compile(r"-\s*(?:\[Violating entity:\s*([^\]]*?)\s*\])?\s*(.+)")
+ANSI_PATTERN = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+BOX_CHARACTERS = "│╭╮╰╯─├└┌┐┘┤┬┴┼ "
+
+
+def make_issue(severity=None, profile=None, requirement=None, check=None, focus_node=None, message="") -> dict:
+    return {
+        "severity": severity.upper() if isinstance(severity, str) else severity,
+        "profile": profile,
+        "requirement": requirement,
+        "check": check,
+        "focus_node": focus_node,
+        "message": str(message)[:MAX_MESSAGE_LENGTH],
+    }
+
+
+def structure_issues(problems) -> list:
+    """Converts the problems found by the structural check into issues."""
+    return [make_issue("REQUIRED", STRUCTURE_PROFILE, "RO-Crate structure", message=problem) for problem in problems]
+
+
+def timeout_issues(timeout, attempts, quarantined=False) -> list:
+    """Reports an RO-Crate whose validation ran out of time, or that was quarantined for it."""
+    message = f"The validation timed out after {timeout} seconds ({attempts} times in a row)."
+    if quarantined:
+        message += " The RO-Crate is quarantined and will not be validated again until its metadata changes."
+    return [make_issue("REQUIRED", VALIDATOR_PROFILE, "Validation time limit", message=message)]
+
+
+def name_of(value):
+    """Returns the identifier (or name) of a JSON report object, which may be a plain string."""
+    if isinstance(value, dict):
+        return value.get("identifier") or value.get("name") or value.get("label")
+    return value
+
+
+def parse_json_report(output) -> list | None:
+    """
+    Parses the validator's JSON report into issues, or returns None when `output` is not
+    a JSON report.
+    """
+    start = output.find("{")
+    if start == -1:
+        return None
+    try:
+        report = json_codec.loads(output[start:])
+    except ValueError:
+        return None
+    if not isinstance(report, dict) or not isinstance(report.get("issues"), list):
+        return None
+
+    issues = []
+    for issue in report["issues"]:
+        if not isinstance(issue, dict):
+            continue
+        check = issue.get("check") if isinstance(issue.get("check"), dict) else {}
+        requirement = check.get("requirement")
+        issues.append(make_issue(
+            severity=issue.get("severity") or check.get("severity"),
+            profile=name_of(check.get("profile") or issue.get("profile")),
+            requirement=(requirement.get("name") if isinstance(requirement, dict) else requirement)
+                or check.get("name"),
+            check=check.get("identifier") or name_of(issue.get("check")),
+            focus_node=issue.get("violatingEntity") or issue.get("focusNode"),
+            message=issue.get("message") or check.get("description") or "",
+        ))
+    return issues
+
+
+def parse_text_report(output) -> list:
+    """Recovers the issues from the validator's (human readable) text report."""
+    issues = []
+    profile = severity = requirement = check = None
+    for line in ANSI_PATTERN.sub("", output).splitlines():
+        line = line.strip(BOX_CHARACTERS)
+        if not line:
+            continue
+        if match := PROFILE_PATTERN.search(line):
+            profile = match.group(1)
+        elif match := SEVERITY_PATTERN.match(line):
+            severity, requirement = match.group(1), match.group(2).strip() or requirement
+        elif match := CHECK_PATTERN.match(line):
+            check = match.group(1)
+        elif check is not None and (match := ISSUE_PATTERN.match(line)):
+            issues.append(make_issue(severity, profile, requirement, check, match.group(1) or None, match.group(2).strip()))
+    return issues
+
+
+def parse_report(stdout, stderr=b"", returncode=1) -> list:
+    """
+    Parses the output of a `rocrate-validator validate` run into issues. An RO-Crate that
+    failed validation always gets at least one issue, holding the raw output when it could
+    not be parsed.
+    """
+    def text(value) -> str:
+        if isinstance(value, bytes):
+            return value.decode(errors="replace")
+        return value if isinstance(value, str) else ""
+
+    output, errors = text(stdout), text(stderr)
+
+    issues = parse_json_report(output)
+    if issues is None:
+        issues = parse_text_report(output)
+    if not issues and returncode != 0:
+        logger.warning("The validator's report could not be parsed, keeping its raw output.")
+        issues = [make_issue(message=(output.strip() or errors.strip() or "The RO-Crate failed validation."))]
+    return issues
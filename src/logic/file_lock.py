@@ -0,0 +1,160 @@
+# Copyright 2024 victoriahendersonn
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Inter-process coordination for the RO-Crate cache.
+
+Several plugin instances (one per open document) share the same cache directory, so
+every read and write of the cache goes through an advisory file lock. Writes are made
+atomic by writing to a temporary file in the same directory and renaming it over the
+original, so a reader never sees a half written file.
+"""
+import os
+import time
+import tempfile
+from pathlib import Path
+from logic.logger import Logger
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+# Logger to help keep a trace of any events that occur.
+logger = Logger(__name__).get_logger()
+
+
+class LockTimeoutError(TimeoutError):
+    """Raised when a lock could not be acquired within the given timeout."""
+
+
+class FileLock:
+    """
+    An advisory lock held on a lock file.
+
+    Shared locks may be held by many processes at once (readers), an exclusive lock
+    is held by one process only (writers). On platforms without `fcntl` every lock
+    is exclusive.
+
+    params:
+        path: str | Path - the lock file, it is created if it does not exist.
+        shared: bool - take a shared lock rather than an exclusive one.
+        timeout: float | None - seconds to wait for the lock, None waits forever.
+        poll_interval: float - seconds between attempts while waiting.
+    """
+    def __init__(self, path, shared=False, timeout=None, poll_interval=0.05):
+        self.path = Path(path)
+        self.shared = shared
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    @property
+    def locked(self) -> bool:
+        return self._fd is not None
+
+    @property
+    def supports_shared(self) -> bool:
+        """Whether shared locks are supported, rather than taken as exclusive ones."""
+        return fcntl is not None
+
+    def is_current(self) -> bool:
+        """
+        Returns whether the held lock is on the file now at `path`, i.e. the lock file was
+        not removed (e.g. with its directory) while this object waited for it.
+        """
+        if self._fd is None:
+            return False
+        try:
+            return os.path.samestat(os.fstat(self._fd), os.stat(self.path))
+        except OSError:
+            return False
+
+    def acquire(self) -> None:
+        """Takes the lock, waiting for up to `timeout` seconds."""
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+
+        while not self.try_acquire():
+            if deadline is not None and time.monotonic() >= deadline:
+                raise LockTimeoutError(f"Timed out waiting for lock {self.path}.")
+            time.sleep(self.poll_interval)
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:  # pragma: no cover - Windows
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def _try_lock(self, fd) -> None:
+        if fcntl is not None:
+            mode = fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX
+            fcntl.flock(fd, mode | fcntl.LOCK_NB)
+        else:  # pragma: no cover - Windows
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+
+    def try_acquire(self) -> bool:
+        """Attempts to take the lock without waiting, returns whether it was taken."""
+        if self._fd is not None:
+            raise RuntimeError(f"Lock {self.path} is already held by this object.")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            self._try_lock(fd)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+
+def atomic_write(path, data) -> None:
+    """
+    Writes `data` (str or bytes) to `path` atomically.
+
+    The data is written to a temporary file in the same directory, flushed to disk and
+    then renamed over `path`, so readers either see the old or the new contents.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    mode = "wb" if isinstance(data, (bytes, bytearray, memoryview)) else "w"
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,93 @@
+# Copyright 2024 victoriahendersonn
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Content fingerprints for artifacts, used as the keys of the derived-data caches (parsed
+tables, previews, ...).
+
+The fingerprint of a file is the SHA-256 of its whole content, read in chunks, as it is
+also the artifact's identity (see `content_id`): any edit changes it. Reading a multi-GB
+file costs about as much as the work being cached, so fingerprints are memoised by the
+file's stat signature (path, size, modification time and inode). A file is then read once
+per process, and again only once it has been modified or replaced. As modification times
+are coarse on some filesystems, a file modified in the last `RACY_SECONDS` is not
+memoised, since another edit in the same tick would not change its stat signature.
+
+Zip archive members are fingerprinted from the CRC-32 of their whole content, as recorded
+in the archive, so they are never read.
+"""
+import os
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+
+CHUNK_SIZE = 1024 * 1024  # bytes read at a time when hashing a file
+MEMO_SIZE = 4096  # number of fingerprints remembered by stat signature
+RACY_SECONDS = 2  # files modified this recently are hashed again on every call
+# The namespace of the (version 5) UUIDs identifying crates and artifacts.
+ID_NAMESPACE = uuid.UUID("2f0d7a0e-5c3b-5b1e-9a7c-3c6f3b1d2e40")
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def stat_signature(path) -> tuple:
+    """Returns a signature that changes whenever the file at `path` is modified or replaced."""
+    stat = os.stat(path)
+    return (os.path.realpath(path), stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+def file_fingerprint(path) -> str:
+    """Returns the content fingerprint of the file at `path`."""
+    signature = stat_signature(path)
+    with _memo_lock:
+        if signature in _memo:
+            _memo.move_to_end(signature)
+            return _memo[signature]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    fingerprint = digest.hexdigest()
+
+    # Not memoised if the file may be edited again without its signature changing, or was
+    # edited while it was read.
+    if time.time_ns() - signature[2] < RACY_SECONDS * 10 ** 9 or stat_signature(path) != signature:
+        return fingerprint
+    with _memo_lock:
+        _memo[signature] = fingerprint
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+    return fingerprint
+
+
+def member_fingerprint(info) -> str:
+    """
+    Returns the content fingerprint of a zip archive member (`zipfile.ZipInfo`), from the
+    CRC-32 and sizes recorded in the archive's central directory.
+    """
+    key = f"{info.filename}:{info.CRC}:{info.file_size}:{info.date_time}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def content_id(*parts) -> str:
+    """
+    Returns a deterministic identifier (a version 5 UUID) for the given parts, e.g. the
+    workspace-relative path of a crate and the hash of its content. The same parts always
+    give the same identifier, in any process or checkout.
+    """
+    return str(uuid.uuid5(ID_NAMESPACE, "\0".join("" if part is None else str(part) for part in parts)))
@@ -0,0 +1,184 @@
+# Copyright 2024 victoriahendersonn
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The JSON codec used for RO-Crate metadata and the cache.
+
+orjson is used when it is installed (`pip install ro-crate-plugin[fast-json]`), it parses
+and serialises several times faster than the standard library, which is used otherwise.
+The `ROCRATE_JSON_BACKEND=json` environment variable forces the standard library.
+
+Values that orjson cannot serialise (e.g. integers over 64 bits, or non-string keys) are
+serialised by the standard library instead, so both backends accept the same data.
+
+Huge metadata files can be read incrementally with `GraphReader`, which yields the
+entities of the `@graph` one at a time instead of parsing the whole document at once.
+"""
+import os
+import json
+import codecs
+from logic.logger import Logger
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the standard library is used without it.
+    orjson = None
+
+# Logger to help keep a trace of any events that occur.
+logger = Logger(__name__).get_logger()
+
+
+BACKEND = "orjson" if orjson is not None and os.environ.get("ROCRATE_JSON_BACKEND", "") != "json" else "json"
+CHUNK_SIZE = 1024 * 1024  # characters read at a time by `GraphReader`
+WHITESPACE = " \t\n\r"
+
+
+def loads(data):
+    """Parses a JSON document, given as str or bytes."""
+    if BACKEND == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load(f):
+    """Parses the JSON document in the (text or binary) file `f`."""
+    return loads(f.read())
+
+
+def dumps(value, indent=False, sort_keys=False) -> bytes:
+    """
+    Serialises `value` to UTF-8 encoded JSON, compact unless `indent` is true (indented by
+    two spaces).
+    """
+    if BACKEND == "orjson":
+        option = (orjson.OPT_INDENT_2 if indent else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        try:
+            return orjson.dumps(value, option=option)
+        except TypeError:
+            pass  # e.g. an integer over 64 bits, which the standard library can serialise
+    separators = None if indent else (",", ":")
+    return json.dumps(value, indent=2 if indent else None, sort_keys=sort_keys, separators=separators,
+                      ensure_ascii=False).encode()
+
+
+def dump(value, f, indent=False, sort_keys=False) -> None:
+    """Serialises `value` to the binary file `f`."""
+    f.write(dumps(value, indent, sort_keys))
+
+
+class GraphReader:
+    """
+    Reads an RO-Crate metadata document incrementally. Iterating over the reader yields the
+    entities of its `@graph` one at a time, so only one entity (and a chunk of the file) is
+    in memory at once. The other top level members (e.g. `@context`) are parsed whole and
+    kept in `members`, those after the `@graph` once the iteration is over.
+
+        with open("ro-crate-metadata.json", "rb") as f:
+            reader = GraphReader(f)
+            for entity in reader:
+                ...
+
+    params:
+        f: a text or binary (UTF-8) file holding a JSON object.
+        chunk_size: int - the number of characters read from `f` at a time.
+    """
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.members = {}  # the top level members other than the @graph
+        self.has_graph = False  # whether the document has a @graph array
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._position = 0
+        self._eof = False
+
+    def _read(self) -> bool:
+        """Reads the next chunk into the buffer, dropping what has been parsed already."""
+        while not self._eof:
+            data = self.f.read(self.chunk_size)
+            # Bytes are decoded incrementally, as a character may be split across chunks.
+            text = self._utf8.decode(data, final=not data) if isinstance(data, bytes) else data
+            if not data:
+                self._eof = True
+            if text:
+                self._buffer = self._buffer[self._position:] + text
+                self._position = 0
+                return True
+        return False
+
+    def _skip_whitespace(self) -> None:
+        while True:
+            while self._position < len(self._buffer) and self._buffer[self._position] in WHITESPACE:
+                self._position += 1
+            if self._position < len(self._buffer) or not self._read():
+                return
+
+    def _peek(self) -> str:
+        """Returns the next non-whitespace character (without consuming it), or "" at the end."""
+        self._skip_whitespace()
+        return self._buffer[self._position] if self._position < len(self._buffer) else ""
+
+    def _expect(self, characters) -> str:
+        character = self._peek()
+        if not character or character not in characters:
+            raise ValueError(f"Invalid JSON, expected one of {characters!r} but found {character or 'the end'!r}.")
+        self._position += 1
+        return character
+
+    def _value(self):
+        """Parses the next whole JSON value, reading more of the file until it is complete."""
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError:
+                if self._read():
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next chunk.
+            if end == len(self._buffer) and not self._eof and self._read():
+                continue
+            self._position = end
+            return value
+
+    def __iter__(self):
+        self._expect("{")
+        if self._peek() == "}":
+            self._position += 1
+            return
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise ValueError("Invalid JSON, the keys of an object must be strings.")
+            self._expect(":")
+            if key == "@graph" and self._peek() == "[":
+                self.has_graph = True
+                self._position += 1
+                if self._peek() == "]":
+                    self._position += 1
+                else:
+                    while True:
+                        yield self._value()
+                        if self._expect(",]") == "]":
+                            break
+            else:
+                self.members[key] = self._value()
+            if self._expect(",}") == "}":
+                return
+
+
+def iter_graph(f, chunk_size=CHUNK_SIZE):
+    """Yields the entities of the `@graph` of the metadata document in the file `f`, see `GraphReader`."""
+    yield from GraphReader(f, chunk_size)
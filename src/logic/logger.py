@@ -10,8 +10,9 @@ class Logger():
         for handler in logging.root.handlers[:]:
             logging.root.removeHandler(handler)
 
-        # Create a file handler to write logs to a file
-        file_handler = logging.FileHandler(log_file)
+        # Create a file handler to write logs to a file, which is only opened once something
+        # is logged so that importing a module has no side effects.
+        file_handler = logging.FileHandler(log_file, delay=True)
         file_handler.setLevel(logging.DEBUG)
 
         # Create a formatter and set it for the file handler
@@ -0,0 +1,303 @@
+# Copyright 2024 victoriahendersonn
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+In-process metrics of the plugin: counters, gauges and latency histograms, kept in memory
+for the life of the process and rendered in the Prometheus text exposition format.
+
+    VALIDATIONS = registry.counter("rocrate_validations_total", "RO-Crates validated.", ("result",))
+    VALIDATIONS.inc(result="valid")
+
+    with LATENCY.time(method="get_variable"):
+        ...
+
+Recording a sample costs a dictionary lookup and a short critical section (histograms
+find their bucket by bisection), so the metrics are always on. Values that other objects
+already count (e.g. the hits of the table cache) are read only when the metrics are
+collected, through `registry.collector`.
+
+The metrics can be read with the kernel's `metrics` command, or written to a file (by
+default `metrics.prom` in the workspace's cache) for a node exporter's textfile collector.
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from logic.file_lock import atomic_write
+from logic.logger import Logger
+
+# Logger to help keep a trace of any events that occur.
+logger = Logger(__name__).get_logger()
+
+
+METRICS_FILENAME = "metrics.prom"
+# Upper bounds of the latency buckets, in seconds, from a millisecond to ten minutes.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 600.0)
+
+
+def format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names, values, extra=()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+
+class Metric:
+    """
+    A family of samples sharing a name, one per combination of label values.
+
+    params:
+        name: str - the metric's name, e.g. "rocrate_validations_total".
+        description: str - what is measured, the metric's HELP text.
+        labels: tuple - the names of the labels, whose values are given when recording.
+    """
+    type = "untyped"
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.help = description
+        self.labels = tuple(labels)
+        self.values = {}  # label values -> sample
+        self._lock = threading.Lock()
+
+    def key(self, labels) -> tuple:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"The metric {self.name} takes the labels {self.labels}, not {tuple(labels)}.")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self):
+        """Yields `(suffix, label values, extra labels, value)` for the text format."""
+        with self._lock:
+            items = list(self.values.items())
+        for key, value in sorted(items):
+            yield "", key, (), value
+
+    def snapshot(self) -> list:
+        """Returns the samples as a JSON-able list of `{ "labels": ..., "value": ... }`."""
+        with self._lock:
+            items = list(self.values.items())
+        return [{ "labels": dict(zip(self.labels, key)), "value": value } for key, value in sorted(items)]
+
+
+class Counter(Metric):
+    """A value that only goes up, e.g. the number of requests."""
+    type = "counter"
+
+    def inc(self, amount=1, **labels) -> None:
+        if amount < 0:
+            raise ValueError("A counter cannot be decreased.")
+        key = self.key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.values.get(self.key(labels), 0)
+
+
+class Gauge(Metric):
+    """A value that goes up and down, e.g. the number of indexed artifacts."""
+    type = "gauge"
+
+    def set(self, value, **labels) -> None:
+        key = self.key(labels)
+        with self._lock:
+            self.values[key] = value
+
+    def inc(self, amount=1, **labels) -> None:
+        key = self.key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        return self.values.get(self.key(labels), 0)
+
+
+class Histogram(Metric):
+    """
+    The distribution of observed values (by default latencies in seconds) over fixed
+    buckets, with their count and sum.
+    """
+    type = "histogram"
+
+    def __init__(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels) -> None:
+        key = self.key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            sample = self.values.get(key)
+            if sample is None:
+                sample = self.values[key] = { "buckets": [0] * (len(self.buckets) + 1), "count": 0, "sum": 0.0 }
+            sample["buckets"][index] += 1
+            sample["count"] += 1
+            sample["sum"] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the time spent in the `with` block, including when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        sample = self.values.get(self.key(labels))
+        return sample["count"] if sample else 0
+
+    def quantile(self, q, **labels) -> float | None:
+        """Estimates the `q` quantile (0 to 1) from the buckets, as Prometheus' `histogram_quantile` does."""
+        with self._lock:
+            sample = self.values.get(self.key(labels))
+            counts = list(sample["buckets"]) if sample else []
+        total = sum(counts)
+        if not total:
+            return None
+        rank, cumulative = q * total, 0
+        for index, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]  # in the +Inf bucket, the highest bound is the best estimate
+                low = self.buckets[index - 1] if index else 0.0
+                return low + (self.buckets[index] - low) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def samples(self):
+        with self._lock:
+            items = [(key, dict(sample, buckets=list(sample["buckets"]))) for key, sample in self.values.items()]
+        for key, sample in sorted(items):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), sample["buckets"]):
+                cumulative += count
+                yield "_bucket", key, (("le", format_value(float(bound))),), cumulative
+            yield "_sum", key, (), sample["sum"]
+            yield "_count", key, (), sample["count"]
+
+    def snapshot(self) -> list:
+        results = []
+        for entry in super().snapshot():
+            sample = entry["value"]
+            labels = entry["labels"]
+            results.append({
+                "labels": labels,
+                "count": sample["count"],
+                "sum": sample["sum"],
+                "p50": self.quantile(0.5, **labels),
+                "p95": self.quantile(0.95, **labels),
+                "p99": self.quantile(0.99, **labels),
+            })
+        return results
+
+
+class MetricsRegistry:
+    """The metrics of the process, by name."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = {}  # name -> function returning [(metric name, type, help, labels, value)]
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, description, labels, **kwargs) -> Metric:
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, description, labels, **kwargs)
+            elif type(metric) is not cls or metric.labels != tuple(labels):
+                raise ValueError(f"The metric {name} is already registered as a {metric.type} with the labels {metric.labels}.")
+            return metric
+
+    def counter(self, name, description, labels=()) -> Counter:
+        return self._get_or_create(Counter, name, description, labels)
+
+    def gauge(self, name, description, labels=()) -> Gauge:
+        return self._get_or_create(Gauge, name, description, labels)
+
+    def histogram(self, name, description, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, description, labels, buckets=buckets)
+
+    def collector(self, name, collect) -> None:
+        """
+        Registers (or replaces) a function called when the metrics are collected, returning
+        the current values of metrics counted elsewhere, as a list of
+        `(metric name, "counter" | "gauge", help, labels dict, value)`.
+        """
+        with self._lock:
+            self.collectors[name] = collect
+
+    def collect(self) -> list:
+        """Returns the metrics, with those of the collectors as gauges and counters."""
+        metrics = list(self.metrics.values())
+        collected = {}
+        for name, collect in list(self.collectors.items()):
+            try:
+                for metric_name, metric_type, description, labels, value in collect():
+                    metric = collected.get(metric_name)
+                    if metric is None:
+                        metric = collected[metric_name] = (Counter if metric_type == "counter" else Gauge)(
+                            metric_name, description, tuple(labels))
+                    metric.values[metric.key(labels)] = value
+            except Exception as error:
+                logger.warning(f"Error: {error}, encountered when collecting the {name} metrics.")
+        uptime = Gauge("rocrate_process_uptime_seconds", "Seconds since the plugin process started.")
+        uptime.set(time.time() - self.started)
+        return sorted(metrics + list(collected.values()) + [uptime], key=lambda metric: metric.name)
+
+    def render(self) -> str:
+        """Renders the metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self.collect():
+            lines.append(f"# HELP {metric.name} {escape(metric.help)}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, key, extra, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{format_labels(metric.labels, key, extra)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        """Returns the metrics as a JSON-able dict, with latency percentiles for the histograms."""
+        return {
+            metric.name: { "type": metric.type, "help": metric.help, "samples": metric.snapshot() }
+            for metric in self.collect()
+        }
+
+    def dump(self, path) -> str:
+        """Writes the metrics to `path` in the Prometheus text format, atomically."""
+        atomic_write(path, self.render().encode())
+        logger.info(f"Wrote the metrics to {path}.")
+        return str(path)
+
+
+# The metrics of the plugin process, shared by every module.
+registry = MetricsRegistry()
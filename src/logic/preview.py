@@ -0,0 +1,340 @@
+# Copyright 2024 victoriahendersonn
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Bounded-size previews of artifacts: the media type and size of the file (sniffed from its
+first bytes), the dimensions and a downscaled thumbnail of images, and an excerpt of the
+first lines of text or the first bytes of binary files.
+
+A preview is generated on first access and stored in a content-addressed cache, keyed by
+the artifact's content fingerprint, so rendering a document that embeds many images reads
+each full resolution file once. The cache is bounded in size and evicts the least
+recently used previews.
+
+Thumbnails need Pillow (the optional `previews` extra). Without it, images are still
+sniffed and their dimensions read from their headers, but no thumbnail is made.
+"""
+import io
+import os
+import time
+import codecs
+import threading
+import struct
+import mimetypes
+from logic.file_lock import atomic_write
+from logic import json_codec
+from logic.logger import Logger
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional, only thumbnails need it.
+    Image = None
+
+# Logger to help keep a trace of any events that occur.
+logger = Logger(__name__).get_logger()
+
+
+PREVIEWS_DIRNAME = "previews"
+PREVIEW_CACHE_BUDGET = 64 * 1024 * 1024  # bytes of previews kept on disk
+HEAD_BYTES = 64 * 1024  # bytes read from the start of a file to sniff and excerpt it
+EXCERPT_LINES = 20
+EXCERPT_CHARS = 2000
+HEX_BYTES = 64
+THUMBNAIL_SIZE = 256  # the longest side of a thumbnail, in pixels
+
+# File signatures, checked against the start of a file.
+MAGIC_NUMBERS = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+    (b"BM", "image/bmp"),
+    (b"%PDF-", "application/pdf"),
+    (b"PK\x03\x04", "application/zip"),
+    (b"\x1f\x8b", "application/gzip"),
+    (b"\x89HDF\r\n\x1a\n", "application/x-hdf5"),
+)
+# JPEG start of frame markers, which hold the image's dimensions.
+JPEG_SOF_MARKERS = { 0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF }
+
+
+def is_text(head) -> bool:
+    """Returns whether the bytes look like UTF-8 text (a split final character is allowed)."""
+    if b"\x00" in head:
+        return False
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def sniff_media_type(head, name=None) -> str:
+    """Returns the media type of a file from its first bytes, falling back to its name for text."""
+    for magic, media_type in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return media_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if is_text(head):
+        guessed = mimetypes.guess_type(name)[0] if name else None
+        if guessed and (guessed.startswith("text/") or guessed in ("application/json", "application/xml")):
+            return guessed
+        return "text/plain"
+    return "application/octet-stream"
+
+
+def image_dimensions(f, media_type) -> tuple | None:
+    """
+    Reads the (width, height) of an image from its header, without decoding it. `f` is a
+    seekable binary file positioned anywhere. Returns None if they cannot be read.
+    """
+    f.seek(0)
+    head = f.read(32)
+    try:
+        if media_type == "image/png" and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if media_type == "image/gif":
+            return struct.unpack("<HH", head[6:10])
+        if media_type == "image/bmp":
+            width, height = struct.unpack("<ii", head[18:26])
+            return width, abs(height)
+        if media_type == "image/jpeg":
+            return jpeg_dimensions(f)
+    except struct.error:
+        return None
+    return None
+
+
+def jpeg_dimensions(f) -> tuple | None:
+    """Walks the JPEG segments up to the start of frame, skipping over (e.g. EXIF) segments."""
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        if marker[1] == 0xFF:
+            f.seek(-1, os.SEEK_CUR)  # fill bytes before a marker
+            continue
+        if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+            continue  # markers without a length
+        length = struct.unpack(">H", f.read(2))[0]
+        if marker[1] in JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">xHH", f.read(5))
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def make_thumbnail(f, size=THUMBNAIL_SIZE) -> tuple | None:
+    """
+    Returns a downscaled copy of the image in `f` as `(bytes, media_type)`, or None when
+    Pillow is not installed or cannot read the image.
+    """
+    if Image is None:
+        return None
+    try:
+        f.seek(0)
+        with Image.open(f) as image:
+            # JPEGs are decoded at a reduced scale, rather than decoding every pixel.
+            image.draft("RGB", (size, size))
+            image.thumbnail((size, size))
+            transparent = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+            image = image.convert("RGBA" if transparent else "RGB")
+            output = io.BytesIO()
+            if transparent:
+                image.save(output, "PNG", optimize=True)
+                return output.getvalue(), "image/png"
+            image.save(output, "JPEG", quality=85)
+            return output.getvalue(), "image/jpeg"
+    except Exception as error:
+        logger.warning(f"Could not make a thumbnail: {error}")
+        return None
+
+
+def generate_preview(f, size, name=None, thumbnail_size=THUMBNAIL_SIZE) -> tuple:
+    """
+    Generates the preview of a file.
+
+    params:
+        f: a seekable binary file object.
+        size: int - the size of the file in bytes.
+        name: str - the file's name, used to tell text formats apart.
+    returns:
+        (dict, tuple | None) - the preview, and the thumbnail as `(bytes, media_type)`.
+    """
+    head = f.read(HEAD_BYTES)
+    media_type = sniff_media_type(head, name)
+    preview = { "size": size, "media_type": media_type }
+    thumbnail = None
+
+    if media_type.startswith("image/"):
+        preview["kind"] = "image"
+        dimensions = image_dimensions(f, media_type)
+        thumbnail = make_thumbnail(f, thumbnail_size)
+        if dimensions is None and thumbnail is not None:
+            f.seek(0)
+            with Image.open(f) as image:
+                dimensions = image.size
+        preview["width"], preview["height"] = dimensions or (None, None)
+    elif media_type.startswith("text/") or media_type in ("application/json", "application/xml"):
+        preview["kind"] = "text"
+        text = codecs.getincrementaldecoder("utf-8")(errors="replace").decode(head, final=size <= len(head))
+        lines = text.splitlines(keepends=True)[:EXCERPT_LINES]
+        excerpt = "".join(lines)[:EXCERPT_CHARS]
+        preview["excerpt"] = excerpt
+        preview["truncated"] = len(excerpt.encode()) < size
+    else:
+        preview["kind"] = "binary"
+        preview["hex"] = head[:HEX_BYTES].hex(" ")
+        preview["truncated"] = size > HEX_BYTES
+    return preview, thumbnail
+
+
+class PreviewCache:
+    """
+    A content-addressed store of previews on disk: `<fingerprint>.json` holds a preview,
+    alongside its thumbnail (if any), in a subdirectory named by the fingerprint's first
+    two characters. Entries are marked as used by updating their modification time.
+
+    The size and last use of each entry are kept in memory, so storing a preview does not
+    walk the whole directory: it is only walked once, on first use (see `entries`). Entries
+    added by other processes are counted once this one reads them.
+    """
+
+    def __init__(self, directory, budget=PREVIEW_CACHE_BUDGET):
+        self.directory = directory
+        self.budget = budget
+        self._index = None  # fingerprint -> [last used, size, paths], loaded on first use
+        self._total = 0  # bytes of the entries in the index
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, fingerprint, extension=".json") -> str:
+        return os.path.join(self.directory, fingerprint[:2], fingerprint + extension)
+
+    def get(self, fingerprint) -> dict | None:
+        """Returns the cached preview for `fingerprint`, or None."""
+        path = self._path(fingerprint)
+        try:
+            with open(path, "rb") as f:
+                preview = json_codec.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if preview.get("thumbnail") and not os.path.exists(preview["thumbnail"]):
+            return None  # the thumbnail has been evicted, so regenerate the preview
+        paths = [used for used in (path, preview.get("thumbnail")) if used]
+        for used in paths:
+            try:
+                os.utime(used)
+            except OSError:
+                pass
+        self._record(fingerprint, paths, replace=False)
+        return preview
+
+    def put(self, fingerprint, preview, thumbnail=None) -> dict:
+        """Stores a preview and its thumbnail `(bytes, media_type)`, then evicts if over budget."""
+        preview = dict(preview, fingerprint=fingerprint, thumbnail=None)
+        os.makedirs(os.path.dirname(self._path(fingerprint)), exist_ok=True)
+        if thumbnail is not None:
+            data, media_type = thumbnail
+            path = self._path(fingerprint, mimetypes.guess_extension(media_type) or ".thumbnail")
+            atomic_write(path, data)
+            preview["thumbnail"] = path
+            preview["thumbnail_type"] = media_type
+        atomic_write(self._path(fingerprint), json_codec.dumps(preview))
+        self._record(fingerprint, [self._path(fingerprint)] + ([preview["thumbnail"]] if preview["thumbnail"] else []))
+        self.evict(keep=fingerprint)
+        return preview
+
+    def _load(self) -> dict:
+        """Returns the in-memory index of the entries, walking the directory the first time."""
+        if self._index is None:
+            self._index = { fingerprint: list(entry) for fingerprint, entry in self.entries().items() }
+            self._total = sum(size for _, size, _ in self._index.values())
+        return self._index
+
+    def _record(self, fingerprint, paths, replace=True) -> None:
+        """
+        Marks the entry `fingerprint` as just used, adding it to the index with the size of
+        its `paths` if it is new, or if `replace` (it was just written).
+        """
+        with self._lock:
+            index = self._load()
+            entry = index.get(fingerprint)
+            if entry is not None and not replace:
+                entry[0] = time.time()
+                return
+            size = 0
+            for path in paths:
+                try:
+                    size += os.stat(path).st_size
+                except OSError:
+                    continue
+            if entry is not None:
+                self._total -= entry[1]
+            index[fingerprint] = [time.time(), size, list(paths)]
+            self._total += size
+
+    def entries(self) -> dict:
+        """
+        Returns `(last used, size, paths)` of every cached preview, keyed by fingerprint, by
+        walking the directory (unlike `size` and `evict`, which use the in-memory index).
+        """
+        entries = {}
+        for root, dirs, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                fingerprint = name.split(".")[0]
+                used, size, paths = entries.get(fingerprint, (0, 0, []))
+                entries[fingerprint] = (max(used, stat.st_mtime), size + stat.st_size, paths + [path])
+        return entries
+
+    def size(self) -> int:
+        with self._lock:
+            self._load()
+            return self._total
+
+    def evict(self, keep=None) -> int:
+        """
+        Removes the least recently used previews until the cache is within its budget. The
+        preview for the fingerprint `keep` (e.g. the one just stored) is never removed.
+        """
+        evicted = 0
+        with self._lock:
+            index = self._load()
+            if self._total <= self.budget:
+                return 0
+            for fingerprint, (_, size, paths) in sorted(index.items(), key=lambda entry: entry[1][0]):
+                if self._total <= self.budget:
+                    break
+                if fingerprint == keep:
+                    continue
+                for path in paths:
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        continue
+                del index[fingerprint]
+                self._total -= size
+                evicted += 1
+        if evicted:
+            logger.info(f"Evicted {evicted} previews to keep the preview cache within {self.budget} bytes.")
+        return evicted
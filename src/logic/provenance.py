@@ -0,0 +1,161 @@
+# Copyright 2024 victoriahendersonn
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The provenance (lineage) graph of an RO-Crate, e.g. a Workflow Run Crate.
+
+Actions such as a `CreateAction` link the entities they used (`object`), the tool that
+ran (`instrument`) and the entities they produced (`result`). The graph is built once,
+when the artifacts are extracted: the direct inputs and outputs of every entity, and the
+transitive closure of both, are precomputed and stored in the cache, so answering "what
+produced this?" or "what depends on this?" is a dictionary lookup.
+"""
+from collections import deque
+from logic.logger import Logger
+
+# Logger to help keep a trace of any events that occur.
+logger = Logger(__name__).get_logger()
+
+
+# Action types (see https://www.researchobject.org/workflow-run-crate/) whose links are recorded.
+ACTION_TYPES = ("CreateAction", "ActivateAction", "UpdateAction", "ControlAction", "OrganizeAction")
+
+
+def normalise_id(entity_id) -> str:
+    return entity_id[2:] if isinstance(entity_id, str) and entity_id.startswith("./") and entity_id != "./" else entity_id
+
+
+def reference_ids(value) -> list:
+    """Returns the `@id`s of a JSON-LD property holding one reference or a list of them."""
+    values = value if isinstance(value, list) else [value]
+    ids = []
+    for item in values:
+        if isinstance(item, dict) and isinstance(item.get("@id"), str):
+            ids.append(normalise_id(item["@id"]))
+        elif isinstance(item, str):
+            ids.append(normalise_id(item))
+    return ids
+
+
+class ProvenanceGraph:
+    def __init__(self):
+        self.inputs = {}  # entity id -> ids of the entities it was directly derived from
+        self.outputs = {}  # entity id -> ids of the entities directly derived from it
+        self.actions = {}  # action id -> { "name", "type", "instrument", "object", "result" }
+        self.produced_by = {}  # entity id -> ids of the actions that produced it
+        self.ancestors = {}  # entity id -> ids of every entity it was derived from
+        self.descendants = {}  # entity id -> ids of every entity derived from it
+
+    def __len__(self):
+        return len(self.actions)
+
+    @classmethod
+    def from_entities(cls, entities) -> "ProvenanceGraph":
+        """Builds the graph from the JSON-LD entities (dicts) of an RO-Crate's `@graph`."""
+        graph = cls()
+        for entity in entities:
+            types = entity.get("@type", [])
+            types = types if isinstance(types, list) else [types]
+            action_type = next((action for action in ACTION_TYPES if action in types), None)
+            if action_type is not None:
+                graph.add_action(
+                    entity["@id"], action_type, entity.get("name"),
+                    reference_ids(entity.get("instrument", [])),
+                    reference_ids(entity.get("object", [])),
+                    reference_ids(entity.get("result", [])),
+                )
+        graph.compute_closure()
+        return graph
+
+    @classmethod
+    def from_rocrate(cls, rocrate) -> "ProvenanceGraph":
+        """Builds the graph for a loaded `ROCrate` or `ZipCrate`."""
+        if getattr(rocrate, "is_zipped", False) is True:
+            return cls.from_entities(rocrate.metadata.get("@graph", []))
+        return cls.from_entities(entity.properties() for entity in rocrate.get_entities())
+
+    def add_action(self, action_id, action_type, name, instrument, objects, results) -> None:
+        self.actions[action_id] = {
+            "name": name,
+            "type": action_type,
+            "instrument": instrument,
+            "object": objects,
+            "result": results,
+        }
+        for result in results:
+            self.produced_by.setdefault(result, []).append(action_id)
+            for source in instrument + objects:
+                if source == result:
+                    continue
+                if source not in self.inputs.setdefault(result, []):
+                    self.inputs[result].append(source)
+                if result not in self.outputs.setdefault(source, []):
+                    self.outputs[source].append(result)
+
+    def compute_closure(self) -> None:
+        """Precomputes the transitive inputs (ancestors) and outputs (descendants) of every entity."""
+        self.ancestors = { node: self._reachable(node, self.inputs) for node in self.inputs }
+        self.descendants = { node: self._reachable(node, self.outputs) for node in self.outputs }
+
+    @staticmethod
+    def _reachable(start, edges) -> list:
+        seen = { start }
+        order = []
+        queue = deque(edges.get(start, []))
+        while queue:
+            node = queue.popleft()
+            if node in seen:
+                continue
+            seen.add(node)
+            order.append(node)
+            queue.extend(edges.get(node, []))
+        return order
+
+    def upstream(self, entity_id, transitive=True) -> list:
+        """Returns the ids of the entities `entity_id` was derived from (its inputs)."""
+        entity_id = normalise_id(entity_id)
+        return list((self.ancestors if transitive else self.inputs).get(entity_id, []))
+
+    def downstream(self, entity_id, transitive=True) -> list:
+        """Returns the ids of the entities derived from `entity_id` (its dependent outputs)."""
+        entity_id = normalise_id(entity_id)
+        return list((self.descendants if transitive else self.outputs).get(entity_id, []))
+
+    def producers(self, entity_id) -> list:
+        """Returns the actions that produced `entity_id`."""
+        entity_id = normalise_id(entity_id)
+        return [dict(self.actions[action], id=action) for action in self.produced_by.get(entity_id, [])]
+
+    def to_dict(self) -> dict:
+        return {
+            "actions": self.actions,
+            "inputs": self.inputs,
+            "outputs": self.outputs,
+            "produced_by": self.produced_by,
+            "ancestors": self.ancestors,
+            "descendants": self.descendants,
+        }
+
+    @classmethod
+    def from_dict(cls, data) -> "ProvenanceGraph":
+        """Restores a graph stored in the cache, without recomputing anything."""
+        graph = cls()
+        data = data or {}
+        graph.actions = data.get("actions", {})
+        graph.inputs = data.get("inputs", {})
+        graph.outputs = data.get("outputs", {})
+        graph.produced_by = data.get("produced_by", {})
+        graph.ancestors = data.get("ancestors", {})
+        graph.descendants = data.get("descendants", {})
+        return graph
@@ -0,0 +1,212 @@
+# Copyright 2024 victoriahendersonn
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A query engine over the artifacts extracted from the RO-Crates.
+
+The artifacts are indexed once, when they are extracted (or loaded from the cache), into
+inverted indexes from each field value to the artifacts holding it, and sorted indexes
+for the size and date ranges. A query intersects the matching sets, starting with the
+smallest, so it never scans every artifact.
+"""
+import re
+import bisect
+from datetime import date, datetime, timedelta, timezone
+from collections import defaultdict
+from logic.logger import Logger
+
+# Logger to help keep a trace of any events that occur.
+logger = Logger(__name__).get_logger()
+
+
+# The fields that can be filtered on by exact (case insensitive) value.
+INDEXED_FIELDS = ("type", "encoding_format", "author", "crate")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text) -> set:
+    """Splits text into the lower case words used by the free-text index."""
+    return set(TOKEN_PATTERN.findall(str(text).lower())) if text else set()
+
+
+def parse_date(value) -> float | None:
+    """Parses an ISO 8601 date (or date-time) into a UTC timestamp, or returns None."""
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def parse_since(value) -> float | None:
+    """
+    Parses the lower bound of a date range, as `parse_date` does, but raises `ValueError`
+    when a bound is given that is not a date, rather than ignoring it.
+    """
+    timestamp = parse_date(value)
+    if timestamp is None and value not in (None, ""):
+        raise ValueError(f"Invalid date {value}, expected an ISO 8601 date or date-time, e.g. 2024-01-31.")
+    return timestamp
+
+
+def parse_until(value) -> tuple:
+    """
+    Parses the upper bound of a date range, as `parse_since` does. A date without a time
+    stands for the whole day, so it is parsed to the start of the next day, exclusive.
+
+    returns:
+        (float | None, bool) - the timestamp, and whether it is inclusive.
+    """
+    if isinstance(value, str):
+        try:
+            day = date.fromisoformat(value.strip())
+        except ValueError:
+            pass
+        else:
+            return parse_date((day + timedelta(days=1)).isoformat()), False
+    return parse_since(value), True
+
+
+def field_values(artifact, field) -> list:
+    """Returns the lower case values of `field` for the artifact, as a list."""
+    value = artifact.get(field)
+    values = value if isinstance(value, list) else [value]
+    return [str(value).lower() for value in values if value not in (None, "")]
+
+
+class ArtifactIndex:
+    def __init__(self):
+        self.artifacts = []  # the indexed artifacts, referred to by position in the indexes
+        self.fields = { field: defaultdict(set) for field in INDEXED_FIELDS }
+        self.tokens = defaultdict(set)
+        self.sizes = []  # sorted (size, position) pairs
+        self.dates = []  # sorted (timestamp, position) pairs
+        self.names = defaultdict(list)  # pseudonym or entity id -> positions
+        self._sorted = True
+
+    def __len__(self):
+        return len(self.artifacts)
+
+    @classmethod
+    def from_rocrates(cls, rocrates) -> "ArtifactIndex":
+        """Builds the index for the RO-Crate entries of the cache (see `make_rocrate_info`)."""
+        index = cls()
+        for rocrate in rocrates:
+            for artifact in rocrate.get("artifacts") or []:
+                index.add(artifact, rocrate["path"])
+        return index
+
+    def add(self, artifact, crate) -> None:
+        """Adds an artifact extracted from the RO-Crate at `crate` to the index."""
+        position = len(self.artifacts)
+        self.artifacts.append(dict(artifact, crate=str(crate)))
+
+        for field in INDEXED_FIELDS:
+            for value in field_values(self.artifacts[position], field):
+                self.fields[field][value].add(position)
+
+        # A crate can be referred to by its full path or just its directory (or zip file) name.
+        crate_name = str(crate).rstrip("/").rsplit("/", 1)[-1].lower()
+        self.fields["crate"][crate_name].add(position)
+
+        for name in { artifact.get("pseudonym"), artifact.get("id") }:
+            if name:
+                self.names[name].append(position)
+
+        text = " ".join(str(artifact.get(key) or "") for key in ("id", "name", "description", "pseudonym"))
+        for token in tokenize(text):
+            self.tokens[token].add(position)
+
+        if isinstance(artifact.get("size"), int):
+            self.sizes.append((artifact["size"], position))
+        timestamp = parse_date(artifact.get("date"))
+        if timestamp is not None:
+            self.dates.append((timestamp, position))
+        self._sorted = False
+
+    def lookup(self, name) -> list:
+        """Returns the artifacts whose pseudonym or entity id is `name`."""
+        return [self.artifacts[position] for position in self.names.get(name, [])]
+
+    def _sort(self) -> None:
+        if not self._sorted:
+            self.sizes.sort()
+            self.dates.sort()
+            self._sorted = True
+
+    def query(self, entity_type=None, encoding_format=None, author=None, crate=None, text=None,
+              min_size=None, max_size=None, since=None, until=None, limit=None) -> list:
+        """
+        Returns the artifacts matching every given filter.
+
+        params:
+            entity_type: str - an `@type` of the entity, e.g. "File".
+            encoding_format: str - e.g. "text/csv".
+            author: str - the `@id` or name of an author or creator.
+            crate: str - the path, or directory name, of the RO-Crate.
+            text: str - words that must all appear in the id, name or description.
+            min_size, max_size: int - bounds on the size in bytes (inclusive).
+            since, until: str - bounds on the date, as ISO 8601 dates or date-times (inclusive,
+                a date-only `until` includes the whole day).
+            limit: int - the maximum number of artifacts to return.
+        """
+        self._sort()
+        candidates = []
+
+        for field, value in (("type", entity_type), ("encoding_format", encoding_format),
+                             ("author", author), ("crate", crate)):
+            if value is not None:
+                key = str(value).lower().rstrip("/") if field == "crate" else str(value).lower()
+                candidates.append(self.fields[field].get(key, set()))
+
+        for token in tokenize(text):
+            candidates.append(self.tokens.get(token, set()))
+
+        if min_size is not None or max_size is not None:
+            candidates.append(self._range(self.sizes, min_size, max_size))
+        if since is not None or until is not None:
+            high, inclusive = parse_until(until)
+            candidates.append(self._range(self.dates, parse_since(since), high, inclusive))
+
+        if not candidates:
+            positions = range(len(self.artifacts))
+        else:
+            candidates.sort(key=len)
+            matches = set(candidates[0])
+            for candidate in candidates[1:]:
+                if not matches:
+                    break
+                matches &= candidate
+            positions = sorted(matches)
+
+        results = [self.artifacts[position] for position in positions]
+        return results[:int(limit)] if limit is not None else results
+
+    def _range(self, pairs, low, high, inclusive=True) -> set:
+        """
+        Returns the positions whose value in the sorted `pairs` is within [low, high], or
+        [low, high) unless `inclusive`.
+        """
+        start = 0 if low is None else bisect.bisect_left(pairs, (float(low), -1))
+        if high is None:
+            end = len(pairs)
+        elif inclusive:
+            end = bisect.bisect_right(pairs, (float(high), len(self.artifacts)))
+        else:
+            end = bisect.bisect_left(pairs, (float(high), -1))
+        return { position for _, position in pairs[start:end] }
@@ -0,0 +1,180 @@
+# Copyright 2024 victoriahendersonn
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Resolves the metadata of remote (web) data entities, e.g. `https://...` files that an
+RO-Crate references rather than contains.
+
+- Requests are made concurrently over a single pooled HTTP session.
+- Responses are cached on disk, and refreshed with conditional requests (ETag and
+  Last-Modified), so unchanged resources cost a `304 Not Modified`.
+- In offline mode no requests are made, only the on-disk cache is consulted.
+"""
+import os
+import time
+import asyncio
+import concurrent.futures
+from pathlib import Path
+from logic.logger import Logger
+from logic.file_lock import FileLock, atomic_write
+from logic import json_codec
+
+# Logger to help keep a trace of any events that occur.
+logger = Logger(__name__).get_logger()
+
+
+REMOTE_SCHEMES = ("http://", "https://")
+FILENAME = "remote_metadata.json"
+LOCK_FILENAME = "remote_metadata.json.lock"
+CONCURRENCY = 16  # maximum number of requests in flight
+TIMEOUT = 10.0  # seconds, per request
+
+# Offline mode can be switched on for the plugin with the `ROCRATE_OFFLINE` environment variable.
+OFFLINE = os.environ.get("ROCRATE_OFFLINE", "").lower() not in ("", "0", "false", "no")
+
+
+def is_remote(entity_id) -> bool:
+    """Returns whether the entity id refers to a remote (web) resource."""
+    return isinstance(entity_id, str) and entity_id.lower().startswith(REMOTE_SCHEMES)
+
+
+class RemoteResolver:
+    def __init__(self, cache_dir, offline=None, concurrency=CONCURRENCY, timeout=TIMEOUT):
+        """
+        params:
+            cache_dir: str | Path - directory holding the on-disk response cache.
+            offline: bool | None - never make requests, defaults to `OFFLINE`.
+            concurrency: int - maximum number of requests in flight.
+            timeout: float - seconds allowed for each request.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.offline = OFFLINE if offline is None else offline
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+    def load_cache(self) -> dict:
+        """Returns the on-disk response cache, keyed by url."""
+        with FileLock(self.cache_dir / LOCK_FILENAME, shared=True):
+            return self._read_cache()
+
+    def save_cache(self, entries) -> None:
+        """Merges `entries` into the on-disk response cache."""
+        try:
+            with FileLock(self.cache_dir / LOCK_FILENAME):
+                cache = self._read_cache()
+                cache.update(entries)
+                atomic_write(self.cache_dir / FILENAME, json_codec.dumps(cache))
+        except Exception as error:
+            logger.error(f"Error: {error}, encountered when saving {FILENAME}.")
+
+    def _read_cache(self) -> dict:
+        try:
+            with open(self.cache_dir / FILENAME, "rb") as f:
+                return json_codec.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as error:
+            logger.error(f"Error: {error}, encountered when loading {FILENAME}.")
+            return {}
+
+    def resolve(self, urls) -> dict:
+        """
+        Resolves the metadata of every url in `urls`, returning a dict keyed by url.
+
+        This is safe to call from inside a running event loop (e.g. a kernel method), in
+        which case the requests are made on a separate thread.
+        """
+        urls = list(dict.fromkeys(url for url in urls if is_remote(url)))
+        if not urls:
+            return {}
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.resolve_async(urls))
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self.resolve_async(urls)).result()
+
+    async def resolve_async(self, urls) -> dict:
+        cache = self.load_cache()
+
+        if self.offline:
+            logger.info(f"Offline mode, resolving {len(urls)} remote entities from the cache only.")
+            return { url: self._offline_entry(url, cache.get(url)) for url in urls }
+
+        # Imported here so that aiohttp is only loaded when there is something to fetch.
+        import aiohttp
+
+        logger.info(f"Resolving {len(urls)} remote entities.")
+        semaphore = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            entries = await asyncio.gather(
+                *(self._fetch(session, semaphore, url, cache.get(url)) for url in urls)
+            )
+
+        results = dict(zip(urls, entries))
+        self.save_cache({
+            url: { key: value for key, value in entry.items() if key != "from_cache" }
+            for url, entry in results.items() if entry.get("error") is None
+        })
+        return results
+
+    async def _fetch(self, session, semaphore, url, cached) -> dict:
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        async with semaphore:
+            try:
+                async with session.head(url, headers=headers, allow_redirects=True) as response:
+                    # Some servers do not support HEAD, fall back to a GET without reading the body.
+                    if response.status in (405, 501):
+                        async with session.get(url, headers=headers, allow_redirects=True) as get_response:
+                            return self._entry(url, get_response, cached)
+                    return self._entry(url, response, cached)
+            except Exception as error:
+                logger.warning(f"Could not resolve the remote entity {url}: {error}.")
+                if cached:
+                    return dict(cached, from_cache=True, error=str(error))
+                return { "url": url, "status": None, "from_cache": False, "error": str(error) }
+
+    def _entry(self, url, response, cached) -> dict:
+        if response.status == 304 and cached:
+            return dict(cached, checked=time.time(), from_cache=True, error=None)
+
+        content_length = response.headers.get("Content-Length")
+        return {
+            "url": url,
+            "final_url": str(response.url),
+            "status": response.status,
+            "content_type": response.headers.get("Content-Type"),
+            "content_length": int(content_length) if content_length and content_length.isdigit() else None,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "checked": time.time(),
+            "from_cache": False,
+            "error": None,
+        }
+
+    def _offline_entry(self, url, cached) -> dict:
+        if cached:
+            return dict(cached, from_cache=True, offline=True)
+        return { "url": url, "status": None, "from_cache": False, "offline": True, "error": None }
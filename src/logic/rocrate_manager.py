@@ -18,39 +18,93 @@ updating, and loading them from the cache. It also handles the extraction of
 artifacts from these RO-Crates.
 """
 import os
-import logging
-from enum import Enum
-from rocrate.rocrate import ROCrate
+import time
+import threading
+from concurrent.futures import CancelledError
 from pathlib import Path
-from logic.scanner import scanner
-from logic.validator import Validator
+from logic.scanner import scan_crates
+from logic.validator import ValidationCancelled, Validator
 from logic.cache_manager import CacheManager
 from logic.artifact_manager import Artifact
+from logic.remote_resolver import RemoteResolver, is_remote
+from logic.zip_crate import ZipCrate, is_zipped_crate
+from logic.query_engine import ArtifactIndex
+from logic.artifact_tree import PAGE_SIZE, ROOT, ArtifactTree
+from logic.provenance import ProvenanceGraph
+from logic.commands import parse_bool
+from logic.tabular import TableCache, load_table, tabular_delimiter
+from logic.fingerprint import content_id, file_fingerprint, member_fingerprint
+from logic.preview import PREVIEWS_DIRNAME, PreviewCache, generate_preview
+from logic.dataset_summary import DatasetSummaries, summarise_members
+from logic.workflow_index import WORKFLOWS_DIRNAME, WorkflowIndex, is_workflow, summarise_workflow
+from logic.scheduler import (
+    BACKGROUND, DOCUMENT, RECENT, REQUESTED, PriorityScheduler, RecentCrates, may_hold, referenced_crates,
+)
+from logic.content_access import CHUNK_SIZE, shared_registry
+from logic.bundle import link_artifacts, relative_path, relocate
+from logic.shared_cache import SHAREABLE_RESULTS, SharedCache
+from logic.cache_gc import MISSING_CRATE, MOVED_CRATE, CacheCollector, check, disk_usage
+from logic.metrics import METRICS_FILENAME, registry as metrics
 from logic.logger import Logger
-import platformdirs
-import uuid
 import hashlib
 
 # Logger to help keep a trace of any events that occur.
 logger = Logger(__name__).get_logger()
 
+SETUP_SECONDS = metrics.histogram(
+    "rocrate_setup_seconds", "Time spent setting up the manager, by whether the cache was reused or rebuilt.", ("cache",))
+UPDATE_SECONDS = metrics.histogram(
+    "rocrate_update_seconds", "Time spent updating the cache, by outcome.", ("outcome",))
+CACHE_REQUESTS = metrics.counter(
+    "rocrate_cache_requests_total", "Lookups of the preview cache, by result.", ("cache", "result"))
 
-# Paths and directories for storing the cache.
-USER_CACHE_DIR = Path(platformdirs.user_cache_dir())
-ROCRATE_DATA_DIR = Path.joinpath(USER_CACHE_DIR, "rocrate-cache")
-ARTIFACTS_DIR = Path.joinpath(USER_CACHE_DIR, "rocrate-cache/artifacts")
+
+PUBLISH_INTERVAL = 1.0  # seconds between the updates of the query index while the cache is built
 
 
 class ROCratesManager:
-    def __init__(self, directory=os.getcwd()):
-        self.cache_manager = CacheManager()
+    def __init__(self, directory=os.getcwd(), offline=None, document=None, setup=True, shared_cache=None):
+        # The cache is namespaced by the directory, so each project keeps its own cache.
+        self.cache_manager = CacheManager(directory)
+        self.remote_resolver = RemoteResolver(self.cache_manager.data_dir, offline=offline)
+        self.archives = {}  # open zipped RO-Crates, keyed by path
+        self.index = ArtifactIndex()  # query index over the extracted artifacts
+        self.tree = ArtifactTree()  # RO-Crate -> Dataset -> file hierarchy of the artifacts
+        self.nested_rocrates = {}  # RO-Crates nested inside each top level RO-Crate, keyed by path
+        self.provenance = {}  # provenance graph of each RO-Crate, keyed by path
+        self.tables = TableCache()  # parsed tabular artifacts, keyed by content fingerprint
+        self.previews = PreviewCache(os.path.join(self.cache_manager.data_dir, PREVIEWS_DIRNAME))
+        self.summaries = DatasetSummaries(self.cache_manager.data_dir)  # per-directory scans of Datasets
+        self.workflows = WorkflowIndex(os.path.join(self.cache_manager.data_dir, WORKFLOWS_DIRNAME))  # parsed workflows
+        self.collector = CacheCollector(self.cache_manager)  # repairs the cache in the background
+        self.recent = RecentCrates(self.cache_manager.data_dir)  # when each RO-Crate was last accessed
+        self.scheduler = None  # the RO-Crates being processed while the cache is built, see `process_rocrates`
+        self.document = document  # the open document, whose RO-Crates are processed first
+        # The cache shared with other users (see `logic.shared_cache`), by default the one under
+        # `ROCRATE_SHARED_CACHE`, if it is set.
+        self.shared_cache = SharedCache(shared_cache) if shared_cache else SharedCache.from_environment()
+        self.contents = shared_registry  # memory mappings shared by concurrent reads of artifacts
+        self.version = None  # the version token (ETag) of the whole workspace, see `etag`
+        self.rocrate_ids = None  # the identifiers of the indexed RO-Crates, see `workspace_version`
+        self.cancel_update = None  # the cancellation event of the latest update, see `update`
+        self._update_lock = threading.Lock()
+        self._setup_condition = threading.Condition()
+        self._setting_up = False
+        self.setup_error = None
+        self._publish_lock = threading.Lock()
+        self._processed = None  # the RO-Crates processed so far while the cache is built, keyed by path
+        self._published = 0.0  # when the query index was last rebuilt over them
+        metrics.collector("rocrate_manager", self.collect_metrics)
         self.validator = None
         self.setup_done = False
-        self.directory = directory  # TODO: Change the directory to the current working directory of the document.
+        # TODO: Change the directory to the current working directory of the document.
+        self.directory = str(Path(directory).resolve())  # the cache stores paths relative to it
 
-        # Set up the validator when the ROCratesManager is instantiated.
-        logger.info("Setting up the validator, as the ROCratesManager has been instantiated.")
-        self.setup()
+        # Set up the validator when the ROCratesManager is instantiated, unless the caller
+        # sets it up later (see `ensure_setup`).
+        if setup:
+            logger.info("Setting up the validator, as the ROCratesManager has been instantiated.")
+            self.setup()
 
     def setup(self):
         """
@@ -58,20 +112,266 @@ class ROCratesManager:
         the rocrate-validator package.
         """
         if not self.setup_done:
+            start = time.perf_counter()
+            cache = "failed"
             try:
                 # TODO: get the current working directory from the plugin, this has been created as an issue in Stencila's GitHub repository.
-                paths = scanner(self.directory)
-                self.validator = Validator()
+                self.nested_rocrates = scan_crates(self.directory, include_zipped=True)
+                paths = list(self.nested_rocrates)
 
-                # Go through all found RO-Crates and validate them using the rocrate-validator
-                for path in paths:
-                    self.validator.validate_rocrate(path)
+                # Only one process builds the cache at a time, any other process waits here and
+                # then reuses the cache if it was built for the same RO-Crates. The validator is
+                # only set up (which installs its dependencies) once an RO-Crate needs validating.
+                with self.cache_manager.build_lock():
+                    self.validator = Validator(setup=False)
+                    if self.is_cache_current(paths):
+                        logger.info("The RO-Crate cache is already up to date, reusing it.")
+                        self.build_index(self.load_cache_data()["rocrates"])
+                        cache = "reused"
+                    else:
+                        cache = "rebuilt"
+                        previous_rocrates = self.load_cached_rocrates()
 
-                # Store the RO-Crates and their corresponding artifacts to the user cache
-                self.store_rocrates()
+                        # Validate the RO-Crates using the rocrate-validator and store them and their
+                        # artifacts to the user cache, the ones needed first before the rest.
+                        self.process_rocrates(paths, previous_rocrates)
+                self.setup_done = True
+                # The links of artifacts that are no longer extracted are collected once the
+                # build lock is released, rather than clearing every link before the build.
+                self.collect_garbage()
             except Exception as error:
+                cache = "failed"
+                self.setup_error = error
                 logger.error(f"Error encountered during setup: {error}")
                 raise
+            finally:
+                SETUP_SECONDS.observe(time.perf_counter() - start, cache=cache)
+
+    def ensure_setup(self, name=None, timeout=None) -> None:
+        """
+        Sets up the manager, unless it is set up already or another thread is setting it up.
+        In that case, waits for the setup to finish, or with `name` only until the artifact
+        `name` can be looked up (see `request`), whichever comes first.
+        """
+        with self._setup_condition:
+            if self.setup_done:
+                return
+            run = not self._setting_up
+            self._setting_up = True
+        if run:
+            try:
+                self.setup()
+            finally:
+                with self._setup_condition:
+                    self._setting_up = False
+                    self._setup_condition.notify_all()
+            return
+
+        if name is not None and self.request(name, timeout):
+            return
+        with self._setup_condition:
+            if not self._setup_condition.wait_for(lambda: not self._setting_up, timeout):
+                raise TimeoutError(f"The RO-Crate manager was not set up within {timeout} seconds.")
+            if not self.setup_done:
+                raise RuntimeError(f"The RO-Crate manager could not be set up: {self.setup_error}")
+
+    def is_cache_current(self, paths) -> bool:
+        """
+        Checks whether the cache already holds the given RO-Crates, unchanged, with all of
+        their symbolic links in place. This is the case when another plugin instance has
+        just built the cache for the same directory.
+        """
+        try:
+            cached = self.load_cache_data()
+        except FileNotFoundError:
+            return False
+
+        cached_rocrates = { rocrate["path"]: rocrate for rocrate in cached.get("rocrates", []) }
+        if set(cached_rocrates) != set(str(path) for path in paths):
+            return False
+
+        for path, rocrate in cached_rocrates.items():
+            if rocrate["metadata"] != self.hash_metadata(path):
+                return False
+            if rocrate.get("children", []) != self.nested_rocrates.get(path, []):
+                return False
+            for artifact in rocrate["artifacts"] or []:
+                link = artifact.get("symbolic_link")
+                if link and not os.path.islink(link):
+                    return False
+        return True
+
+    def load_cache_data(self) -> dict:
+        """
+        Loads the cache data, with its paths made absolute. The cache stores paths relative
+        to the workspace, so it can be relocated (see `logic.bundle`).
+        """
+        return relocate(self.cache_manager.load_data_from_json(), self.directory,
+                        self.cache_manager.artifacts_dir, to_relative=False)
+
+    def save_cache_data(self, data) -> None:
+        """Saves the cache data, with its paths made relative to the workspace."""
+        self.cache_manager.save_data_to_json(
+            relocate(data, self.directory, self.cache_manager.artifacts_dir, to_relative=True))
+
+    def load_cached_rocrates(self) -> dict:
+        """Returns the RO-Crate entries of the cache keyed by path, or an empty dict if there is no cache."""
+        try:
+            return { rocrate["path"]: rocrate for rocrate in self.load_cache_data()["rocrates"] }
+        except (FileNotFoundError, ValueError, KeyError):
+            return {}
+
+    def validate_rocrates(self, paths, previous_rocrates, cancel=None) -> None:
+        """
+        Validates the RO-Crates at `paths`. An RO-Crate whose metadata has not changed since
+        it was cached keeps its cached result and issues, rather than being validated again,
+        unless its validation timed out. Setting the event `cancel` stops the validations,
+        raising `ValidationCancelled`.
+        """
+        for path in paths:
+            if cancel is not None and cancel.is_set():
+                raise ValidationCancelled("The validation of the RO-Crates was cancelled.")
+            previous = previous_rocrates.get(str(path))
+            metadata = self.hash_metadata(path)
+            unchanged = (previous is not None and previous["metadata"] is not None
+                         and previous["metadata"] == metadata)
+            if unchanged and previous.get("timeouts"):
+                # The timeouts only count against the same metadata, see `Validator.is_quarantined`.
+                self.validator.set_timeouts(path, previous["timeouts"])
+                self.validate_rocrate(path, metadata, cancel)
+            elif unchanged and "issues" in previous:
+                logger.info(f"The metadata of the RO-Crate {path} has not changed, reusing its validation.")
+                self.validator.record(path, previous["valid"], previous["issues"])
+            else:
+                self.validate_rocrate(path, metadata, cancel)
+
+    def validate_rocrate(self, path, metadata, cancel=None) -> None:
+        """
+        Validates the RO-Crate at `path`, unless another user already did and shared the
+        result (see `logic.shared_cache`). The result is then shared, if it only depends
+        on the RO-Crate's content.
+        """
+        shared = self.shared_cache.get_validation(path, metadata) if self.shared_cache else None
+        if shared is not None:
+            logger.info(f"Reusing the shared validation of the RO-Crate {path}.")
+            self.validator.set_timeouts(path, 0)
+            self.validator.record(path, shared["valid"], shared["issues"])
+            return
+
+        result = self.validator.validate_rocrate(path, cancel)
+        if self.shared_cache and result in SHAREABLE_RESULTS:
+            self.shared_cache.put_validation(path, metadata, result == "valid", self.validator.issues.get(path, []))
+
+    def process_rocrates(self, paths, previous_rocrates, version=1) -> None:
+        """
+        Validates and extracts the RO-Crates at `paths` and stores them in the cache, the most
+        urgent first (see `logic.scheduler`): those holding an artifact a lookup waits for,
+        those the open document refers to, the recently accessed ones and then the rest.
+        The processed RO-Crates are added to the query index as they come, so a lookup can
+        be answered before every RO-Crate is processed (see `request`).
+        """
+        def process(path):
+            self.validate_rocrates([path], previous_rocrates)
+            rocrate = self.load_rocrate(path) if path in self.validator.valid_rocrates else None
+            return self.make_rocrate_info(path, Path.joinpath(Path(path), "ro-crate-metadata.json"), rocrate)
+
+        def on_done(path, info, error):
+            if info is not None:
+                self.publish(path, info)
+
+        self._processed = rocrates = {}
+        scheduler = PriorityScheduler(process, on_done=on_done)
+        self.scheduler = scheduler
+        try:
+            for path in self.document_crates(paths):
+                scheduler.submit(path, DOCUMENT)
+            for path in self.recent.recent(paths):
+                scheduler.submit(path, RECENT)
+            for path in paths:
+                scheduler.submit(path, BACKGROUND)
+            scheduler.join()
+        finally:
+            self.scheduler = None
+            self._processed = None
+
+        rocrate_data = { "version": str(version), "rocrates": [rocrates[path] for path in paths if path in rocrates] }
+        self.build_index(rocrate_data["rocrates"])
+        self.save_cache_data(rocrate_data)
+
+    def publish(self, path=None, rocrate=None, force=False) -> None:
+        """
+        Adds the entry `rocrate` of a processed RO-Crate while the cache is built, and
+        rebuilds the query index over those processed so far, at most every
+        `PUBLISH_INTERVAL` seconds unless `force` is set.
+        """
+        with self._publish_lock:
+            if self._processed is None:
+                return
+            if path is not None:
+                self._processed[path] = rocrate
+            now = time.monotonic()
+            if not force and now - self._published < PUBLISH_INTERVAL:
+                return
+            self._published = now
+            self.build_index(list(self._processed.values()))
+
+    def request(self, name, timeout=None) -> bool:
+        """
+        While the cache is being built, moves the RO-Crates that may hold the artifact `name`
+        to the front of the queue and waits (up to `timeout` seconds) until they are
+        processed. Returns whether the artifact can then be looked up.
+        """
+        if self.index.lookup(name):
+            return True
+        scheduler = self.scheduler
+        if scheduler is None:
+            return False
+
+        candidates = [path for path in scheduler.pending() if may_hold(path, name)]
+        for path in scheduler.promote(candidates, REQUESTED):
+            try:
+                scheduler.wait(path, timeout)
+            except (CancelledError, TimeoutError):
+                return False
+            except Exception:
+                pass  # logged by the scheduler, the RO-Crate is left out of the cache
+        if candidates:
+            self.publish(force=True)
+        return bool(self.index.lookup(name))
+
+    def document_crates(self, paths) -> list:
+        """Returns the RO-Crate `paths` the open document (if any) refers to."""
+        if not self.document:
+            return []
+        try:
+            with open(self.document, encoding="utf-8", errors="replace") as f:
+                text = f.read()
+        except OSError as error:
+            logger.warning(f"Error: {error}, encountered when reading the document {self.document}.")
+            return []
+        return referenced_crates(text, paths, self.directory)
+
+    def diagnostics(self, crate=None) -> list:
+        """
+        Returns why RO-Crates are invalid, from the validation issues cached with them (see
+        `logic.diagnostics`): those of the RO-Crate `crate`, given by its path or directory
+        (or zip file) name, or else those of every invalid RO-Crate.
+        """
+        rocrates = list(self.load_cached_rocrates().values())
+        if crate is None:
+            selected = [rocrate for rocrate in rocrates if not rocrate["valid"]]
+        else:
+            key = str(crate).rstrip("/")
+            selected = [
+                rocrate for rocrate in rocrates
+                if rocrate["path"] == key or os.path.basename(rocrate["path"].rstrip("/")) == key
+            ]
+            if not selected:
+                raise ValueError(f"No RO-Crate named {crate} was found.")
+        return [
+            { "crate": rocrate["path"], "valid": rocrate["valid"], "issues": rocrate.get("issues", []) }
+            for rocrate in selected
+        ]
 
     def store_rocrates(self, version=1):
         if not self.validator:
@@ -83,7 +383,7 @@ class ROCratesManager:
         # Go through all valid rocrates found and store them in the cache.
         for path in self.validator.valid_rocrates:
             # Create the RO-Crate instance from the path
-            rocrate = ROCrate(path)
+            rocrate = self.load_rocrate(path)
 
             # Need to extract the current RO-Crate's metadata to store it so, create a path to the metadata file
             metadata_file_path = Path.joinpath(Path(path), "ro-crate-metadata.json")
@@ -105,7 +405,8 @@ class ROCratesManager:
                 logger.error(f"Error reading metadata for {path}: {error}")
 
         # Saving the data to a json file
-        self.cache_manager.save_data_to_json(rocrate_data)
+        self.build_index(rocrate_data["rocrates"])
+        self.save_cache_data(rocrate_data)
 
     def update(self):
         if self.validator is None:
@@ -114,9 +415,37 @@ class ROCratesManager:
 
         logger.info("Updating the cache with the latest RO-Crates.")
 
+        # A newer update supersedes any update still in progress, whose validations are
+        # cancelled so it gives up the build lock as soon as possible.
+        cancel = threading.Event()
+        with self._update_lock:
+            if self.cancel_update is not None:
+                self.cancel_update.set()
+            self.cancel_update = cancel
+
+        start = time.perf_counter()
+        outcome = "failed"
+        try:
+            with self.cache_manager.build_lock():
+                if cancel.is_set():
+                    logger.info("The update was superseded by a newer one before it started.")
+                    outcome = "superseded"
+                    return
+                try:
+                    self._update(cancel)
+                except ValidationCancelled:
+                    logger.info("The update was superseded by a newer one, leaving the cache to it.")
+                    outcome = "superseded"
+                    return
+            outcome = "completed"
+        finally:
+            UPDATE_SECONDS.observe(time.perf_counter() - start, outcome=outcome)
+        self.collect_garbage()
+
+    def _update(self, cancel=None):
         # Load the previous cache data
         try:
-            previous_cache = self.cache_manager.load_data_from_json()
+            previous_cache = self.load_cache_data()
         except FileNotFoundError:
             logger.error("No previous cache found, no need to update.")
             return
@@ -125,25 +454,23 @@ class ROCratesManager:
             return
 
         # Scan for new RO-Crates
-        current_paths = scanner(self.directory)
+        self.nested_rocrates = scan_crates(self.directory, include_zipped=True)
+        current_paths = list(self.nested_rocrates)
         rocrate_data = { "version": str(int(previous_cache["version"]) + 1), "rocrates": [] }
         previous_rocrates = { rocrate["path"]: rocrate for rocrate in previous_cache["rocrates"] }
 
         # Go through all found RO-Crates and validate them using the rocrate-validator
-        self.validator.valid_rocrates.clear()
-        self.validator.invalid_rocrates.clear()
-        self.cache_manager.clear_cache()
-        for path in current_paths:
-            self.validator.validate_rocrate(path)
+        self.validator.reset()
+        self.validate_rocrates(current_paths, previous_rocrates, cancel)
 
         # Handle valid RO-Crates
         for path in self.validator.valid_rocrates:
             # Create the RO-Crate instance from the path
-            rocrate = ROCrate(path)
+            rocrate = self.load_rocrate(path)
             
             # Need to extract the current RO-Crate's metadata to store it so, create a path to the metadata file
             metadata_file_path = Path.joinpath(Path(path), "ro-crate-metadata.json")
-            metadata_hash = self.hash_file(str(metadata_file_path))
+            metadata_hash = self.hash_metadata(path)
 
             # A valid RO-Crate has been found that was previously in the cache
             if path in previous_rocrates:
@@ -186,7 +513,7 @@ class ROCratesManager:
             
             # Need to extract the current RO-Crate's metadata to store it so, create a path to the metadata file
             metadata_file_path = Path.joinpath(Path(path), "ro-crate-metadata.json")
-            metadata_hash = self.hash_file(str(metadata_file_path))
+            metadata_hash = self.hash_metadata(path)
 
             # An invalid RO-Crate has been found that was previously in the cache
             if path in previous_rocrates:
@@ -196,7 +523,11 @@ class ROCratesManager:
                 # still the same rocrate
                 if not old_rocrate["valid"] and old_rocrate["metadata"] == metadata_hash:
                     logger.info(f"RO-Crate at {path} is still invalid but it's contents have not changed.")
-                    rocrate_data["rocrates"].append(old_rocrate)
+                    rocrate_data["rocrates"].append(dict(
+                        old_rocrate,
+                        issues=self.validator.issues.get(path, old_rocrate.get("issues", [])),
+                        timeouts=self.validator.timeouts.get(path, 0),
+                    ))
                 
                 # If it was previously valid and is now invalid, update the cache as long as it is 
                 # still the same rocrate, this case should not happen but it is handled here in case it does.
@@ -231,43 +562,542 @@ class ROCratesManager:
                 updated_rocrate = self.make_rocrate_info(path, metadata_file_path, None)
                 rocrate_data["rocrates"].append(updated_rocrate)
 
-        self.cache_manager.save_data_to_json(rocrate_data)
+        self.build_index(rocrate_data["rocrates"])
+        self.save_cache_data(rocrate_data)
         logger.info("The RO-Crate cache has been updated successfully.")
 
+    def collect_metrics(self) -> list:
+        """Returns the manager's state as metrics, see `MetricsRegistry.collector`."""
+        rocrates = list(self.tree.children.get(ROOT, []))
+        valid = sum(1 for _, node in rocrates if self.tree.nodes[node].get("valid"))
+        return [
+            ("rocrate_crates", "gauge", "RO-Crates in the cache, by validity.", { "valid": "true" }, valid),
+            ("rocrate_crates", "gauge", "RO-Crates in the cache, by validity.", { "valid": "false" }, len(rocrates) - valid),
+            ("rocrate_artifacts", "gauge", "Artifacts indexed for querying.", {}, len(self.index)),
+            ("rocrate_table_cache_requests_total", "counter", "Lookups of the parsed table cache, by result.", { "result": "hit" }, self.tables.hits),
+            ("rocrate_table_cache_requests_total", "counter", "Lookups of the parsed table cache, by result.", { "result": "miss" }, self.tables.misses),
+            ("rocrate_table_cache_bytes", "gauge", "Memory used by the parsed table cache.", {}, self.tables.nbytes),
+            ("rocrate_table_cache_evictions_total", "counter", "Tables evicted from the parsed table cache.", {}, self.tables.evictions),
+        ]
+
+    def metrics(self, fmt="json", path=None):
+        """
+        Returns the plugin's metrics (see `logic.metrics`) as JSON, or in the Prometheus text
+        format with `fmt="prometheus"` (`format=prometheus` as a kernel command). With `path`
+        (or `path=default`, for `metrics.prom` in the workspace's cache), the metrics are
+        written to that file instead.
+        """
+        if path is not None:
+            if path == "default":
+                path = os.path.join(self.cache_manager.data_dir, METRICS_FILENAME)
+            return { "path": metrics.dump(path) }
+        if fmt == "prometheus":
+            return metrics.render()
+        if fmt != "json":
+            raise ValueError(f"Unknown metrics format {fmt}, expected json or prometheus.")
+        return metrics.snapshot()
+
+    def collect_garbage(self) -> None:
+        """
+        Repairs the cache in the background (see `logic.cache_gc`), reindexing the artifacts
+        if stale RO-Crates were removed from it.
+        """
+        def on_repair(report):
+            if any(issue["kind"] in (MISSING_CRATE, MOVED_CRATE) for issue in report["repaired"]):
+                self.build_index(self.load_cache_data()["rocrates"])
+
+        self.collector.start(list(self.nested_rocrates), on_repair)
+
+    def fsck(self, repair=False) -> dict:
+        """
+        Checks the integrity of the cache, finding stale RO-Crates and dangling, orphaned or
+        missing symbolic links. With `repair`, repairs them all (without a time budget).
+        """
+        issues = check(self.cache_manager, list(self.nested_rocrates))
+        result = { "issues": issues }
+        if parse_bool(repair) and issues:
+            report = self.collector.run(list(self.nested_rocrates), budget=float("inf"))
+            if report is None:
+                raise ValueError("The cache is being built, try again once it is done.")
+            result["repaired"] = len(report["repaired"])
+            result["errors"] = report["errors"]
+            self.build_index(self.load_cache_data()["rocrates"])
+        return result
+
+    def disk_usage(self) -> dict:
+        """Reports the disk usage of the cache of each workspace, see `logic.cache_gc.disk_usage`."""
+        return disk_usage(self.cache_manager)
+
     def hash_file(self, path):
         cwd = Path(os.getcwd())
         file_path = cwd / path
         file_content = None
 
         try:
+            # Hashed in chunks, so a huge metadata file is never held in memory whole.
+            digest = hashlib.sha256()
             with open(file_path, "rb") as f:
-                file_content = f.read()
-            return hashlib.sha256(file_content).hexdigest()
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+            return digest.hexdigest()
         except Exception as e:
             logger.error(f"RO-Crate {path} cannot be hashed")
             return file_content
 
-    def extract_artifacts(self, rocrate):
+    def hash_metadata(self, rocrate_path):
+        """
+        Hashes the `ro-crate-metadata.json` of the RO-Crate at `rocrate_path`. For zipped
+        RO-Crates only the metadata member is read from the archive.
+        """
+        if is_zipped_crate(rocrate_path):
+            try:
+                with ZipCrate(rocrate_path) as rocrate:
+                    return hashlib.sha256(rocrate.read_metadata_bytes()).hexdigest()
+            except Exception as error:
+                logger.error(f"RO-Crate {rocrate_path} cannot be hashed: {error}")
+                return None
+        return self.hash_file(str(Path.joinpath(Path(rocrate_path), "ro-crate-metadata.json")))
+
+    def load_rocrate(self, rocrate_path):
+        """Loads the RO-Crate at `rocrate_path`, zipped RO-Crates are read without extracting them."""
+        if is_zipped_crate(rocrate_path):
+            return self.open_archive(rocrate_path)
+        # Imported here so that rocrate (slow to import) is only loaded when a crate is read.
+        from rocrate.rocrate import ROCrate
+        return ROCrate(rocrate_path)
+
+    def open_archive(self, rocrate_path) -> ZipCrate:
+        """
+        Returns the open `ZipCrate` for a zipped RO-Crate, so the artifacts inside it can be
+        read lazily. Archives are kept open for reuse until `close_archives()` is called.
+        """
+        key = str(rocrate_path)
+        if key not in self.archives:
+            self.archives[key] = ZipCrate(rocrate_path)
+        return self.archives[key]
+
+    def close_archives(self) -> None:
+        for archive in self.archives.values():
+            archive.close()
+        self.archives.clear()
+
+    def extract_artifacts(self, rocrate, provenance=None):
         """
         Extracts artifacts from the RO-Crate and stores them in the cache
         """
         artifacts = []
         entities = rocrate.data_entities
+        if provenance is None:
+            provenance = ProvenanceGraph.from_rocrate(rocrate)
+
+        # Remote (web) entities are resolved together, so their requests are made concurrently.
+        remote = self.remote_resolver.resolve(entity.id for entity in entities if is_remote(entity.id))
+
+        crate = relative_path(rocrate.source, self.directory)
         for entity in entities:
-            artifact = Artifact(rocrate, entity)
-            artifacts.append(artifact.extract_artifact())
+            artifact = Artifact(rocrate, entity, self.cache_manager.artifacts_dir)
+            lineage = {
+                "inputs": provenance.upstream(entity.id, transitive=False),
+                "outputs": provenance.downstream(entity.id, transitive=False),
+            }
+            info = artifact.extract_artifact(
+                remote=remote.get(entity.id),
+                provenance=lineage if lineage["inputs"] or lineage["outputs"] else None,
+            )
+            fingerprint = info["fingerprint"] = self.content_hash(rocrate, info)
+            # The identifier changes with the artifact's metadata or content, so it is also
+            # the artifact's version token (ETag).
+            info["uid"] = content_id(crate, entity.id, info["metadata"], fingerprint)
+            if fingerprint and is_workflow(info["type"]) and info.get("remote") is None:
+                info["workflow"] = self.index_workflow(rocrate, info, fingerprint)
+            artifacts.append(info)
         return artifacts
 
+    def content_hash(self, rocrate, artifact) -> str | None:
+        """
+        Returns the fingerprint of an artifact's content: of its file, of its member in a
+        zipped RO-Crate, or of the validators (ETag, Last-Modified) of a remote entity.
+        Directories have no content of their own, only their metadata.
+        """
+        if artifact.get("remote") is not None:
+            remote = artifact["remote"]
+            return ":".join(str(remote.get(key) or "") for key in ("etag", "last_modified", "content_length"))
+        try:
+            if artifact.get("archive"):
+                return member_fingerprint(rocrate.info(artifact["id"]))
+            path = os.path.join(rocrate.source, artifact["id"])
+            return file_fingerprint(path) if os.path.isfile(path) else None
+        except (OSError, KeyError) as error:
+            logger.warning(f"Error: {error}, encountered when fingerprinting the artifact {artifact['id']}.")
+            return None
+
+    def index_workflow(self, rocrate, artifact, fingerprint) -> dict | None:
+        """
+        Parses the workflow `artifact` into its graph of steps (see `logic.workflow_index`)
+        and stores it by its content `fingerprint`, unless an unchanged copy is already
+        stored. Returns the counts of its inputs, steps and outputs, kept with the artifact.
+        """
+        path = os.path.join(rocrate.source, artifact["id"])
+
+        def opener():
+            return rocrate.open(artifact["id"]) if artifact.get("archive") else open(path, "rb")
+        try:
+            graph = self.workflows.index(fingerprint, artifact.get("size"), opener, artifact["id"])
+        except (OSError, KeyError, ImportError) as error:
+            logger.warning(f"Error: {error}, encountered when indexing the workflow {artifact['id']}.")
+            return None
+        return summarise_workflow(graph) if not graph.get("error") else { "error": graph["error"] }
+
+    def build_index(self, rocrates) -> None:
+        """Builds the query index and tree over the artifacts of the given RO-Crate entries."""
+        self.index = ArtifactIndex.from_rocrates(rocrates)
+        self.tree = ArtifactTree.from_rocrates(rocrates, self.directory)
+        self.provenance = {
+            rocrate["path"]: ProvenanceGraph.from_dict(rocrate["provenance"])
+            for rocrate in rocrates if rocrate.get("provenance")
+        }
+        self.rocrate_ids = sorted(str(rocrate.get("uuid")) for rocrate in rocrates)
+        self.version = self.workspace_version(artifact.get("uid") for artifact in self.index.artifacts)
+        logger.info(f"Indexed {len(self.index)} artifacts for querying.")
+
+    def workspace_version(self, uids) -> str:
+        """
+        Returns the version token of the workspace, given the identifiers of its artifacts:
+        it changes with any RO-Crate's metadata (see `make_rocrate_info`) and any artifact's
+        metadata or content.
+        """
+        return content_id(*self.rocrate_ids, *sorted(str(uid) for uid in uids))
+
+    def lineage(self, name, direction="upstream", transitive=True) -> list:
+        """
+        Looks up the provenance of the artifact `name` (a pseudonym or entity id) in every
+        RO-Crate holding it, using the precomputed provenance graphs.
+
+        params:
+            direction: str - "upstream" for the entities it was derived from, "downstream"
+                for the entities derived from it.
+            transitive: bool - follow the whole chain, rather than only the direct links.
+        """
+        if direction not in ("upstream", "downstream"):
+            raise ValueError(f"Unknown direction {direction}, expected upstream or downstream.")
+
+        matches = [(artifact["crate"], artifact["id"]) for artifact in self.index.lookup(name)]
+        if not matches:
+            # Not a data entity, e.g. a workflow parameter, so look for it in the graphs directly.
+            matches = [
+                (crate, name) for crate, graph in self.provenance.items()
+                if name in graph.inputs or name in graph.outputs
+            ]
+
+        results = []
+        for crate, entity_id in matches:
+            graph = self.provenance.get(crate)
+            if graph is None:
+                continue
+            result = { "crate": crate, "id": entity_id }
+            if direction == "upstream":
+                result["inputs"] = graph.upstream(entity_id, transitive)
+                result["actions"] = graph.producers(entity_id)
+            else:
+                result["outputs"] = graph.downstream(entity_id, transitive)
+            results.append(result)
+        return results
+
+    def inputs(self, name, transitive=True) -> list:
+        """Returns the inputs that produced the artifact `name`, see `lineage`."""
+        return self.lineage(name, "upstream", parse_bool(transitive))
+
+    def dependents(self, name, transitive=True) -> list:
+        """Returns the downstream outputs that depend on the artifact `name`, see `lineage`."""
+        return self.lineage(name, "downstream", parse_bool(transitive))
+
+    def query(self, entity_type=None, encoding_format=None, author=None, crate=None, text=None,
+              min_size=None, max_size=None, since=None, until=None, limit=None):
+        """
+        Finds the artifacts matching all of the given filters, see `ArtifactIndex.query`.
+        Numeric filters may be given as strings, as they are when they come from the kernel
+        (where `entity_type` is given as `type`).
+        """
+        return self.index.query(
+            entity_type=entity_type, encoding_format=encoding_format, author=author, crate=crate, text=text,
+            min_size=int(min_size) if min_size is not None else None,
+            max_size=int(max_size) if max_size is not None else None,
+            since=since, until=until,
+            limit=int(limit) if limit is not None else None,
+        )
+
+    def ls(self, node=ROOT, limit=PAGE_SIZE, cursor=None) -> dict:
+        """
+        Lists one page of the children of a node of the artifact tree (the RO-Crates of the
+        workspace by default), see `ArtifactTree.children_page`. The page's `next` cursor
+        fetches the following page.
+        """
+        page = self.tree.children_page(node, int(limit), cursor)
+        return dict(page, path=self.tree.path(node))
+
+    def find_artifact(self, name) -> dict:
+        """
+        Returns the indexed artifact whose pseudonym or entity id is `name`. Looking an
+        artifact up is not an access of its RO-Crate, see `access_artifact`.
+        """
+        artifacts = self.index.lookup(name)
+        if not artifacts:
+            raise ValueError(f"No artifact named {name} was found.")
+        return artifacts[0]
+
+    def access_artifact(self, name) -> dict:
+        """
+        Returns the artifact `name` (see `find_artifact`) for its content to be read, and
+        records the access of its RO-Crate, so the next start processes it first.
+        """
+        artifact = self.find_artifact(name)
+        self.recent.touch(artifact["crate"])
+        return artifact
+
+    def artifact_path(self, artifact) -> str:
+        """Returns the path of a (local, unzipped) artifact's file."""
+        return os.path.join(artifact["crate"], artifact["id"])
+
+    def load_table(self, name, max_rows=None):
+        """
+        Loads the tabular (CSV or TSV) artifact `name` into a `Table`, keeping only the
+        first `max_rows` rows if given (see `logic.tabular.load_table`). Parsed tables are
+        cached by the artifact's content fingerprint, so loading an unchanged artifact
+        again reuses the parsed table.
+        """
+        artifact = self.access_artifact(name)
+        delimiter = tabular_delimiter(artifact.get("encoding_format"), artifact["id"])
+        if delimiter is None:
+            raise ValueError(f"The artifact {name} is not a tabular (CSV or TSV) artifact.")
+
+        key, size, opener = self.artifact_content(artifact)
+        if max_rows is not None:
+            key = f"{key}:{max_rows}"
+
+        def loader():
+            with opener() as f:
+                return load_table(f, delimiter, max_rows=max_rows)
+
+        return self.tables.get_or_load(key, loader)
+
+    def artifact_content(self, artifact) -> tuple:
+        """
+        Returns `(fingerprint, size, opener)` for the content of a local or zipped artifact,
+        where `opener()` opens the content as a seekable binary file.
+        """
+        if artifact.get("remote") is not None:
+            raise ValueError(f"The artifact {artifact['id']} is remote, its content is not available locally.")
+
+        if artifact.get("archive"):
+            archive = self.open_archive(artifact["archive"]["path"])
+            info = archive.info(artifact["id"])
+            return member_fingerprint(info), info.file_size, lambda: archive.open(artifact["id"])
+
+        path = self.artifact_path(artifact)
+        if not os.path.isfile(path):
+            raise ValueError(f"The file of the artifact {artifact['id']} was not found at {path}.")
+        return file_fingerprint(path), os.path.getsize(path), lambda: open(path, "rb")
+
+    def open_content(self, name):
+        """
+        Opens the content of the artifact `name` for zero-copy reads (see
+        `logic.content_access`). Close the returned handle, or use it as a context manager:
+
+            with manager.open_content("results.bin") as content:
+                header = content.read(0, 512)
+        """
+        artifact = self.access_artifact(name)
+        if artifact.get("remote") is not None:
+            raise ValueError(f"The artifact {name} is remote, its content is not available locally.")
+        if artifact.get("archive"):
+            archive = self.open_archive(artifact["archive"]["path"])
+            return self.contents.open_member(archive, artifact["id"])
+
+        path = self.artifact_path(artifact)
+        if not os.path.isfile(path):
+            raise ValueError(f"The file of the artifact {name} was not found at {path}.")
+        return self.contents.open_file(path)
+
+    def read_artifact(self, name, offset=0, length=None) -> bytes:
+        """Reads `length` bytes (or up to the end) of the artifact `name` from `offset`."""
+        with self.open_content(name) as content:
+            return bytes(content.read(int(offset), int(length) if length is not None else None))
+
+    def iter_artifact(self, name, chunk_size=CHUNK_SIZE, offset=0, length=None):
+        """Yields the content of the artifact `name` in chunks, without copying the whole file."""
+        with self.open_content(name) as content:
+            yield from content.iter_chunks(chunk_size, offset, length)
+
+    def preview(self, name) -> dict:
+        """
+        Returns the preview of the artifact `name` (see `logic.preview`), generating it on
+        first access. Previews are cached by content, so an unchanged artifact is read once.
+        """
+        artifact = self.access_artifact(name)
+        key, size, opener = self.artifact_content(artifact)
+
+        preview = self.previews.get(key)
+        CACHE_REQUESTS.inc(cache="preview", result="miss" if preview is None else "hit")
+        if preview is None:
+            logger.info(f"Generating the preview of {name}.")
+            with opener() as f:
+                preview, thumbnail = generate_preview(f, size, artifact["id"])
+            preview = self.previews.put(key, preview, thumbnail)
+        return dict(preview, name=name, id=artifact["id"])
+
+    def summary(self, name, refresh=False) -> dict:
+        """
+        Summarises the Dataset (directory) artifact `name`: its total size, number of files and
+        directories, newest modification time and the media types of its files, see
+        `logic.dataset_summary`. Only the directories that changed since the last summary are
+        scanned again, unless `refresh` is set.
+        """
+        artifact = self.access_artifact(name)
+        if artifact.get("remote") is not None:
+            raise ValueError(f"The artifact {name} is remote, its content is not available locally.")
+
+        if artifact.get("archive"):
+            archive = self.open_archive(artifact["archive"]["path"])
+            prefix = archive.member_name(artifact["id"]).rstrip("/") + "/"
+            members = archive.members(artifact["id"])
+            if not members:
+                raise ValueError(f"The artifact {name} is not a directory.")
+            summary = summarise_members(members, prefix)
+        else:
+            path = self.artifact_path(artifact)
+            if not os.path.isdir(path):
+                raise ValueError(f"The artifact {name} is not a directory.")
+            summary = self.summaries.summarise(path, parse_bool(refresh))
+        return dict(summary, name=name, id=artifact["id"])
+
+    def workflow(self, name, step=None) -> dict:
+        """
+        Returns the graph of the workflow artifact `name`: its inputs, steps (with their tools,
+        connections and parameters) and outputs, see `logic.workflow_index`. The graph is read
+        from the index built when the RO-Crate was extracted, the workflow is only parsed if
+        it changed since. With `step`, only the step with that id or label is returned.
+        """
+        artifact = self.access_artifact(name)
+        if not is_workflow(artifact.get("type")):
+            raise ValueError(f"The artifact {name} is not a workflow.")
+        key, size, opener = self.artifact_content(artifact)
+
+        graph = self.workflows.get(key)
+        CACHE_REQUESTS.inc(cache="workflow", result="miss" if graph is None else "hit")
+        if graph is None:
+            graph = self.workflows.index(key, size, opener, artifact["id"])
+        if graph.get("error"):
+            raise ValueError(f"The workflow {name} could not be indexed: {graph['error']}")
+
+        if step is not None:
+            for candidate in graph["steps"]:
+                if str(step) in (candidate["id"], candidate.get("label")):
+                    return dict(candidate, artifact=name)
+            raise ValueError(f"The workflow {name} has no step {step}.")
+        return dict(graph, artifact=name, id=artifact["id"])
+
+    def etag(self, name=None) -> str | None:
+        """
+        Returns the version token (ETag) of the artifact `name`, or of the whole workspace.
+        Tokens are derived from the metadata and content, so a client holding a token can
+        tell whether anything changed without fetching the artifacts again (see `changed`).
+        """
+        if name is None:
+            if self.rocrate_ids is not None:
+                self.version = self.workspace_version(self.artifact_uid(artifact) for artifact in self.index.artifacts)
+            return self.version
+        return self.artifact_uid(self.find_artifact(name))
+
+    def artifact_uid(self, artifact) -> str | None:
+        """
+        Returns the current identifier of an indexed `artifact`. The identifier of a local
+        file is derived again from its current fingerprint (memoised, see
+        `logic.fingerprint`), so it changes as soon as the file is edited, even before the
+        cache is updated. Zipped and remote artifacts keep the identifier they were
+        extracted with.
+        """
+        if artifact.get("remote") is not None or artifact.get("archive"):
+            return artifact.get("uid")
+        path = self.artifact_path(artifact)
+        try:
+            fingerprint = file_fingerprint(path) if os.path.isfile(path) else None
+        except OSError as error:
+            logger.warning(f"Error: {error}, encountered when fingerprinting the artifact {artifact['id']}.")
+            return artifact.get("uid")
+        return content_id(relative_path(artifact["crate"], self.directory), artifact["id"], artifact["metadata"], fingerprint)
+
+    def changed(self, etag, name=None) -> dict:
+        """
+        Answers a conditional request: whether the artifact `name` (or the workspace) has
+        changed since the version token `etag` was handed out, with its current token.
+        """
+        current = self.etag(name)
+        return { "changed": current is None or current != etag, "etag": current }
+
     def load_artifacts(self):
         return self.cache_manager.load_cache()
     
+    def extract_rocrate(self, rocrate_path, metadata, rocrate) -> tuple:
+        """
+        Extracts the artifacts and provenance of a valid RO-Crate, or reads them from the
+        shared cache if another user already extracted the same RO-Crate (only linking the
+        artifacts into this user's cache), see `logic.shared_cache`.
+
+        returns:
+            (list, dict | None) - the artifacts, and the provenance graph as a dict.
+        """
+        artifacts_dir = self.cache_manager.artifacts_dir
+        # The artifacts' records also depend on their content (fingerprints, sizes), so the
+        # shared records of an RO-Crate whose files changed but not its metadata are not used.
+        data = self.data_fingerprint(rocrate) if self.shared_cache else None
+        shared = self.shared_cache.get_artifacts(rocrate_path, metadata, data, artifacts_dir) if self.shared_cache else None
+        if shared is not None:
+            logger.info(f"Reusing the shared artifacts of the RO-Crate {rocrate_path}.")
+            crate = relative_path(rocrate_path, self.directory)
+            for artifact in shared["artifacts"]:
+                artifact["uid"] = content_id(crate, artifact["id"], artifact["metadata"], artifact.get("fingerprint"))
+            try:
+                link_artifacts({ "path": str(rocrate_path), "artifacts": shared["artifacts"] }, self.directory, artifacts_dir)
+            except OSError as error:
+                logger.warning(f"Error: {error}, encountered when linking the shared artifacts of {rocrate_path}.")
+            return shared["artifacts"], shared["provenance"]
+
+        provenance = ProvenanceGraph.from_rocrate(rocrate)
+        artifacts = self.extract_artifacts(rocrate, provenance)
+        provenance = provenance.to_dict()
+        if self.shared_cache:
+            self.shared_cache.put_artifacts(rocrate_path, metadata, data, artifacts_dir, artifacts, provenance)
+        return artifacts, provenance
+
+    def data_fingerprint(self, rocrate) -> str:
+        """
+        Returns the fingerprint of the content of the RO-Crate's local data entities (their
+        files, or members of a zipped RO-Crate), see `content_hash`. Remote entities are left
+        out, their content is only known through the validators resolved on extraction.
+        """
+        zipped = getattr(rocrate, "is_zipped", False) is True
+        fingerprints = []
+        for entity in rocrate.data_entities:
+            if not is_remote(entity.id):
+                fingerprint = self.content_hash(rocrate, { "id": entity.id, "archive": zipped })
+                fingerprints.append(f"{entity.id}:{fingerprint or ''}")
+        return content_id(*sorted(fingerprints))
+
     def make_rocrate_info(self, rocrate_path, metadata_file_path, rocrate=None):
+        metadata = self.hash_metadata(rocrate_path)
+        artifacts, provenance = self.extract_rocrate(rocrate_path, metadata, rocrate) if rocrate else (None, None)
         info = {
-            "uuid": str(uuid.uuid4()),
+            # Derived from the workspace-relative path and the metadata, so an unchanged
+            # RO-Crate keeps its identifier across rebuilds, processes and checkouts.
+            "uuid": content_id(relative_path(rocrate_path, self.directory), metadata),
             "path": str(rocrate_path),
-            "metadata": self.hash_file(str(metadata_file_path)),
-            "artifacts": self.extract_artifacts(rocrate) if rocrate else None,
+            "metadata": metadata,
+            "artifacts": artifacts,
             "valid": True if rocrate else False,
+            "children": self.nested_rocrates.get(str(rocrate_path), []),
+            "provenance": provenance,
+            "issues": self.validator.issues.get(str(rocrate_path), []) if self.validator else [],
+            "timeouts": self.validator.timeouts.get(str(rocrate_path), 0) if self.validator else 0,
         }
         return info
 
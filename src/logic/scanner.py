@@ -26,24 +26,118 @@ also handles the notification to the user when an RO-Crate is detected.
 """
 import os
 from logic.logger import Logger
+from logic.json_codec import GraphReader
+from logic.zip_crate import zipped_crate_paths
+from logic.remote_resolver import is_remote
 
 # Logger to help keep a trace of any events that occur.
 logger = Logger(__name__).get_logger()
 
 
-def scanner(directory):
+METADATA_FILENAME = "ro-crate-metadata.json"
+ROCRATE_PROFILE = "https://w3id.org/ro/crate"
+
+
+def scanner(directory, include_zipped=False):
     """
     Scans the given `directory` for RO-Crate files, and returns a list of
     these directories as strings.
+
+    When `include_zipped` is set, RO-Crates packaged as `.zip` files are also
+    returned (as the paths of the zip files). Only the zip's central directory
+    is read to detect them.
+
+    RO-Crates nested inside another RO-Crate are not returned, see `scan_crates`.
+    """
+    return list(scan_crates(directory, include_zipped))
+
+
+def scan_crates(directory, include_zipped=False):
+    """
+    Scans the given `directory` for RO-Crates, and returns a dict from the path of
+    each top level RO-Crate to the list of the RO-Crates nested inside it.
+
+    Once an RO-Crate is found, the walk is guided by its `hasPart` data entities:
+    the payload directories it describes are not walked, only the directories it
+    does not describe are. A payload directory is still walked, in full, when it
+    directly holds an `ro-crate-metadata.json`, or when it or an entity below it
+    is declared an RO-Crate (`conformsTo` the RO-Crate profile). RO-Crates deeper
+    inside any other payload directory are not found.
     """
     if directory is None:
       logger.warning("Error: provided directory is none")
-      return []
+      return {}
     logger.info(f"Scanning directory: {directory} for RO-Crate files.")
-    paths = []
+    crates = {}
+    owners = {}  # the top level RO-Crate each directory being walked belongs to
+
     for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file == "ro-crate-metadata.json":
-                paths.append(root)
-                logger.info(f"RO-Crate detected in {root}.")
-    return paths
+        owner = owners.pop(root, None)
+        is_crate = METADATA_FILENAME in files
+
+        if is_crate and owner is None:
+            crates[root] = []
+            owner = root
+            logger.info(f"RO-Crate detected in {root}.")
+        elif is_crate:
+            crates[owner].append(root)
+            logger.info(f"Nested RO-Crate detected in {root}, recording it as part of {owner}.")
+
+        if include_zipped:
+            for path in zipped_crate_paths(files, root):
+                if owner is None:
+                    crates[path] = []
+                    logger.info(f"Zipped RO-Crate detected at {path}.")
+                else:
+                    crates[owner].append(path)
+                    logger.info(f"Nested zipped RO-Crate detected at {path}, recording it as part of {owner}.")
+
+        if is_crate:
+            payload, subcrates = payload_directories(os.path.join(root, METADATA_FILENAME))
+            dirs[:] = [
+                name for name in dirs
+                if name not in payload or name in subcrates
+                or os.path.isfile(os.path.join(root, name, METADATA_FILENAME))
+            ]
+        if owner is not None:
+            for name in dirs:
+                owners[os.path.join(root, name)] = owner
+    return crates
+
+
+def payload_directories(metadata_path):
+    """
+    Reads the RO-Crate metadata file and returns the names of the top level
+    directories holding its payload (i.e. `hasPart` data entities), and those of
+    them that are declared to be RO-Crates themselves. The metadata is streamed
+    (see `GraphReader`), only the `hasPart` and `conformsTo` of entities are kept.
+    """
+    parts, conforms = {}, {}  # the hasPart and conformsTo of each entity, keyed by @id
+    try:
+        with open(metadata_path, "rb") as f:
+            for entity in GraphReader(f):
+                if isinstance(entity, dict) and "@id" in entity:
+                    parts[entity["@id"]] = entity.get("hasPart", [])
+                    conforms[entity["@id"]] = entity.get("conformsTo", [])
+    except Exception as error:
+        logger.warning(f"Could not read {metadata_path} ({error}), walking all of its directories.")
+        return set(), set()
+
+    payload, subcrates = set(), set()
+    for entity_parts in parts.values():
+        for part in entity_parts if isinstance(entity_parts, list) else [entity_parts]:
+            part_id = part.get("@id") if isinstance(part, dict) else None
+            if not isinstance(part_id, str) or is_remote(part_id) or part_id.startswith("#"):
+                continue
+            part_id = part_id[2:] if part_id.startswith("./") else part_id
+            name, separator, _ = part_id.partition("/")
+            if not separator or not name:
+                continue
+            payload.add(name)
+
+            conforms_to = conforms.get(part.get("@id"), [])
+            conforms_to = conforms_to if isinstance(conforms_to, list) else [conforms_to]
+            profiles = [profile.get("@id", "") if isinstance(profile, dict) else str(profile) for profile in conforms_to]
+            if any(profile.startswith(ROCRATE_PROFILE) for profile in profiles):
+                subcrates.add(name)
+    return payload, subcrates
@@ -0,0 +1,294 @@
+# Copyright 2024 victoriahendersonn
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Priority scheduling of the processing (validation and extraction) of RO-Crates.
+
+Building the cache processes every RO-Crate of the workspace, which can take minutes,
+while a document usually needs a few of them. `PriorityScheduler` processes the RO-Crates
+on worker threads, most urgent first:
+
+    REQUESTED   - holding an artifact a pending request (e.g. `get_variable`) waits for.
+    DOCUMENT    - referred to by the open document.
+    RECENT      - accessed recently (see `RecentCrates`), most recent first.
+    BACKGROUND  - every other RO-Crate, in the order they were found.
+
+A queued RO-Crate can be promoted at any time, e.g. when a request arrives for one of its
+artifacts, and a caller can wait for just that RO-Crate rather than the whole build.
+"""
+import os
+import time
+import heapq
+import itertools
+import threading
+import zipfile
+from concurrent.futures import CancelledError
+from logic import json_codec
+from logic.file_lock import FileLock, atomic_write
+from logic.metrics import registry as metrics
+from logic.logger import Logger
+
+# Logger to help keep a trace of any events that occur.
+logger = Logger(__name__).get_logger()
+
+
+REQUESTED, DOCUMENT, RECENT, BACKGROUND = range(4)
+PRIORITY_NAMES = { REQUESTED: "requested", DOCUMENT: "document", RECENT: "recent", BACKGROUND: "background" }
+WORKERS = 2  # RO-Crates processed at once, each validation runs its own validator process
+
+RECENT_FILENAME = "recent_crates.json"
+RECENT_LOCK_FILENAME = "recent_crates.json.lock"
+RECENT_WINDOW = 7 * 24 * 60 * 60  # seconds an access counts as recent
+RECENT_TOUCH_INTERVAL = 60  # seconds between the recorded accesses of an RO-Crate, per process
+
+QUEUED, RUNNING, DONE, CANCELLED = "queued", "running", "done", "cancelled"
+
+WAIT_SECONDS = metrics.histogram(
+    "rocrate_scheduler_wait_seconds", "Time RO-Crates waited in the queue before being processed, by priority.", ("priority",))
+PROCESS_SECONDS = metrics.histogram(
+    "rocrate_scheduler_process_seconds", "Time spent processing RO-Crates, by priority.", ("priority",))
+
+
+class PriorityScheduler:
+    """
+    Runs `process(key)` for each submitted key on worker threads, the lowest priority value
+    first and in submission order within a priority.
+
+    params:
+        process: function - processes a key (e.g. an RO-Crate's path), returning its result.
+        workers: int - the number of keys processed at once.
+        on_done: function | None - called as `on_done(key, result, error)` on the worker
+            thread once a key is processed, `error` being the exception it raised, if any.
+    """
+    def __init__(self, process, workers=WORKERS, on_done=None):
+        self.process = process
+        self.workers = workers
+        self.on_done = on_done
+        self.results = {}
+        self.errors = {}
+        self._heap = []  # (priority, sequence, key), with stale entries for promoted keys
+        self._sequence = itertools.count()
+        self._priorities = {}  # the current priority of each key
+        self._submitted = {}  # the time each key was queued at its current priority
+        self._states = {}
+        self._active = 0  # worker threads running, which exit once the queue is empty
+        self._condition = threading.Condition()
+
+    def submit(self, key, priority=BACKGROUND) -> bool:
+        """
+        Queues `key` at `priority`, or promotes it if it is queued at a lower priority.
+        Keys being or already processed are left alone.
+
+        returns:
+            bool - whether the key is queued or being processed.
+        """
+        with self._condition:
+            state = self._states.get(key)
+            if state in (RUNNING, DONE, CANCELLED):
+                return state == RUNNING
+            if state == QUEUED and priority >= self._priorities[key]:
+                return True
+            if state == QUEUED:
+                logger.info(f"Promoting {key} to the {PRIORITY_NAMES.get(priority, priority)} priority.")
+            self._states[key] = QUEUED
+            self._priorities[key] = priority
+            self._submitted[key] = time.monotonic()
+            heapq.heappush(self._heap, (priority, next(self._sequence), key))
+            self._start_workers()
+            return True
+
+    def promote(self, keys, priority=REQUESTED) -> list:
+        """Promotes the `keys` that are queued, returning those that are queued or being processed."""
+        return [key for key in keys if key in self._states and self.submit(key, priority)]
+
+    def _start_workers(self) -> None:
+        # Called holding the condition, as is `_next`, so a worker cannot exit unnoticed.
+        while self._active < min(self.workers, len(self._heap)):
+            self._active += 1
+            threading.Thread(target=self._work, name="rocrate-scheduler", daemon=True).start()
+
+    def _next(self):
+        """Pops the most urgent queued key, or returns None (and retires the worker) once the queue is empty."""
+        with self._condition:
+            while self._heap:
+                priority, _, key = heapq.heappop(self._heap)
+                if self._states.get(key) == QUEUED and self._priorities[key] == priority:
+                    self._states[key] = RUNNING
+                    return key, priority, time.monotonic() - self._submitted[key]
+            self._active -= 1
+            return None
+
+    def _work(self) -> None:
+        while True:
+            job = self._next()
+            if job is None:
+                return
+            key, priority, waited = job
+            label = PRIORITY_NAMES.get(priority, str(priority))
+            WAIT_SECONDS.observe(waited, priority=label)
+            result = error = None
+            try:
+                with PROCESS_SECONDS.time(priority=label):
+                    result = self.process(key)
+            except Exception as exception:
+                error = exception
+                logger.error(f"Error: {exception}, encountered when processing {key}.")
+            if self.on_done is not None:
+                try:
+                    self.on_done(key, result, error)
+                except Exception as exception:
+                    logger.error(f"Error: {exception}, encountered after processing {key}.")
+            with self._condition:
+                if error is None:
+                    self.results[key] = result
+                else:
+                    self.errors[key] = error
+                self._states[key] = DONE
+                self._condition.notify_all()
+
+    def state(self, key) -> str | None:
+        """Returns whether `key` is "queued", "running", "done" or "cancelled", or None if it was never submitted."""
+        return self._states.get(key)
+
+    def pending(self) -> list:
+        """Returns the keys queued or being processed, most urgent first."""
+        with self._condition:
+            keys = [key for key, state in self._states.items() if state in (QUEUED, RUNNING)]
+            return sorted(keys, key=lambda key: (self._states[key] != RUNNING, self._priorities[key]))
+
+    def wait(self, key, timeout=None):
+        """
+        Waits until `key` is processed, returning its result or raising its error. Raises
+        `TimeoutError` if it is not processed within `timeout` seconds, and
+        `concurrent.futures.CancelledError` if it was cancelled.
+        """
+        with self._condition:
+            if key not in self._states:
+                raise KeyError(f"{key} was never submitted.")
+            if not self._condition.wait_for(lambda: self._states[key] in (DONE, CANCELLED), timeout):
+                raise TimeoutError(f"{key} was not processed within {timeout} seconds.")
+            if self._states[key] == CANCELLED:
+                raise CancelledError(f"The processing of {key} was cancelled.")
+            if key in self.errors:
+                raise self.errors[key]
+            return self.results[key]
+
+    def join(self, timeout=None) -> bool:
+        """Waits until every submitted key is processed (or cancelled), returning False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not any(state in (QUEUED, RUNNING) for state in self._states.values()), timeout)
+
+    def cancel(self) -> None:
+        """Cancels the queued keys. Those being processed run to the end."""
+        with self._condition:
+            for key, state in self._states.items():
+                if state == QUEUED:
+                    self._states[key] = CANCELLED
+            self._heap.clear()
+            self._condition.notify_all()
+
+
+def referenced_crates(text, paths, directory) -> list:
+    """
+    Returns the RO-Crate `paths` the document `text` refers to, by their path relative to the
+    workspace `directory` or by their directory (or zip file) name.
+    """
+    referenced = []
+    for path in paths:
+        relative = os.path.relpath(path, directory)
+        names = { relative, os.path.basename(str(path).rstrip("/")) }
+        if any(name and name != "." and name in text for name in names):
+            referenced.append(path)
+    return referenced
+
+
+def entity_ids(name) -> set:
+    """
+    Returns the entity ids the artifact `name` may stand for: the name itself, or the id a
+    pseudonym was made from (see `Artifact.create_pseudonym`, e.g. "data_file.csv").
+    """
+    ids = { name }
+    base, ext = os.path.splitext(name)
+    for suffix in ("_file", "_script", "_workflow"):
+        if base.endswith(suffix):
+            ids.add(base[:-len(suffix)] + ("" if ext == ".unknown" else ext))
+    return ids
+
+
+def may_hold(path, name) -> bool:
+    """
+    Guesses, without reading its metadata, whether the RO-Crate at `path` holds the artifact
+    `name`: whether it has a file (or zip member) the artifact's entity id may refer to.
+    """
+    ids = entity_ids(name)
+    if os.path.isdir(path):
+        return any(os.path.lexists(os.path.join(path, entity_id)) for entity_id in ids)
+    try:
+        with zipfile.ZipFile(path) as archive:
+            names = archive.namelist()
+    except (OSError, zipfile.BadZipFile):
+        return False
+    return any(member.rstrip("/") == entity_id or member.rstrip("/").endswith("/" + entity_id)
+               for member in names for entity_id in ids)
+
+
+class RecentCrates:
+    """
+    The times RO-Crates were last accessed (the content of an artifact of theirs was
+    read), kept in the workspace's cache so the next start processes them first. Accesses
+    are recorded at most every `RECENT_TOUCH_INTERVAL` seconds per RO-Crate.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self._touched = {}  # the time each RO-Crate's access was last recorded by this process
+
+    def _read(self) -> dict:
+        try:
+            with open(os.path.join(self.cache_dir, RECENT_FILENAME), "rb") as f:
+                return json_codec.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self) -> dict:
+        """Returns the time each RO-Crate was last accessed, keyed by path."""
+        try:
+            with FileLock(os.path.join(self.cache_dir, RECENT_LOCK_FILENAME), shared=True):
+                return self._read()
+        except OSError:
+            return {}
+
+    def touch(self, path) -> None:
+        """Records that the RO-Crate at `path` was accessed."""
+        now = time.time()
+        if now - self._touched.get(path, 0) < RECENT_TOUCH_INTERVAL:
+            return
+        self._touched[path] = now
+        try:
+            with FileLock(os.path.join(self.cache_dir, RECENT_LOCK_FILENAME)):
+                accessed = self._read()
+                accessed[path] = now
+                # Forget the RO-Crates that are no longer recent, so the file stays small.
+                accessed = { key: value for key, value in accessed.items() if now - value < RECENT_WINDOW }
+                atomic_write(os.path.join(self.cache_dir, RECENT_FILENAME), json_codec.dumps(accessed))
+        except OSError as error:
+            logger.warning(f"Error: {error}, encountered when recording the access of {path}.")
+
+    def recent(self, paths, now=None) -> list:
+        """Returns the `paths` accessed within `RECENT_WINDOW`, most recently accessed first."""
+        now = time.time() if now is None else now
+        accessed = self.load()
+        recent = [path for path in paths if now - accessed.get(str(path), 0) < RECENT_WINDOW]
+        return sorted(recent, key=lambda path: -accessed[str(path)])
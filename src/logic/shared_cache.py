@@ -0,0 +1,230 @@
+# Copyright 2024 victoriahendersonn
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+An optional cache shared by the users of a machine (or of a shared filesystem), under a
+directory set with `ROCRATE_SHARED_CACHE`, behind each user's own cache.
+
+Validating and extracting a large RO-Crate takes minutes, and on a shared login node many
+users would otherwise do it for the same RO-Crates. The shared cache stores the results
+that only depend on an RO-Crate's content:
+
+    - "validation": whether it is valid, with the validation issues.
+    - "artifacts": its extracted artifact records and provenance graph, with paths made
+      relative to the RO-Crate so each user can link the artifacts into their own cache.
+
+Objects are content-addressed: their key is derived from the RO-Crate's real path and the
+hash of its metadata and, for the artifacts (whose records hold their content fingerprints
+and sizes), the fingerprint of its local data entities' content. So an RO-Crate whose
+metadata or files changed is processed again rather than served a stale object, and an
+object never changes once written. Remote entities are the exception: their records hold
+the validators (ETag, Last-Modified) resolved by the user who extracted the RO-Crate. Writers write to a temporary file and rename it into place, so
+concurrent writers of the same object are safe (the last rename wins, with the same
+content) and readers only ever see whole objects. Objects are readable by everyone and
+directories are created group-writable, the shared directory itself should be owned by a
+group of the users (and only writable by users trusted to write correct results).
+
+The manager reads from the user's cache first, then from the shared cache, and only then
+validates or extracts the RO-Crate itself, writing the result to both.
+"""
+import os
+import stat
+import tempfile
+from pathlib import Path
+from logic import json_codec
+from logic.fingerprint import content_id
+from logic.bundle import absolute_path, relative_path
+from logic.metrics import registry as metrics
+from logic.logger import Logger
+
+# Logger to help keep a trace of any events that occur.
+logger = Logger(__name__).get_logger()
+
+
+SHARED_CACHE_ENV = "ROCRATE_SHARED_CACHE"
+SHARED_FORMAT = 1  # bumped when the objects' content changes, older objects are then ignored
+OBJECTS_DIRNAME = "objects"
+VALIDATION = "validation"
+ARTIFACTS = "artifacts"
+# Validation results that only depend on the RO-Crate (not e.g. a timeout on a busy machine).
+SHAREABLE_RESULTS = ("valid", "invalid", "malformed")
+FILE_MODE = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH  # objects are immutable once written
+DIR_MODE = stat.S_ISGID | stat.S_IRWXU | stat.S_IRWXG | stat.S_IROTH | stat.S_IXOTH
+
+SHARED_REQUESTS = metrics.counter(
+    "rocrate_shared_cache_requests_total", "Lookups of the shared cache, by kind of object and result.", ("kind", "result"))
+
+
+def rocrate_key(path, metadata, data=None) -> str | None:
+    """
+    Returns the key of the objects of the RO-Crate at `path` whose metadata hash is
+    `metadata` and, for objects that depend on its files, whose data fingerprint is `data`.
+    """
+    if not metadata:
+        return None
+    if data is None:
+        return content_id(os.path.realpath(path), metadata)
+    return content_id(os.path.realpath(path), metadata, data)
+
+
+def portable_artifacts(artifacts, rocrate_path, artifacts_dir) -> list:
+    """
+    Returns copies of the `artifacts` with their symbolic links made relative to the
+    user's `artifacts_dir`, and the archive of a zipped RO-Crate relative to the RO-Crate.
+    """
+    portable = []
+    for artifact in artifacts or []:
+        artifact = dict(artifact)
+        if artifact.get("symbolic_link"):
+            artifact["symbolic_link"] = relative_path(artifact["symbolic_link"], artifacts_dir)
+        if artifact.get("archive"):
+            artifact["archive"] = dict(artifact["archive"], path=relative_path(artifact["archive"]["path"], rocrate_path))
+        portable.append(artifact)
+    return portable
+
+
+def local_artifacts(artifacts, rocrate_path, artifacts_dir) -> list:
+    """Reverses `portable_artifacts` for the user's `artifacts_dir`."""
+    local = []
+    for artifact in artifacts or []:
+        artifact = dict(artifact)
+        if artifact.get("symbolic_link"):
+            artifact["symbolic_link"] = absolute_path(artifact["symbolic_link"], artifacts_dir)
+        if artifact.get("archive"):
+            artifact["archive"] = dict(artifact["archive"], path=absolute_path(artifact["archive"]["path"], rocrate_path))
+        local.append(artifact)
+    return local
+
+
+class SharedCache:
+    """
+    A store of immutable JSON objects under `root`, as `objects/<kind>/<xx>/<key>.json`.
+
+    params:
+        root: str - the shared directory, created if needed.
+    """
+    def __init__(self, root):
+        self.root = Path(root)
+        self.objects_dir = self.root / OBJECTS_DIRNAME
+        self._make_dirs(self.objects_dir)
+
+    @classmethod
+    def from_environment(cls) -> "SharedCache | None":
+        """Returns the shared cache under `ROCRATE_SHARED_CACHE`, or None if it is not set."""
+        root = os.environ.get(SHARED_CACHE_ENV)
+        if not root:
+            return None
+        try:
+            return cls(root)
+        except OSError as error:
+            logger.warning(f"Error: {error}, encountered when opening the shared cache {root}, it is not used.")
+            return None
+
+    def _make_dirs(self, directory) -> None:
+        """Creates `directory` and its missing parents, group-writable so every user can add objects."""
+        missing = []
+        directory = Path(directory)
+        while not directory.exists() and directory != directory.parent:
+            missing.append(directory)
+            directory = directory.parent
+        for directory in reversed(missing):
+            try:
+                directory.mkdir()
+            except FileExistsError:
+                continue  # created by another writer
+            try:
+                os.chmod(directory, DIR_MODE)
+            except OSError:
+                pass
+
+    def _path(self, kind, key) -> Path:
+        return self.objects_dir / kind / key[:2] / f"{key}.json"
+
+    def get(self, kind, key) -> dict | None:
+        """Returns the object `key` of `kind`, or None if there is none (or it is unreadable)."""
+        try:
+            with open(self._path(kind, key), "rb") as f:
+                stored = json_codec.load(f)
+        except FileNotFoundError:
+            SHARED_REQUESTS.inc(kind=kind, result="miss")
+            return None
+        except (OSError, ValueError) as error:
+            logger.warning(f"Error: {error}, encountered when reading the shared {kind} object {key}.")
+            SHARED_REQUESTS.inc(kind=kind, result="error")
+            return None
+
+        if not isinstance(stored, dict) or stored.get("format") != SHARED_FORMAT \
+                or stored.get("kind") != kind or stored.get("key") != key:
+            SHARED_REQUESTS.inc(kind=kind, result="miss")
+            return None
+        SHARED_REQUESTS.inc(kind=kind, result="hit")
+        return stored["value"]
+
+    def put(self, kind, key, value) -> bool:
+        """
+        Stores `value` as the object `key` of `kind`, unless it is already stored. Returns
+        whether it was written. Errors (e.g. a read-only shared directory) are logged.
+        """
+        path = self._path(kind, key)
+        if path.exists():
+            return False
+        data = json_codec.dumps({ "format": SHARED_FORMAT, "kind": kind, "key": key, "value": value })
+        try:
+            self._make_dirs(path.parent)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.chmod(tmp_path, FILE_MODE)
+                os.replace(tmp_path, path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+        except OSError as error:
+            logger.warning(f"Error: {error}, encountered when writing the shared {kind} object {key}.")
+            return False
+        logger.info(f"Stored the {kind} object {key} in the shared cache.")
+        return True
+
+    def get_validation(self, path, metadata) -> dict | None:
+        """Returns the shared result ("valid", "issues") of validating the RO-Crate, or None."""
+        key = rocrate_key(path, metadata)
+        return self.get(VALIDATION, key) if key else None
+
+    def put_validation(self, path, metadata, valid, issues) -> bool:
+        key = rocrate_key(path, metadata)
+        return self.put(VALIDATION, key, { "valid": valid, "issues": issues }) if key else False
+
+    def get_artifacts(self, path, metadata, data, artifacts_dir) -> dict | None:
+        """
+        Returns the shared "artifacts" (with paths for the user's `artifacts_dir`) and
+        "provenance" of the RO-Crate whose data fingerprint is `data`, or None.
+        """
+        key = rocrate_key(path, metadata, data) if data else None
+        record = self.get(ARTIFACTS, key) if key else None
+        if record is None:
+            return None
+        return dict(record, artifacts=local_artifacts(record["artifacts"], path, artifacts_dir))
+
+    def put_artifacts(self, path, metadata, data, artifacts_dir, artifacts, provenance) -> bool:
+        key = rocrate_key(path, metadata, data) if data else None
+        if not key:
+            return False
+        record = { "artifacts": portable_artifacts(artifacts, path, artifacts_dir), "provenance": provenance }
+        return self.put(ARTIFACTS, key, record)
@@ -0,0 +1,352 @@
+# Copyright 2024 victoriahendersonn
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Loads tabular artifacts (CSV and TSV) into columnar buffers.
+
+Files are parsed in chunks of rows, so a large file is never held in memory as text or as
+a list of rows: each chunk is converted straight into typed columns. Integer and number
+columns are kept in contiguous `array.array` buffers (which NumPy can wrap without a copy,
+see `Column.to_numpy`), string columns as lists. A column's type is inferred as the data
+is read, and promoted (integer -> number -> string) when a chunk does not fit it.
+
+A parsed table takes a few times the size of its file, so when only the first rows are
+needed (e.g. to show a table in a document) `load_table(..., max_rows=...)` keeps just
+those rows, while the row count and each column's type, nulls and range are still
+computed over the whole file.
+
+Parsed tables are kept in a `TableCache`, an LRU bounded by the memory used by the tables
+and keyed by the artifact's content fingerprint, so repeated requests for the same
+artifact reuse the parsed table. Its budget can be set with the `ROCRATE_TABLE_CACHE_MEMORY`
+environment variable (MiB).
+"""
+import io
+import os
+import csv
+import math
+import array
+import threading
+from itertools import islice
+from collections import OrderedDict
+from logic.logger import Logger
+
+# Logger to help keep a trace of any events that occur.
+logger = Logger(__name__).get_logger()
+
+
+# Delimiters of the tabular formats, by encoding format and by file extension.
+TABULAR_FORMATS = { "text/csv": ",", "text/tab-separated-values": "\t" }
+TABULAR_EXTENSIONS = { ".csv": ",", ".tsv": "\t", ".tab": "\t" }
+CHUNK_ROWS = 65536  # rows parsed per chunk
+TABLE_CACHE_BUDGET = int(os.environ.get("ROCRATE_TABLE_CACHE_MEMORY", 256)) * 1024 * 1024  # bytes of parsed tables kept in memory
+
+# Approximate memory used by each value of a string column (the list slot and the str object).
+STRING_OVERHEAD = 8 + 49
+
+INTEGER, NUMBER, STRING = "Integer", "Number", "String"
+
+
+def tabular_delimiter(encoding_format=None, path=None) -> str | None:
+    """
+    Returns the delimiter of a tabular artifact from its encoding format(s) or, failing
+    that, its file extension. Returns None when the artifact is not tabular.
+    """
+    formats = encoding_format if isinstance(encoding_format, list) else [encoding_format]
+    for value in formats:
+        if isinstance(value, str) and value.split(";")[0].strip().lower() in TABULAR_FORMATS:
+            return TABULAR_FORMATS[value.split(";")[0].strip().lower()]
+    if path:
+        return TABULAR_EXTENSIONS.get(os.path.splitext(str(path))[1].lower())
+    return None
+
+
+def parse_number(value):
+    return float(value) if value != "" else math.nan
+
+
+class Column:
+    def __init__(self, name):
+        self.name = name
+        self.type = INTEGER
+        self.values = array.array("q")
+        self.rows = 0  # the rows read, including those whose values were not kept
+        self.nulls = 0
+        self.minimum = None
+        self.maximum = None
+        self._strings = 0  # bytes of text held by a string column
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def nbytes(self) -> int:
+        """The approximate memory used by the column's values."""
+        if self.type == STRING:
+            return len(self.values) * STRING_OVERHEAD + self._strings
+        return len(self.values) * self.values.itemsize
+
+    def extend(self, chunk, keep=True) -> None:
+        """
+        Appends a chunk of raw (string) values, promoting the column's type if needed.
+        Unless `keep`, the values only count towards the column's type, nulls and range.
+        """
+        self.rows += len(chunk)
+        if self.type == INTEGER:
+            try:
+                if "" in chunk:
+                    raise ValueError("An integer column cannot hold empty values.")
+                values = array.array("q", map(int, chunk))
+            except (ValueError, OverflowError):
+                pass
+            else:
+                self._extend_numeric(values, keep=keep)
+                return
+        if self.type in (INTEGER, NUMBER):
+            nulls = chunk.count("")
+            try:
+                values = array.array("d", map(parse_number if nulls else float, chunk))
+            except ValueError:
+                self._promote(STRING)
+            else:
+                if self.type == INTEGER:
+                    self._promote(NUMBER)
+                self.nulls += nulls
+                self._extend_numeric(values, nulls, keep)
+                return
+
+        nulls = chunk.count("")
+        self.nulls += nulls
+        if not keep:
+            return
+        self._strings += sum(map(len, chunk))
+        if nulls:
+            self.values.extend(value if value != "" else None for value in chunk)
+        else:
+            self.values.extend(chunk)
+
+    def _extend_numeric(self, values, nulls=0, keep=True) -> None:
+        # Empty values are NaN, which are left out of the range.
+        finite = [value for value in values if value == value] if nulls else values
+        if finite:
+            low, high = min(finite), max(finite)
+            self.minimum = low if self.minimum is None else min(self.minimum, low)
+            self.maximum = high if self.maximum is None else max(self.maximum, high)
+        if keep:
+            self.values.extend(values)
+
+    def _promote(self, kind) -> None:
+        logger.debug(f"Promoting column {self.name} from {self.type} to {kind}.")
+        if kind == NUMBER:
+            self.values = array.array("d", self.values)
+        else:
+            # Numbers already parsed are turned back into text, empty numbers become nulls.
+            strings = [None if value != value else (repr(value) if self.type == NUMBER else str(value))
+                       for value in self.values]
+            self.values = strings
+            self._strings = sum(len(value) for value in strings if value is not None)
+            self.minimum = self.maximum = None
+        self.type = kind
+
+    def to_list(self, start=0, stop=None) -> list:
+        """Returns the values as Python objects, with nulls as None."""
+        values = self.values[start:stop]
+        if self.type == NUMBER:
+            return [None if value != value else value for value in values]
+        return list(values)
+
+    def to_numpy(self):
+        """
+        Returns the values as a NumPy array, sharing the buffer of integer and number
+        columns. Requires NumPy, which is an optional dependency.
+        """
+        import numpy
+        if self.type == STRING:
+            return numpy.array(self.values, dtype=object)
+        return numpy.frombuffer(self.values, dtype=numpy.int64 if self.type == INTEGER else numpy.float64)
+
+
+class Table:
+    def __init__(self, columns):
+        self.columns = columns
+
+    @property
+    def num_rows(self) -> int:
+        """The rows of the file, which may be more than those kept (see `kept_rows`)."""
+        return self.columns[0].rows if self.columns else 0
+
+    @property
+    def kept_rows(self) -> int:
+        """The rows whose values are held, all of them unless loaded with `max_rows`."""
+        return len(self.columns[0]) if self.columns else 0
+
+    @property
+    def names(self) -> list:
+        return [column.name for column in self.columns]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.columns)
+
+    def column(self, name) -> Column:
+        for column in self.columns:
+            if column.name == name:
+                return column
+        raise KeyError(f"The table has no column named {name}.")
+
+    def rows(self, start=0, stop=None) -> list:
+        """Returns the rows in `[start, stop)` as lists of values."""
+        return [list(row) for row in zip(*(column.to_list(start, stop) for column in self.columns))]
+
+    def describe(self) -> dict:
+        """Returns the shape and column types of the table."""
+        return {
+            "rows": self.num_rows,
+            "kept_rows": self.kept_rows,
+            "nbytes": self.nbytes,
+            "columns": [
+                { "name": column.name, "type": column.type, "nulls": column.nulls,
+                  "minimum": column.minimum, "maximum": column.maximum }
+                for column in self.columns
+            ],
+        }
+
+
+def column_names(header) -> list:
+    """Returns unique, non empty column names for the header row."""
+    names = []
+    for position, name in enumerate(header):
+        name = name.strip() or f"column_{position + 1}"
+        while name in names:
+            name = f"{name}_{position + 1}"
+        names.append(name)
+    return names
+
+
+def load_table(source, delimiter=",", chunk_rows=CHUNK_ROWS, encoding="utf-8", max_rows=None) -> Table:
+    """
+    Parses a delimited text file into a `Table`, reading `chunk_rows` rows at a time.
+
+    params:
+        source: str | Path | file object - a path, or a text or binary file object.
+        delimiter: str - the field delimiter.
+        chunk_rows: int - the number of rows parsed per chunk.
+        max_rows: int | None - the number of rows whose values are kept, None for all.
+            The rest of the file is still read for the row count and column statistics.
+    returns:
+        Table - the columns of the file, named by its first (header) row.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, newline="", encoding=encoding, errors="replace") as f:
+            return load_table(f, delimiter, chunk_rows, encoding, max_rows)
+    if not isinstance(source, io.TextIOBase):
+        source = io.TextIOWrapper(source, encoding=encoding, errors="replace", newline="")
+
+    reader = csv.reader(source, delimiter=delimiter)
+    header = next(reader, None)
+    if header is None:
+        return Table([])
+    columns = [Column(name) for name in column_names(header)]
+    width = len(columns)
+
+    ragged = 0
+    remaining = math.inf if max_rows is None else max_rows  # rows still to keep
+    while True:
+        rows = list(islice(reader, chunk_rows))
+        if not rows:
+            break
+        if set(map(len, rows)) != { width }:
+            rows = [row for row in rows if row]  # skip blank lines
+            for row in rows:
+                if len(row) != width:
+                    ragged += 1
+                    del row[width:]
+                    row.extend([""] * (width - len(row)))
+        kept, rest = (rows, []) if len(rows) <= remaining else (rows[:remaining], rows[remaining:])
+        remaining -= len(kept)
+        for part, keep in ((kept, True), (rest, False)):
+            if part:
+                for column, values in zip(columns, zip(*part)):
+                    column.extend(values, keep)
+
+    if ragged:
+        logger.warning(f"{ragged} rows did not have {width} values, they were padded or truncated.")
+    return Table(columns)
+
+
+class TableCache:
+    """A thread safe LRU of parsed tables, bounded by the memory they use."""
+
+    def __init__(self, budget=TABLE_CACHE_BUDGET):
+        self.budget = budget
+        self.tables = OrderedDict()  # fingerprint -> Table, least recently used first
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.tables)
+
+    def __contains__(self, key):
+        return key in self.tables
+
+    def get(self, key) -> Table | None:
+        with self._lock:
+            table = self.tables.get(key)
+            if table is None:
+                self.misses += 1
+                return None
+            self.tables.move_to_end(key)
+            self.hits += 1
+            return table
+
+    def put(self, key, table) -> None:
+        """Caches `table`, evicting the least recently used tables to stay within the budget."""
+        size = table.nbytes
+        if size > self.budget:
+            logger.info(f"Not caching a table of {size} bytes, it is over the budget of {self.budget} bytes.")
+            return
+        with self._lock:
+            if key in self.tables:
+                self.nbytes -= self.tables.pop(key).nbytes
+            while self.tables and self.nbytes + size > self.budget:
+                _, evicted = self.tables.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+            self.tables[key] = table
+            self.nbytes += size
+
+    def get_or_load(self, key, loader) -> Table:
+        """Returns the cached table for `key`, or loads it with `loader()` and caches it."""
+        table = self.get(key)
+        if table is None:
+            table = loader()
+            self.put(key, table)
+        return table
+
+    def clear(self) -> None:
+        with self._lock:
+            self.tables.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "tables": len(self.tables),
+            "nbytes": self.nbytes,
+            "budget": self.budget,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -24,9 +24,16 @@ of any discrepancies (e.g., unrecognized type or invalid version). This is essen
 rocrate-validator package.
 """
 import os
+import time
+import signal
+import threading
 import subprocess
 from enum import Enum
 from pathlib import Path
+from logic.zip_crate import ZipCrate, is_zipped_crate
+from logic import json_codec
+from logic.diagnostics import parse_report, structure_issues, timeout_issues
+from logic.metrics import registry as metrics
 from logic.logger import Logger
 
 # Setting up the logger
@@ -35,6 +42,20 @@ logger = Logger(__name__).get_logger()
 
 # Paths and directories needed for the rocrate-validator
 ROCRATE_VALIDATOR_DIR = os.path.join(os.getcwd(), "rocrate-validator")
+METADATA_FILENAME = "ro-crate-metadata.json"
+STREAM_THRESHOLD = 32 * 1024 * 1024  # bytes of metadata above which the structural check streams it
+
+# Budgets for the rocrate-validator, so one pathological RO-Crate (or a hung `poetry`) cannot
+# block the plugin. They can be changed with the `ROCRATE_VALIDATION_TIMEOUT` (seconds) and
+# `ROCRATE_VALIDATION_MEMORY` (MiB, 0 for no limit) environment variables.
+SETUP_TIMEOUT = 600  # seconds for installing the validator's dependencies
+VALIDATION_TIMEOUT = float(os.environ.get("ROCRATE_VALIDATION_TIMEOUT", 120))  # seconds per RO-Crate
+MEMORY_LIMIT = int(os.environ.get("ROCRATE_VALIDATION_MEMORY", 4096)) * 1024 * 1024  # bytes per validation
+QUARANTINE_AFTER = 3  # consecutive timeouts after which an RO-Crate is no longer validated
+POLL_INTERVAL = 0.1  # seconds between checks for cancellation while the validator runs
+
+VALIDATION_SECONDS = metrics.histogram(
+    "rocrate_validation_seconds", "Time spent validating an RO-Crate, by result.", ("result",))
 
 
 # Commands for the rocrate-validator package
@@ -75,15 +96,194 @@ class ValidatorCommand(Enum):
         "rocrate-validator",
         "--disable-color",
     ]  # disable coloured output
+    JSON_OUTPUT = ["--output-format", "json"]  # option of validate, to report the issues as JSON
+
+
+class ValidationCancelled(Exception):
+    """Raised when a validation is cancelled, e.g. because a newer update superseded it."""
+
+
+def memory_limited(command, memory_limit) -> list:
+    """
+    Returns `command` wrapped so its address space (and that of any process it starts) is
+    capped at `memory_limit` bytes, by a shell setting the limit with `ulimit -v` before it
+    execs the command. Unlike a `preexec_fn`, this is safe when the plugin runs validations
+    from several threads. The command is returned as is where limits are not supported.
+    """
+    if os.name != "posix" or not memory_limit:
+        return command
+    # Should the shell not support the limit, the command still runs, within its timeout.
+    script = f'ulimit -v {max(1, memory_limit // 1024)} 2>/dev/null; exec "$@"'
+    return ["/bin/sh", "-c", script, "sh"] + list(command)
+
+
+def kill_process(process) -> None:
+    """Kills a process started by `run_process`, with any processes it started (e.g. by `poetry run`)."""
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:  # pragma: no cover - Windows
+            process.kill()
+    except ProcessLookupError:
+        pass
+    process.communicate()
+
+
+def run_process(command, timeout=None, memory_limit=None, cancel=None, poll_interval=POLL_INTERVAL, cwd=None):
+    """
+    Runs `command`, capturing its output, as `subprocess.run` does. The process is killed
+    when it runs for longer than `timeout` seconds or the event `cancel` is set.
+
+    params:
+        timeout: float | None - seconds the process may run for, None for no limit.
+        memory_limit: int | None - bytes of memory the process may use, None for no limit.
+        cancel: threading.Event | None - set to cancel the run.
+        cwd: str | None - the directory to run the process in, None for the current one.
+    returns:
+        subprocess.CompletedProcess - the return code and output of the process.
+    raises:
+        subprocess.TimeoutExpired - the process was killed as it ran for too long.
+        ValidationCancelled - the process was killed as the run was cancelled.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    process = subprocess.Popen(memory_limited(command, memory_limit), stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, start_new_session=True, cwd=cwd)
+    while True:
+        wait = poll_interval if cancel is not None else None
+        if deadline is not None:
+            remaining = max(0, deadline - time.monotonic())
+            wait = remaining if wait is None else min(wait, remaining)
+        try:
+            stdout, stderr = process.communicate(timeout=wait)
+            return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+        except subprocess.TimeoutExpired:
+            if cancel is not None and cancel.is_set():
+                kill_process(process)
+                raise ValidationCancelled(f"{' '.join(command)} was cancelled.")
+            if deadline is not None and time.monotonic() >= deadline:
+                kill_process(process)
+                raise subprocess.TimeoutExpired(command, timeout)
+
+
+def read_metadata(path_to_rocrate) -> bytes:
+    """
+    Reads the `ro-crate-metadata.json` of an RO-Crate, given the path of its directory, its
+    metadata file or a zipped RO-Crate. Raises `FileNotFoundError` when there is none.
+    """
+    path = Path(path_to_rocrate)
+    if path.is_dir():
+        path = path / METADATA_FILENAME
+    elif is_zipped_crate(path):
+        with ZipCrate(path) as rocrate:
+            return rocrate.read_metadata_bytes()
+    if not path.is_file():
+        raise FileNotFoundError(f"{path} does not exist.")
+    return path.read_bytes()
+
+
+def check_structure(metadata) -> list:
+    """
+    Checks the structure every RO-Crate's metadata must have (see
+    https://www.researchobject.org/ro-crate/specification/1.1/root-data-entity.html):
+    well-formed JSON-LD with an `@context` and an `@graph`, holding the metadata descriptor
+    and the root data entity it is `about`.
+
+    params:
+        metadata: bytes | str - the content of the `ro-crate-metadata.json`.
+    returns:
+        list - the problems found, empty when the structure is sound.
+    """
+    try:
+        document = json_codec.loads(metadata)
+    except ValueError as error:
+        return [f"{METADATA_FILENAME} is not valid JSON: {error}."]
+    if not isinstance(document, dict):
+        return [f"{METADATA_FILENAME} must hold a JSON object."]
+
+    graph = document.get("@graph")
+    has_graph = isinstance(graph, list)
+    return graph_problems(summarise_graph(graph if has_graph else []), document, has_graph)
+
+
+def check_structure_stream(f) -> list:
+    """
+    Checks the structure of the metadata in the binary file `f` as `check_structure` does,
+    streaming its `@graph` (see `GraphReader`) so a huge metadata file is never held in
+    memory whole.
+    """
+    reader = json_codec.GraphReader(f)
+    try:
+        summary = summarise_graph(reader)
+    except ValueError as error:
+        return [f"{METADATA_FILENAME} is not valid JSON: {error}."]
+    return graph_problems(summary, reader.members, reader.has_graph)
+
+
+def summarise_graph(entities) -> tuple:
+    """
+    Returns what the structural check needs to know of the entities of a `@graph`: the
+    `@type` of each entity and the metadata descriptors, keyed by `@id`.
+    """
+    types, descriptors = {}, {}
+    for entity in entities:
+        if isinstance(entity, dict) and "@id" in entity:
+            types[entity["@id"]] = entity.get("@type", [])
+            if entity["@id"] in (METADATA_FILENAME, "./" + METADATA_FILENAME):
+                descriptors[entity["@id"]] = entity
+    return types, descriptors
+
+
+def graph_problems(summary, members, has_graph) -> list:
+    """Returns the structural problems of metadata, given the `summarise_graph` of its `@graph`."""
+    types, descriptors = summary
+    problems = []
+    if "@context" not in members:
+        problems.append("The metadata has no @context.")
+    if not has_graph:
+        return problems + ["The metadata has no @graph list."]
+
+    descriptor = descriptors.get(METADATA_FILENAME) or descriptors.get("./" + METADATA_FILENAME)
+    if descriptor is None:
+        return problems + [f"The @graph has no metadata descriptor (an entity with the @id {METADATA_FILENAME})."]
+
+    about = descriptor.get("about")
+    root_id = about.get("@id") if isinstance(about, dict) else None
+    if root_id is None:
+        return problems + ["The metadata descriptor is not about a root data entity."]
+    if root_id not in types:
+        return problems + [f"The root data entity {root_id} is not in the @graph."]
+    root_types = types[root_id]
+    if "Dataset" not in (root_types if isinstance(root_types, list) else [root_types]):
+        problems.append(f"The root data entity {root_id} is not a Dataset.")
+    return problems
 
 
 class Validator:
-    def __init__(self):
+    def __init__(self, timeout=VALIDATION_TIMEOUT, memory_limit=MEMORY_LIMIT, setup=True):
         self.valid_rocrates = []  # list of valid rocrates, their paths are stored.
         self.invalid_rocrates = []  # list of invalid rocrates, their paths are stored.
+        self.problems = {}  # problems found by the structural check, keyed by the rocrate's path.
+        self.issues = {}  # issues found by the validation (see logic.diagnostics), keyed by the rocrate's path.
+        self.json_output = True  # whether the installed rocrate-validator can report JSON
+        self.timeout = timeout  # seconds a validation may run for
+        self.memory_limit = memory_limit  # bytes of memory a validation may use
+        self.timeouts = {}  # consecutive timed out validations, keyed by the rocrate's path.
+        self.setup_done = False
+        self._setup_lock = threading.Lock()
+        # Guards the results above, as RO-Crates are validated from several threads at once.
+        self._lock = threading.Lock()
+
+        # Set up the RO-Crate validator when the Validator is initialized, unless the caller
+        # defers it until an RO-Crate is validated (see `ensure_setup`).
+        if setup:
+            self.ensure_setup()
 
-        # Set up the RO-Crate validator when the Validator is initialized.
-        self.setup()
+    def ensure_setup(self) -> None:
+        """Sets up the RO-Crate validator, unless it is set up already."""
+        with self._setup_lock:
+            if not self.setup_done:
+                self.setup()
+                self.setup_done = True
 
     def setup(self):
         """
@@ -95,36 +295,145 @@ class Validator:
         if not os.path.isdir(ROCRATE_VALIDATOR_DIR):
             raise FileNotFoundError("The RO-Crate validator package does not exist.")
 
-        # Install dependencies for the RO-Crate validator
-        os.chdir(ROCRATE_VALIDATOR_DIR)
+        # Install dependencies for the RO-Crate validator, in its directory (the plugin's own
+        # working directory is left alone, as other threads resolve paths against it).
         logger.info("Installing depdencies for the RO-Crate validator.")
-        subprocess.run(ValidatorCommand.INSTALL_DEPENDENCIES.value, check=True,
-                       stdout=subprocess.PIPE, stderr=subprocess.PIPE,)
+        subprocess.run(ValidatorCommand.INSTALL_DEPENDENCIES.value, check=True, cwd=ROCRATE_VALIDATOR_DIR,
+                       stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=SETUP_TIMEOUT,)
 
     def get_help(self):
         # TODO: ask - do we need this? it might be better to have it in the README as this is currently not helpful for the user.
         """Prints the help messages from the rocrate-validator package."""
         logger.info("Printing the help messages from the RO-Crate validator.")
-        subprocess.run(ValidatorCommand.HELP.value, check=True, 
+        subprocess.run(ValidatorCommand.HELP.value, check=True, cwd=ROCRATE_VALIDATOR_DIR,
                        stdout=subprocess.PIPE, stderr=subprocess.PIPE,)
 
-    def validate_rocrate(self, path_to_rocrate):
-        """Validates the rocrate against the rocrate-validator package."""
+    def precheck(self, path_to_rocrate) -> list:
+        """
+        Checks the structure of the RO-Crate's metadata, see `check_structure`. This only
+        parses the metadata, so it is fast enough to run before every full validation.
+
+        returns:
+            list - the problems found, empty when the RO-Crate is worth validating in full.
+        """
+        try:
+            path = Path(path_to_rocrate)
+            metadata_path = path / METADATA_FILENAME if path.is_dir() else path
+            if (not is_zipped_crate(metadata_path) and metadata_path.is_file()
+                    and metadata_path.stat().st_size > STREAM_THRESHOLD):
+                with open(metadata_path, "rb") as f:
+                    return check_structure_stream(f)
+            metadata = read_metadata(path_to_rocrate)
+        except (OSError, ValueError) as error:
+            return [f"The metadata could not be read: {error}"]
+        return check_structure(metadata)
+
+    def is_quarantined(self, path_to_rocrate) -> bool:
+        """Returns whether the RO-Crate timed out too often in a row to be validated again."""
+        return self.timeouts.get(path_to_rocrate, 0) >= QUARANTINE_AFTER
+
+    def validate_rocrate(self, path_to_rocrate, cancel=None):
+        """
+        Validates the rocrate against the rocrate-validator package. A validation that runs
+        out of time counts as invalid, and an RO-Crate that keeps timing out is quarantined:
+        it is reported as invalid without being validated (see `QUARANTINE_AFTER`).
+
+        params:
+            cancel: threading.Event | None - set to cancel the validation, which then raises
+                `ValidationCancelled` and records nothing.
+        returns:
+            str - the kind of result: "valid", "invalid", "malformed", "quarantined" or "timeout".
+        """
+        start = time.perf_counter()
+        result = "error"
+        try:
+            result = self._validate_rocrate(path_to_rocrate, cancel)
+        except ValidationCancelled:
+            result = "cancelled"
+            raise
+        finally:
+            VALIDATION_SECONDS.observe(time.perf_counter() - start, result=result)
+        return result
+
+    def _validate_rocrate(self, path_to_rocrate, cancel=None) -> str:
+        """Validates the RO-Crate (see `validate_rocrate`), returning the kind of result."""
         if not isinstance(path_to_rocrate, str) or not Path(path_to_rocrate).exists():
             raise FileNotFoundError(f"The path {path_to_rocrate} does not exist.")
 
+        # Structurally broken RO-Crates are rejected without running the (much slower) validator.
+        problems = self.precheck(path_to_rocrate)
+        if problems:
+            logger.warning(f"The RO-Crate at {path_to_rocrate} is invalid: {' '.join(problems)}")
+            with self._lock:
+                self.problems[path_to_rocrate] = problems
+            self.record(path_to_rocrate, False, structure_issues(problems))
+            return "malformed"
+
+        if self.is_quarantined(path_to_rocrate):
+            timeouts = self.timeouts[path_to_rocrate]
+            logger.warning(f"The RO-Crate at {path_to_rocrate} is quarantined, it timed out {timeouts} times.")
+            self.record(path_to_rocrate, False, timeout_issues(self.timeout, timeouts, quarantined=True))
+            return "quarantined"
+
         logger.info(f"Validating the RO-Crate {path_to_rocrate}.")
 
-        result = subprocess.run(
-            ValidatorCommand.VALIDATE.value + [path_to_rocrate],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
+        try:
+            result = self.run_validator(path_to_rocrate, cancel)
+        except subprocess.TimeoutExpired:
+            with self._lock:
+                timeouts = self.timeouts[path_to_rocrate] = self.timeouts.get(path_to_rocrate, 0) + 1
+            logger.warning(f"The validation of the RO-Crate at {path_to_rocrate} timed out after {self.timeout} seconds.")
+            self.record(path_to_rocrate, False, timeout_issues(self.timeout, timeouts,
+                                                               quarantined=timeouts >= QUARANTINE_AFTER))
+            return "timeout"
+        self.set_timeouts(path_to_rocrate, 0)
+        issues = parse_report(result.stdout, result.stderr, result.returncode)
+        self.record(path_to_rocrate, result.returncode == 0, issues)
 
         if result.returncode == 0:
             logger.info(f"The RO-Crate {path_to_rocrate} is valid.")
-            self.valid_rocrates.append(path_to_rocrate)
-        else:
-            # TODO: give the user a reason as to why the RO-Crate is invalid, so they could fix it.
-            logger.warning(f"The RO-Crate at {path_to_rocrate} is invalid.")
-            self.invalid_rocrates.append(path_to_rocrate)
+            return "valid"
+        logger.warning(f"The RO-Crate at {path_to_rocrate} is invalid, with {len(issues)} issues.")
+        return "invalid"
+
+    def run_validator(self, path_to_rocrate, cancel=None):
+        """
+        Runs `rocrate-validator validate`, asking for a JSON report. Older versions of the
+        validator do not have the option, they are then run for their text report.
+        """
+        self.ensure_setup()
+
+        def run(command):
+            return run_process(command, timeout=self.timeout, memory_limit=self.memory_limit, cancel=cancel,
+                               cwd=ROCRATE_VALIDATOR_DIR)
+
+        if self.json_output:
+            result = run(ValidatorCommand.VALIDATE.value + ValidatorCommand.JSON_OUTPUT.value + [path_to_rocrate])
+            errors = result.stderr if isinstance(result.stderr, bytes) else b""
+            if not (result.returncode == 2 and b"no such option" in errors.lower()):
+                return result
+            logger.info("The RO-Crate validator cannot report JSON, using its text report.")
+            self.json_output = False
+
+        return run(ValidatorCommand.VALIDATE.value + [path_to_rocrate])
+
+    def record(self, path_to_rocrate, valid, issues) -> None:
+        """Records the result of a validation of the RO-Crate, e.g. an earlier one from the cache."""
+        with self._lock:
+            (self.valid_rocrates if valid else self.invalid_rocrates).append(path_to_rocrate)
+            self.issues[path_to_rocrate] = issues
+
+    def set_timeouts(self, path_to_rocrate, timeouts) -> None:
+        """Sets how many validations of the RO-Crate timed out in a row, e.g. as cached."""
+        with self._lock:
+            if timeouts:
+                self.timeouts[path_to_rocrate] = timeouts
+            else:
+                self.timeouts.pop(path_to_rocrate, None)
+
+    def reset(self) -> None:
+        """Forgets the results of the validations, but not their timeouts (see `is_quarantined`)."""
+        with self._lock:
+            self.valid_rocrates.clear()
+            self.invalid_rocrates.clear()
+            self.issues.clear()
@@ -0,0 +1,367 @@
+# Copyright 2024 victoriahendersonn
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Indexes the definitions of workflow artifacts (ComputationalWorkflow entities) into a
+compact graph of their inputs, steps and outputs:
+
+    {
+        "format": "galaxy", "name": "Hello World", "description": ..., "version": ...,
+        "inputs": [{ "id": "simple_input", "type": "data", "description": ..., "optional": False }],
+        "steps": [{
+            "id": "1", "label": "Reverse dataset", "tool": "toolshed.../tp_tac/1.1.0",
+            "inputs": [{ "name": "infile", "source": "simple_input" }],
+            "outputs": ["outfile"], "parameters": { "separator": ... },
+        }],
+        "outputs": [{ "id": "reversed", "source": "1/outfile" }],
+    }
+
+A step's input `source` is a workflow input's id, or `<step id>/<output>` for the output
+of another step. Galaxy (`.ga`) and CWL workflows are supported. CWL workflows written in
+YAML need PyYAML, those in JSON (e.g. packed with `cwltool --pack`) do not.
+
+Workflows are indexed once, when their RO-Crate is extracted, and the graphs are stored
+in a content-addressed cache keyed by the workflow file's fingerprint, so listing the
+steps of a workflow does not parse its file again.
+"""
+import os
+import json
+from logic.file_lock import atomic_write
+from logic import json_codec
+from logic.logger import Logger
+
+try:
+    import yaml
+except ImportError:  # PyYAML is optional, only CWL workflows written in YAML need it.
+    yaml = None
+
+# Logger to help keep a trace of any events that occur.
+logger = Logger(__name__).get_logger()
+
+
+WORKFLOWS_DIRNAME = "workflows"
+WORKFLOW_TYPE = "ComputationalWorkflow"
+MAX_WORKFLOW_BYTES = 16 * 1024 * 1024  # larger files are not parsed
+# Galaxy steps that are inputs of the workflow rather than tools.
+GALAXY_INPUT_STEPS = { "data_input": "data", "data_collection_input": "collection", "parameter_input": "parameter" }
+
+
+def is_workflow(types) -> bool:
+    """Returns whether an entity with the `@type` `types` (a string or list) is a workflow."""
+    return WORKFLOW_TYPE in (types if isinstance(types, list) else [types])
+
+
+def detect_format(name, document) -> str | None:
+    """Returns "galaxy" or "cwl" for a parsed workflow `document` named `name`, or None."""
+    if isinstance(document, dict):
+        if document.get("a_galaxy_workflow") or str(name).endswith(".ga"):
+            return "galaxy"
+        if "cwlVersion" in document or "$graph" in document or str(name).endswith(".cwl"):
+            return "cwl"
+    return None
+
+
+def load_document(data, name=None):
+    """Parses the bytes of a workflow file, as JSON or (for CWL) YAML."""
+    text = data.decode("utf-8-sig")
+    try:
+        return json.loads(text)
+    except ValueError:
+        if yaml is None:
+            if str(name).endswith(".cwl"):
+                # Not stored as an error, so the workflow is indexed once PyYAML is installed.
+                raise ImportError(f"The workflow {name} is written in YAML, parsing it needs PyYAML.") from None
+            raise ValueError(f"The workflow {name} is not valid JSON.") from None
+    try:
+        return yaml.safe_load(text)
+    except yaml.YAMLError as error:
+        raise ValueError(f"The workflow {name} is neither valid JSON nor YAML: {error}") from None
+
+
+def parse_workflow(data, name=None) -> dict:
+    """
+    Parses a workflow file into its graph (see the module's docstring).
+
+    params:
+        data: bytes - the content of the workflow file.
+        name: str - the file's name, whose extension helps tell the format.
+    returns:
+        dict - the workflow's graph.
+    """
+    document = load_document(data, name)
+    workflow_format = detect_format(name, document)
+    if workflow_format == "galaxy":
+        return parse_galaxy(document)
+    if workflow_format == "cwl":
+        return parse_cwl(document)
+    raise ValueError(f"The format of the workflow {name} is not supported, only Galaxy and CWL workflows are.")
+
+
+def galaxy_parameters(tool_state) -> dict:
+    """Returns the parameters of a Galaxy step from its (JSON encoded) tool state."""
+    if isinstance(tool_state, str):
+        try:
+            tool_state = json.loads(tool_state)
+        except ValueError:
+            return {}
+    if not isinstance(tool_state, dict):
+        return {}
+
+    def value(item):
+        if isinstance(item, dict):
+            if item.get("__class__") in ("RuntimeValue", "ConnectedValue"):
+                return "<runtime>"
+            return { key: value(nested) for key, nested in item.items() if not key.startswith("__") }
+        if isinstance(item, list):
+            return [value(nested) for nested in item]
+        return item
+
+    return { key: value(item) for key, item in tool_state.items() if not key.startswith("__") }
+
+
+def parse_galaxy(document) -> dict:
+    """Parses a Galaxy workflow (the JSON of a `.ga` file) into its graph."""
+    steps = document.get("steps") or {}
+    steps = [steps[key] for key in sorted(steps, key=lambda key: int(key) if str(key).isdigit() else 0)] \
+        if isinstance(steps, dict) else list(steps)
+    graph = {
+        "format": "galaxy",
+        "name": document.get("name"),
+        "description": document.get("annotation") or None,
+        "version": str(document["version"]) if document.get("version") is not None else None,
+        "inputs": [],
+        "steps": [],
+        "outputs": [],
+    }
+
+    # The inputs are steps too, whose outputs are referred to by their step id.
+    input_ids = {}
+    for step in steps:
+        if step.get("type") in GALAXY_INPUT_STEPS:
+            declared = (step.get("inputs") or [{}])[0]
+            input_id = step.get("label") or declared.get("name") or str(step.get("id"))
+            input_ids[step.get("id")] = input_id
+            state = galaxy_parameters(step.get("tool_state"))
+            graph["inputs"].append({
+                "id": input_id,
+                "type": state.get("parameter_type") or GALAXY_INPUT_STEPS[step["type"]],
+                "description": step.get("annotation") or declared.get("description") or None,
+                "optional": bool(state.get("optional", False)),
+            })
+
+    def source(connection):
+        if connection.get("id") in input_ids:
+            return input_ids[connection["id"]]
+        return f"{connection.get('id')}/{connection.get('output_name')}"
+
+    for step in steps:
+        if step.get("type") not in GALAXY_INPUT_STEPS:
+            inputs = []
+            for name, connections in (step.get("input_connections") or {}).items():
+                for connection in connections if isinstance(connections, list) else [connections]:
+                    inputs.append({ "name": name, "source": source(connection) })
+            graph["steps"].append({
+                "id": str(step.get("id")),
+                "label": step.get("label") or step.get("name"),
+                "tool": step.get("tool_id") or (step.get("subworkflow") or {}).get("name") or step.get("type"),
+                "tool_version": step.get("tool_version"),
+                "description": step.get("annotation") or None,
+                "inputs": inputs,
+                "outputs": [output.get("name") for output in step.get("outputs") or []],
+                "parameters": galaxy_parameters(step.get("tool_state")),
+            })
+        for output in step.get("workflow_outputs") or []:
+            step_source = input_ids.get(step.get("id")) or f"{step.get('id')}/{output.get('output_name')}"
+            graph["outputs"].append({
+                "id": output.get("label") or f"{step.get('id')}/{output.get('output_name')}",
+                "source": step_source,
+            })
+    return graph
+
+
+def cwl_id(value, prefix=None) -> str:
+    """
+    Shortens a CWL identifier, e.g. `#main/step/output` in a packed workflow, to its name
+    relative to the process (and `prefix`, e.g. the step's id) it belongs to.
+    """
+    value = str(value).rsplit("#", 1)[-1]
+    if value.startswith("main/"):
+        value = value[len("main/"):]
+    if prefix and value.startswith(prefix + "/"):
+        value = value[len(prefix) + 1:]
+    return value
+
+
+def cwl_type(value) -> str | None:
+    """Renders a CWL type, e.g. `["null", "File"]` as "File?" and an array of files as "File[]"."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return cwl_id(value) if "#" in value else value
+    if isinstance(value, list):
+        types = [cwl_type(item) for item in value if item != "null"]
+        rendered = types[0] if len(types) == 1 else "|".join(str(item) for item in types)
+        return f"{rendered}?" if "null" in value else rendered
+    if isinstance(value, dict):
+        if value.get("type") == "array":
+            return f"{cwl_type(value.get('items'))}[]"
+        if value.get("type") == "enum":
+            return "enum"
+        return cwl_type(value.get("type"))
+    return str(value)
+
+
+def cwl_items(value, key="id") -> list:
+    """
+    Returns the entries of a CWL list, which may also be written as a map from their ids
+    (`{ name: { type: File } }` or `{ name: File }`), as a list of dicts.
+    """
+    if isinstance(value, dict):
+        return [
+            dict(item, **{ key: name }) if isinstance(item, dict) else { key: name, "type": item }
+            for name, item in value.items()
+        ]
+    return [item if isinstance(item, dict) else { key: item } for item in value or []]
+
+
+def cwl_sources(value) -> list:
+    return value if isinstance(value, list) else [value] if value is not None else []
+
+
+def parse_cwl(document) -> dict:
+    """Parses a CWL workflow (or tool), which may be packed into a `$graph`, into its graph."""
+    process = document
+    if "$graph" in document:
+        processes = document["$graph"]
+        process = next(
+            (item for item in processes if cwl_id(item.get("id", "")) in ("main", "")), None) \
+            or next((item for item in processes if item.get("class") == "Workflow"), processes[0])
+
+    graph = {
+        "format": "cwl",
+        "name": process.get("label") or (cwl_id(process["id"]) if process.get("id") else None),
+        "description": process.get("doc") or None,
+        "version": document.get("cwlVersion"),
+        "class": process.get("class"),
+        "inputs": [],
+        "steps": [],
+        "outputs": [
+            {
+                "id": cwl_id(item["id"]),
+                "type": cwl_type(item.get("type")),
+                "source": ", ".join(cwl_id(source) for source in cwl_sources(item.get("outputSource"))) or None,
+            }
+            for item in cwl_items(process.get("outputs"))
+        ],
+    }
+
+    for item in cwl_items(process.get("inputs")):
+        input_type = cwl_type(item.get("type"))
+        workflow_input = {
+            "id": cwl_id(item["id"]),
+            "type": input_type,
+            "description": item.get("doc") or item.get("label") or None,
+            "optional": bool(input_type and input_type.endswith("?")) or "default" in item,
+        }
+        if "default" in item:
+            workflow_input["default"] = item["default"]
+        graph["inputs"].append(workflow_input)
+
+    for step in cwl_items(process.get("steps")):
+        step_id = cwl_id(step["id"])
+        run = step.get("run")
+        inputs, parameters = [], {}
+        for item in cwl_items(step.get("in"), key="id"):
+            name = cwl_id(item["id"], step_id)
+            sources = cwl_sources(item.get("source"))
+            if not sources and "type" in item and isinstance(item["type"], str) and len(item) == 2:
+                sources = [item["type"]]  # written as `name: source` in a map
+            for source in sources:
+                inputs.append({ "name": name, "source": cwl_id(source) })
+            for option in ("default", "valueFrom"):
+                if option in item:
+                    parameters[name] = item[option]
+        graph["steps"].append({
+            "id": step_id,
+            "label": step.get("label") or step_id,
+            "tool": (cwl_id(run["id"]) if run.get("id") else run.get("class")) if isinstance(run, dict) else
+                cwl_id(run) if run else None,
+            "description": step.get("doc") or None,
+            "inputs": inputs,
+            "outputs": [cwl_id(output if isinstance(output, str) else output.get("id"), step_id) for output in step.get("out") or []],
+            "parameters": parameters,
+        })
+    return graph
+
+
+def summarise_workflow(graph) -> dict:
+    """Returns the counts of a workflow graph's inputs, steps and outputs, stored with its artifact."""
+    return {
+        "format": graph.get("format"),
+        "inputs": len(graph.get("inputs") or []),
+        "steps": len(graph.get("steps") or []),
+        "outputs": len(graph.get("outputs") or []),
+    }
+
+
+class WorkflowIndex:
+    """
+    A content-addressed store of parsed workflows on disk: `<fingerprint>.json` holds a
+    workflow's graph, in a subdirectory named by the fingerprint's first two characters.
+    A workflow that could not be parsed is stored with its "error", so it is not parsed
+    again either.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, fingerprint) -> str:
+        return os.path.join(self.directory, fingerprint[:2], fingerprint + ".json")
+
+    def get(self, fingerprint) -> dict | None:
+        """Returns the stored graph of the workflow with the fingerprint `fingerprint`, or None."""
+        try:
+            with open(self._path(fingerprint), "rb") as f:
+                return json_codec.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, fingerprint, graph) -> dict:
+        """Stores the graph of a workflow."""
+        graph = dict(graph, fingerprint=fingerprint)
+        os.makedirs(os.path.dirname(self._path(fingerprint)), exist_ok=True)
+        atomic_write(self._path(fingerprint), json_codec.dumps(graph))
+        return graph
+
+    def index(self, fingerprint, size, opener, name=None) -> dict:
+        """
+        Returns the graph of a workflow, parsing it from `opener()` (a binary file) and
+        storing it unless it is already stored.
+        """
+        graph = self.get(fingerprint)
+        if graph is not None:
+            return graph
+        if size is not None and size > MAX_WORKFLOW_BYTES:
+            return self.put(fingerprint, { "format": None, "error": f"The workflow is larger than {MAX_WORKFLOW_BYTES} bytes." })
+
+        logger.info(f"Indexing the workflow {name}.")
+        with opener() as f:
+            data = f.read()
+        try:
+            graph = parse_workflow(data, name)
+        except (ValueError, TypeError, KeyError, AttributeError, IndexError) as error:
+            logger.warning(f"Error: {error}, encountered when indexing the workflow {name}.")
+            graph = { "format": None, "error": str(error) }
+        return self.put(fingerprint, graph)
@@ -0,0 +1,238 @@
+# Copyright 2024 victoriahendersonn
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Support for RO-Crates packaged as `.zip` files.
+
+Zipped RO-Crates are never extracted. Detection only reads the zip's central directory,
+loading a crate only reads the `ro-crate-metadata.json` member, and the artifacts inside
+the archive are read lazily: members that are stored uncompressed are memory-mapped and
+sliced, compressed members are streamed from the archive.
+"""
+import os
+import mmap
+import struct
+import zipfile
+from pathlib import Path, PurePosixPath
+from logic import json_codec
+from logic.logger import Logger
+
+# Logger to help keep a trace of any events that occur.
+logger = Logger(__name__).get_logger()
+
+
+METADATA_FILENAME = "ro-crate-metadata.json"
+ZIP_EXTENSIONS = (".zip",)
+
+
+def find_metadata_member(archive) -> str | None:
+    """
+    Returns the name of the `ro-crate-metadata.json` member of the zip `archive` (a
+    `zipfile.ZipFile`), i.e. the one closest to the root of the archive, or None.
+    """
+    candidates = [
+        name for name in archive.namelist()
+        if PurePosixPath(name).name == METADATA_FILENAME and len(PurePosixPath(name).parts) <= 2
+    ]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda name: len(PurePosixPath(name).parts))
+
+
+def is_zipped_crate(path) -> bool:
+    """Returns whether `path` is a zip file holding an RO-Crate, reading only its central directory."""
+    if not str(path).lower().endswith(ZIP_EXTENSIONS):
+        return False
+    try:
+        with zipfile.ZipFile(path) as archive:
+            return find_metadata_member(archive) is not None
+    except (zipfile.BadZipFile, OSError) as error:
+        logger.warning(f"Could not read the zip file {path}: {error}.")
+        return False
+
+
+class ZipEntity:
+    """
+    A data entity of a zipped RO-Crate, with the parts of the `rocrate` entity interface
+    the rest of the plugin uses.
+    """
+    def __init__(self, crate, properties):
+        self.crate = crate
+        self._properties = properties
+        self.id = properties["@id"]
+        self.type = properties.get("@type")
+
+    def __getitem__(self, key):
+        return self._properties[key]
+
+    def get(self, key, default=None):
+        return self._properties.get(key, default)
+
+    def properties(self) -> dict:
+        return self._properties
+
+
+class ZipCrate:
+    """
+    An RO-Crate packaged as a zip file.
+
+    params:
+        path: str | Path - the zip file.
+    """
+    is_zipped = True
+
+    def __init__(self, path):
+        self.source = Path(path)
+        self.archive = zipfile.ZipFile(self.source)
+        self.metadata_member = find_metadata_member(self.archive)
+        if self.metadata_member is None:
+            self.archive.close()
+            raise FileNotFoundError(f"{self.source} does not contain {METADATA_FILENAME}.")
+
+        # Members are relative to the directory holding the metadata file, which is either the
+        # root of the archive or a single top level directory.
+        parent = str(PurePosixPath(self.metadata_member).parent)
+        self.prefix = "" if parent == "." else parent + "/"
+        self._mmap = None
+        self._metadata = None
+        self._data_entities = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Views of the mapping are still in use, it is closed when they are released.
+                pass
+            self._mmap = None
+        self.archive.close()
+
+    def read_metadata_bytes(self) -> bytes:
+        return self.archive.read(self.metadata_member)
+
+    @property
+    def metadata(self) -> dict:
+        if self._metadata is None:
+            self._metadata = json_codec.loads(self.read_metadata_bytes())
+        return self._metadata
+
+    @property
+    def data_entities(self) -> list:
+        """The File and Dataset entities reachable from the root dataset's `hasPart`."""
+        if self._data_entities is None:
+            self._data_entities = self._find_data_entities()
+        return self._data_entities
+
+    def _find_data_entities(self) -> list:
+        graph = { entity["@id"]: entity for entity in self.metadata.get("@graph", []) if "@id" in entity }
+        descriptor = graph.get(METADATA_FILENAME) or graph.get("./" + METADATA_FILENAME) or {}
+        root_id = (descriptor.get("about") or {}).get("@id", "./")
+
+        entities = []
+        seen = { root_id }
+        pending = [root_id]
+        while pending:
+            parent = graph.get(pending.pop(0), {})
+            parts = parent.get("hasPart", [])
+            for part in parts if isinstance(parts, list) else [parts]:
+                part_id = part.get("@id") if isinstance(part, dict) else None
+                if part_id is None or part_id in seen or part_id not in graph:
+                    continue
+                seen.add(part_id)
+                types = graph[part_id].get("@type", [])
+                types = types if isinstance(types, list) else [types]
+                if "File" in types or "Dataset" in types:
+                    entities.append(ZipEntity(self, graph[part_id]))
+                if "Dataset" in types:
+                    pending.append(part_id)
+        return entities
+
+    def member_name(self, entity_id) -> str:
+        """Returns the name of the archive member holding the entity with `entity_id`."""
+        entity_id = entity_id[2:] if entity_id.startswith("./") else entity_id
+        return self.prefix + entity_id
+
+    def info(self, entity_id) -> zipfile.ZipInfo:
+        return self.archive.getinfo(self.member_name(entity_id))
+
+    def members(self, entity_id) -> list:
+        """Returns the members (`zipfile.ZipInfo`) under the directory entity with `entity_id`."""
+        prefix = self.member_name(entity_id).rstrip("/") + "/"
+        return [info for info in self.archive.infolist() if info.filename.startswith(prefix)]
+
+    def size(self, entity_id) -> int:
+        return self.info(entity_id).file_size
+
+    def open(self, entity_id):
+        """Returns a seekable, read-only file object streaming the member from the archive."""
+        return self.archive.open(self.member_name(entity_id))
+
+    def read(self, entity_id, offset=0, length=None):
+        """
+        Reads `length` bytes (or up to the end) of the member starting at `offset`.
+
+        Uncompressed members are returned as a zero-copy `memoryview` of the memory-mapped
+        archive, compressed members are decompressed from the archive as `bytes`.
+        """
+        info = self.info(entity_id)
+        end = info.file_size if length is None else min(info.file_size, offset + length)
+        offset = min(offset, end)
+
+        span = self.data_span(entity_id)
+        if span is not None:
+            start = span[0]
+            return memoryview(self._mapping())[start + offset:start + end]
+
+        with self.archive.open(info) as member:
+            member.seek(offset)
+            return member.read(end - offset)
+
+    def data_span(self, entity_id) -> tuple | None:
+        """
+        Returns `(offset, size)` of the member's bytes in the archive file when it is stored
+        uncompressed (so it can be read in place), or None when it is compressed or empty.
+        """
+        info = self.info(entity_id)
+        if info.compress_type != zipfile.ZIP_STORED or info.file_size == 0:
+            return None
+        return self._data_offset(info), info.file_size
+
+    def _mapping(self) -> mmap.mmap:
+        if self._mmap is None:
+            with open(self.source, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def _data_offset(self, info) -> int:
+        """Returns the offset of the member's data in the archive, after its local header."""
+        header = self._mapping()[info.header_offset:info.header_offset + zipfile.sizeFileHeader]
+        fields = struct.unpack(zipfile.structFileHeader, header)
+        if fields[0] != zipfile.stringFileHeader:
+            raise zipfile.BadZipFile(f"Bad local header for {info.filename} in {self.source}.")
+        filename_length, extra_length = fields[-2], fields[-1]
+        return info.header_offset + zipfile.sizeFileHeader + filename_length + extra_length
+
+
+def zipped_crate_paths(names, root) -> list:
+    """Returns the paths of the zipped RO-Crates among the file `names` in `root`."""
+    return [
+        os.path.join(root, name) for name in names
+        if name.lower().endswith(ZIP_EXTENSIONS) and is_zipped_crate(os.path.join(root, name))
+    ]
@@ -1,4 +1,9 @@
 import asyncio
+import base64
+import functools
+import json
+import os
+import threading
 from collections.abc import Sequence
 
 from stencila_plugin import (
@@ -8,13 +13,208 @@ from stencila_plugin import (
     Kernel,
     Plugin,
 )
-from stencila_types import shortcuts as S
 from stencila_types import types as T
-from stencila_types.utilities import to_json
 
-from logic.rocrate_manager import ROCratesManager
+from logic.commands import Commands, CommandError
+from logic.metrics import registry as metrics
 
-manager = ROCratesManager()
+# The RO-Crate manager is created on first use (see `get_manager`), so importing the plugin
+# is fast and has no side effects, and the plugin can answer Stencila's handshake without
+# waiting for the RO-Crates to be scanned and validated.
+_manager = None
+_manager_lock = threading.Lock()
+
+# Seconds a kernel request waits for the RO-Crate manager (e.g. for its cache to be built)
+# before failing, set with the `ROCRATE_REQUEST_TIMEOUT` environment variable.
+REQUEST_TIMEOUT = float(os.environ.get("ROCRATE_REQUEST_TIMEOUT", 300))
+
+
+def get_manager(name=None, timeout=REQUEST_TIMEOUT):
+    """
+    Returns the RO-Crate manager, creating it (and setting up its cache) on first use. While
+    the cache is being built, a caller looking for the artifact `name` only waits for the
+    RO-Crates that may hold it, and for at most `timeout` seconds, see
+    `ROCratesManager.ensure_setup`.
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            # Imported here so that rocrate and the rest of the logic package are only
+            # loaded once a document needs them.
+            from logic.rocrate_manager import ROCratesManager
+            # The RO-Crates the document named by `ROCRATE_DOCUMENT` refers to are processed first.
+            _manager = ROCratesManager(document=os.environ.get("ROCRATE_DOCUMENT"), setup=False)
+        manager = _manager
+    manager.ensure_setup(name, timeout)
+    return manager
+
+
+async def in_thread(function, *args):
+    """
+    Runs a blocking call (waiting for the manager's setup, parsing a table, generating a
+    preview, ...) on a worker thread, so the event loop keeps serving other requests, such
+    as `health`, meanwhile. Raises `TimeoutError` after `REQUEST_TIMEOUT` seconds, the call
+    itself then runs to its end in the background.
+    """
+    return await asyncio.wait_for(asyncio.to_thread(function, *args), REQUEST_TIMEOUT)
+
+
+def start_manager() -> None:
+    """
+    Creates the RO-Crate manager in the background, so the first request finds it ready
+    (or waits only for the rest of its setup) without holding up the kernel's start.
+    """
+    def create():
+        try:
+            get_manager()
+        except Exception:
+            pass  # the error is logged, and raised again when the manager is next used
+
+    threading.Thread(target=create, name="rocrate-manager-setup", daemon=True).start()
+
+
+# The ROCratesManager methods that can be run as commands through the kernel's `execute`
+# and `evaluate`.
+COMMANDS = (
+    "query", "inputs", "dependents", "preview", "summary", "workflow", "ls", "diagnostics", "etag", "changed", "metrics",
+    "update",
+)
+# The commands' option keywords that differ from the names of the methods' parameters.
+COMMAND_KEYWORDS = {
+    "query": { "type": "entity_type" },
+    "metrics": { "format": "fmt" },
+}
+
+commands = Commands()
+for name in COMMANDS:
+    commands.register_lazy(name, lambda name=name: getattr(get_manager(), name), COMMAND_KEYWORDS.get(name))
+
+
+KERNEL_SECONDS = metrics.histogram(
+    "rocrate_kernel_seconds", "Time spent in the kernel's methods.", ("method",))
+KERNEL_ERRORS = metrics.counter(
+    "rocrate_kernel_errors_total", "Kernel method calls that raised an error.", ("method",))
+COMMAND_RUNS = metrics.counter(
+    "rocrate_kernel_commands_total", "Kernel commands run, by command and outcome.", ("command", "outcome"))
+
+
+def timed(method):
+    """Records the latency (and errors) of a kernel method, see `KERNEL_SECONDS`."""
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        with KERNEL_SECONDS.time(method=method.__name__):
+            try:
+                return await method(*args, **kwargs)
+            except Exception:
+                KERNEL_ERRORS.inc(method=method.__name__)
+                raise
+    return wrapper
+
+
+def run_command(code: str) -> tuple[list[T.Node], list[T.ExecutionMessage]]:
+    """
+    Runs a kernel command (see `logic.commands`) and returns its result as a JSON code block.
+    """
+    name = code.split(maxsplit=1)[0]
+    try:
+        result = commands.run(code)
+    except (CommandError, ValueError) as error:
+        COMMAND_RUNS.inc(command=name if name in commands else "unknown", outcome="error")
+        return [], [T.ExecutionMessage(message=str(error), level=T.MessageLevel.Error)]
+    COMMAND_RUNS.inc(command=name, outcome="ok")
+    from stencila_types import shortcuts as S
+    if isinstance(result, str) and "\n" in result:
+        return [S.cb(result, lang="text")], []  # e.g. the metrics in the Prometheus text format
+    return [S.cb(json.dumps(result, indent=2, default=str), lang="json")], []
+
+
+def artifact_etag(name: str) -> str | None:
+    """
+    Returns the version token (ETag) of the artifact `name`, which changes whenever its
+    metadata or content does. Clients can compare it with the token they hold, or ask with
+    the `changed` command, to skip fetching an unchanged artifact again.
+    """
+    try:
+        return get_manager(name).etag(name)
+    except ValueError:
+        return None
+
+
+def versioned_variable(name: str, artifact: str, **fields) -> T.Variable:
+    """Returns a variable for the artifact `artifact`, carrying its version token (ETag)."""
+    etag = artifact_etag(artifact)
+    return T.Variable(id=etag, name=name, native_hint=f'ETag: "{etag}"' if etag else None, **fields)
+
+
+# The number of rows of a table that are sent to the document as a variable's value.
+TABLE_PREVIEW_ROWS = 1000
+
+
+def table_variable(name: str, table) -> T.Variable:
+    """
+    Converts a parsed tabular artifact (see `logic.tabular`) into a variable holding the
+    first rows of the table, with a hint describing the whole table.
+    """
+    rows = min(table.kept_rows, TABLE_PREVIEW_ROWS)
+    value = T.Datatable(columns=[
+        T.DatatableColumn(name=column.name, values=column.to_list(0, rows))
+        for column in table.columns
+    ])
+    hint = T.DatatableHint(rows=table.num_rows, columns=[
+        T.DatatableColumnHint(name=column.name, item_type=column.type, minimum=column.minimum,
+                              maximum=column.maximum, nulls=column.nulls)
+        for column in table.columns
+    ])
+    return versioned_variable(name, name, native_type="Table", value=value, hint=hint)
+
+
+def image_variable(name: str, preview: dict) -> T.Variable:
+    """
+    Converts the preview of an image artifact (see `logic.preview`) into a variable holding
+    an image object, with its thumbnail embedded so the full resolution file is not read.
+    """
+    thumbnail = None
+    if preview.get("thumbnail"):
+        with open(preview["thumbnail"], "rb") as f:
+            data = base64.b64encode(f.read()).decode()
+        thumbnail = T.ImageObject(content_url=f"data:{preview['thumbnail_type']};base64,{data}")
+    value = T.ImageObject(
+        content_url=thumbnail.content_url if thumbnail else (
+            get_manager(name).find_artifact(name).get("symbolic_link") or preview["id"]),
+        media_type=preview["media_type"],
+        content_size=preview["size"],
+        thumbnail=thumbnail,
+    )
+    return versioned_variable(name, name, native_type="Image", value=value)
+
+
+def artifact_variables() -> list[T.Variable]:
+    """Returns the RO-Crate artifacts as variables, see `EchoKernel.list_variables`."""
+    return [versioned_variable("artifact", result, value=result) for result in get_manager().load_artifacts()]
+
+
+def artifact_variable(name: str) -> T.Variable | None:
+    """
+    Returns the artifact `name` as a variable: tabular artifacts as tables of their first
+    rows (see `TABLE_PREVIEW_ROWS`), parsed once and then reused from the manager's table
+    cache, and images as their (cached) thumbnails.
+    """
+    manager = get_manager(name)
+    try:
+        return table_variable(name, manager.load_table(name, max_rows=TABLE_PREVIEW_ROWS))
+    except ValueError:
+        pass
+    try:
+        preview = manager.preview(name)
+        if preview["kind"] == "image":
+            return image_variable(name, preview)
+    except ValueError:
+        pass
+
+    for result in manager.load_artifacts():
+        if result == name: # Assuming that there is a unique naming convention
+            return versioned_variable(name, name, value=result)
+    return None
 
 class EchoKernel(Kernel):
     """
@@ -46,6 +246,16 @@ class EchoKernel(Kernel):
     code for the kernel.
     """
 
+    async def on_start(self):
+        """Sets up the RO-Crate manager in the background, see `start_manager`."""
+        start_manager()
+
+    async def on_stop(self):
+        """Writes the metrics to the file named by `ROCRATE_METRICS_FILE`, if it is set."""
+        path = os.environ.get("ROCRATE_METRICS_FILE")
+        if path:
+            metrics.dump(path)
+
     @classmethod
     def get_name(cls) -> str:
         """
@@ -55,6 +265,7 @@ class EchoKernel(Kernel):
         """
         return "echo-python"
 
+    @timed
     async def execute(
         self, code: str
     ) -> tuple[Sequence[T.Node], list[T.ExecutionMessage]]:
@@ -66,35 +277,44 @@ class EchoKernel(Kernel):
         nodes. To make it easier to work with, we import the
         `stencila_types.shortcuts as S`
         """
+        if commands.is_command(code):
+            return await in_thread(run_command, code)
+
         # Instead of this...
         # nodes = [T.Paragraph(content=[T.Text(value=code)])]
         # ... we can do this:
+        from stencila_types import shortcuts as S
         nodes = [S.p(code)]
         messages = [
             T.ExecutionMessage(message="Echoing back", level=T.MessageLevel.Info)
         ]
         return nodes, messages
     
+    @timed
     async def evaluate(self, code: str) -> tuple[list[T.Node], list[T.ExecutionMessage]]:
         """
         Here we evaluate the code and return the evaluted result.
         """
+        if commands.is_command(code):
+            return await in_thread(run_command, code)
         return eval(code)
     
+    @timed
     async def list_variables(self):
         """ 
-        Here we return a list of ro-crate artifacts as variables.
+        Here we return a list of ro-crate artifacts as variables. Each variable carries the
+        artifact's version token (ETag) as its `id`, so clients can tell what has changed.
+        The manager is called on a worker thread, see `in_thread`.
         """
-        return list(T.Variable(name="artifact", value=result) for result in manager.load_artifacts())
+        return await in_thread(artifact_variables)
     
+    @timed
     async def get_variable(self, name: str):
         """ 
-        Here we return a single ro-crate artifact as a variable.
+        Here we return a single ro-crate artifact as a variable (see `artifact_variable`),
+        calling the manager on a worker thread (see `in_thread`).
         """
-        for result in manager.load_artifacts():
-            if result == name: # Assuming that there is a unique naming convention
-                return T.Variable(name=name, value=result)
-        return None
+        return await in_thread(artifact_variable, name)
 
 
 class EchoModel(Model):
@@ -107,6 +327,7 @@ class EchoModel(Model):
         return "stencila/echo-python"
 
     async def perform_task(self, task: ModelTask) -> ModelOutput:
+        from stencila_types.utilities import to_json
         return ModelOutput(format="json", content=to_json(task), authors=[])
 
 
@@ -2,7 +2,9 @@ import pytest
 from unittest.mock import MagicMock, patch
 from pathlib import Path
 from rocrate import rocrate
+from rocrate.rocrate import ROCrate
 import json
+import hashlib
 import os
 
 # Assuming the classes and logic above are in a file named artifact_module.py
@@ -134,8 +136,14 @@ def test_extract_artifact(mock_artifact):
         "description": "",
         "pseudonym": pseudonym,
         "version": "1.0",
-        "metadata": hash(json.dumps({"key": "value"})), 
-        "symbolic_link": str(Path(ARTIFACTS_DIR / pseudonym))
+        "provenance": None,
+        "metadata": hashlib.sha256(json.dumps({"key": "value"}).encode()).hexdigest(), 
+        "symbolic_link": str(Path(ARTIFACTS_DIR / pseudonym)),
+        "encoding_format": [],
+        "author": [],
+        "date": None,
+        "size": None,
+        "parts": [],
     }
     assert mock_artifact.extract_artifact() == artifact
 
@@ -149,3 +157,33 @@ def test_generate_pseudonyms(mock_artifacts):
     for i, mock_artifact in enumerate(mock_artifacts):
         generated_pseudonym = mock_artifact.create_pseudonym()
         assert generated_pseudonym == pseudonyms[i]
+
+
+def test_extract_artifact_index_fields():
+    rocrate = ROCrate(str(Path(__file__).parents[1] / "crates/valid/ro-crate-with-file-author-location"))
+    entity = next(entity for entity in rocrate.data_entities if entity.id == "data1.txt")
+    artifact = Artifact(rocrate, entity)
+
+    assert artifact.get_authors() == ["#alice", "Alice"]
+    assert artifact.get_encoding_format() == []
+    assert artifact.get_size() == (Path(rocrate.source) / "data1.txt").stat().st_size
+
+
+def test_open_content():
+    rocrate = ROCrate(str(Path(__file__).parents[1] / "crates/valid/ro-crate-with-file-author-location"))
+    entity = next(entity for entity in rocrate.data_entities if entity.id == "data1.txt")
+    artifact = Artifact(rocrate, entity)
+    data = (Path(rocrate.source) / "data1.txt").read_bytes()
+
+    with artifact.open_content() as content:
+        assert bytes(content.read()) == data
+    assert artifact.read(1, 3) == data[1:4]
+    assert b"".join(bytes(chunk) for chunk in artifact.iter_content(chunk_size=2)) == data
+
+
+def test_hash_properties_is_stable():
+    rocrate = ROCrate(str(Path(__file__).parents[1] / "crates/valid/ro-crate-with-file-author-location"))
+    entity = next(entity for entity in rocrate.data_entities if entity.id == "data1.txt")
+    expected = hashlib.sha256(json.dumps(entity.properties(), sort_keys=True).encode()).hexdigest()
+
+    assert Artifact(rocrate, entity).hash_properties() == expected
@@ -0,0 +1,115 @@
+"""
+Unit tests for the artifact tree module.
+"""
+import pytest
+from src.logic.artifact_tree import ROOT, ArtifactTree
+
+WORKSPACE = "/workspace"
+
+
+def artifact(entity_id, type="File", parts=None):
+    return { "id": entity_id, "type": type, "pseudonym": entity_id.rstrip("/"), "size": 1, "parts": parts or [] }
+
+
+@pytest.fixture
+def tree():
+    rocrates = [{
+        "path": f"{WORKSPACE}/crates/run",
+        "valid": True,
+        "children": [f"{WORKSPACE}/crates/run/nested"],
+        "artifacts": [
+            artifact("./", "Dataset", ["results/", "README.md"]),
+            artifact("README.md"),
+            artifact("results/", "Dataset", ["results/table.csv", "plots/"]),
+            artifact("results/table.csv"),
+            artifact("results/raw/values.txt"),
+            artifact("results/raw/", "Dataset"),
+            artifact("plots/", "Dataset"),
+            artifact("plots/a.png"),
+        ],
+    }, {
+        "path": f"{WORKSPACE}/crates/empty",
+        "valid": False,
+        "children": [],
+        "artifacts": None,
+    }]
+    return ArtifactTree.from_rocrates(rocrates, WORKSPACE)
+
+
+def ids(page):
+    return [child["id"] for child in page["children"]]
+
+
+def test_workspace_lists_rocrates(tree):
+    page = tree.children_page()
+    assert ids(page) == ["crates/empty", "crates/run"]
+    assert page["total"] == 2
+    assert page["next"] is None
+
+
+def test_rocrate_lists_top_level_artifacts(tree):
+    page = tree.children_page("crates/run")
+    assert ids(page) == ["crates/run/nested", "crates/run#results/", "crates/run#README.md"]
+    assert page["children"][0]["nested"] is True
+    assert page["children"][1]["children"] == 3
+
+
+def test_declared_parts_take_precedence(tree):
+    # plots/ is declared as a part of results/, though its path is not under it.
+    assert ids(tree.children_page("crates/run#results/")) == [
+        "crates/run#plots/", "crates/run#results/raw/", "crates/run#results/table.csv",
+    ]
+
+
+def test_parent_implied_by_path(tree):
+    assert ids(tree.children_page("crates/run#results/raw/")) == ["crates/run#results/raw/values.txt"]
+    assert tree.path("crates/run#results/raw/values.txt") == [
+        ROOT, "crates/run", "crates/run#results/", "crates/run#results/raw/",
+    ]
+
+
+def test_cursor_pagination(tree):
+    first = tree.children_page("crates/run", limit=2)
+    assert ids(first) == ["crates/run/nested", "crates/run#results/"]
+    assert first["next"] == "crates/run#results/"
+
+    second = tree.children_page("crates/run", limit=2, cursor=first["next"])
+    assert ids(second) == ["crates/run#README.md"]
+    assert second["next"] is None
+
+
+def test_unknown_node_and_cursor(tree):
+    with pytest.raises(ValueError):
+        tree.children_page("crates/missing")
+    with pytest.raises(ValueError):
+        tree.children_page("crates/run", cursor="crates/run#results/table.csv")
+
+
+def test_has_part_cycle_is_broken():
+    rocrates = [{
+        "path": f"{WORKSPACE}/crate",
+        "valid": True,
+        "artifacts": [artifact("a/", "Dataset", ["b/"]), artifact("b/", "Dataset", ["a/"])],
+    }]
+    tree = ArtifactTree.from_rocrates(rocrates, WORKSPACE)
+    assert len(tree) == 3
+    assert all(tree.path(node)[0] == ROOT for node in tree.nodes if node != ROOT)
+
+
+def test_large_crate_is_paged():
+    rocrates = [{
+        "path": f"{WORKSPACE}/crate",
+        "valid": True,
+        "artifacts": [artifact("data/", "Dataset")] + [artifact(f"data/{i:05}.txt") for i in range(5000)],
+    }]
+    tree = ArtifactTree.from_rocrates(rocrates, WORKSPACE)
+
+    seen, cursor = [], None
+    while True:
+        page = tree.children_page("crate#data/", limit=1000, cursor=cursor)
+        assert len(page["children"]) <= 1000
+        seen.extend(ids(page))
+        cursor = page["next"]
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 5000
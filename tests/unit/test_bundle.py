@@ -0,0 +1,117 @@
+"""
+Unit tests for relocatable cache bundles.
+"""
+import os
+import json
+import shutil
+import tarfile
+import pytest
+from pathlib import Path
+from src.logic import cache_manager, cli
+from src.logic.cache_manager import CacheManager
+from src.logic.bundle import (
+    RELATIVE_PATHS, export_bundle, import_bundle, metadata_hash, read_cache_data, relocate,
+)
+
+CRATE_DIR = Path(__file__).parents[1] / "crates/valid/ro-crate-with-file-author-location"
+
+
+@pytest.fixture(autouse=True)
+def cache_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_manager, "ROCRATE_DATA_DIR", tmp_path / "rocrate-cache")
+    monkeypatch.setattr(cache_manager, "ARTIFACTS_DIR", tmp_path / "rocrate-cache/artifacts")
+
+
+def make_workspace(root):
+    """A workspace holding one RO-Crate, and its cache as the plugin would build it."""
+    shutil.copytree(CRATE_DIR, root / "crates/one")
+    manager = CacheManager(str(root))
+    crate = str(root / "crates/one")
+    link = manager.artifacts_dir / "data1.txt"
+    link.symlink_to(os.path.join(crate, "data1.txt"))
+    data = {
+        "version": "3",
+        "rocrates": [{
+            "uuid": "x", "path": crate, "metadata": metadata_hash(crate), "valid": True,
+            "children": [], "issues": [],
+            "artifacts": [{ "id": "data1.txt", "pseudonym": "data1.txt", "symbolic_link": str(link) }],
+        }],
+    }
+    manager.save_data_to_json(relocate(data, manager.workspace, manager.artifacts_dir, to_relative=True))
+    (Path(manager.data_dir) / "previews/ab").mkdir(parents=True)
+    (Path(manager.data_dir) / "previews/ab/abcd.json").write_text('{"kind": "text"}')
+    thumbnail = Path(manager.data_dir) / "previews/ab/abef.png"
+    thumbnail.write_bytes(b"png")
+    (Path(manager.data_dir) / "previews/ab/abef.json").write_text(json.dumps({ "kind": "image", "thumbnail": str(thumbnail) }))
+    return manager, data
+
+
+def test_relocate_round_trip(tmp_path):
+    manager, data = make_workspace(tmp_path / "workspace")
+    relative = relocate(data, manager.workspace, manager.artifacts_dir, to_relative=True)
+
+    assert relative["paths"] == RELATIVE_PATHS
+    assert relative["rocrates"][0]["path"] == "crates/one"
+    assert relative["rocrates"][0]["artifacts"][0]["symbolic_link"] == "data1.txt"
+    assert relocate(relative, manager.workspace, manager.artifacts_dir, to_relative=True) is relative
+    assert relocate(relative, manager.workspace, manager.artifacts_dir, to_relative=False) == data
+
+
+def test_export_and_import_into_another_checkout(tmp_path):
+    source, _ = make_workspace(tmp_path / "ci")
+    bundle = str(tmp_path / "cache.tar.gz")
+    manifest = export_bundle(source, bundle)
+    assert [rocrate["path"] for rocrate in manifest["rocrates"]] == ["crates/one"]
+
+    shutil.copytree(tmp_path / "ci/crates", tmp_path / "workstation/crates")
+    target = CacheManager(str(tmp_path / "workstation"))
+    result = import_bundle(target, bundle)
+    assert result == { "imported": ["crates/one"], "stale": [] }
+
+    data = read_cache_data(target)
+    assert data["version"] == "3"
+    link = target.artifacts_dir / "data1.txt"
+    assert os.readlink(link) == str(tmp_path / "workstation/crates/one/data1.txt")
+    assert (Path(target.data_dir) / "previews/ab/abcd.json").exists()
+    # Thumbnails are carried over, with their paths in the importer's cache.
+    preview = json.loads((Path(target.data_dir) / "previews/ab/abef.json").read_text())
+    assert preview["thumbnail"] == str(Path(target.data_dir) / "previews/ab/abef.png")
+    assert Path(preview["thumbnail"]).read_bytes() == b"png"
+
+
+def test_import_leaves_out_changed_crates(tmp_path):
+    source, _ = make_workspace(tmp_path / "ci")
+    bundle = str(tmp_path / "cache.tar.gz")
+    export_bundle(source, bundle)
+
+    shutil.copytree(tmp_path / "ci/crates", tmp_path / "workstation/crates")
+    metadata = tmp_path / "workstation/crates/one/ro-crate-metadata.json"
+    metadata.write_text(metadata.read_text().replace("Alice", "Bob"))
+
+    result = import_bundle(CacheManager(str(tmp_path / "workstation")), bundle)
+    assert result == { "imported": [], "stale": ["crates/one"] }
+
+
+def test_import_rejects_other_archives(tmp_path):
+    with tarfile.open(tmp_path / "other.tar.gz", "w:gz") as archive:
+        archive.add(CRATE_DIR / "ro-crate-metadata.json", "ro-crate-metadata.json")
+    with pytest.raises(ValueError):
+        import_bundle(CacheManager(str(tmp_path)), str(tmp_path / "other.tar.gz"))
+
+
+def test_cli_stats_export_import(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(cli, "CacheManager", CacheManager)
+    make_workspace(tmp_path / "ci")
+    bundle = str(tmp_path / "cache.tar.gz")
+
+    assert cli.main(["stats", "--directory", str(tmp_path / "ci")]) == 0
+    stats = json.loads(capsys.readouterr().out)
+    assert (stats["rocrates"], stats["valid"], stats["artifacts"]) == (1, 1, 1)
+
+    assert cli.main(["export", bundle, "-d", str(tmp_path / "ci")]) == 0
+    capsys.readouterr()
+    shutil.copytree(tmp_path / "ci/crates", tmp_path / "workstation/crates")
+    assert cli.main(["import", bundle, "-d", str(tmp_path / "workstation")]) == 0
+    assert json.loads(capsys.readouterr().out) == { "imported": 1, "stale": [] }
+
+    assert cli.main(["import", str(tmp_path / "missing.tar.gz")]) == 1
@@ -0,0 +1,146 @@
+"""
+Unit tests for the cache garbage collection module.
+"""
+import os
+import json
+import shutil
+import pytest
+from pathlib import Path
+from src.logic import cache_manager, cli
+from src.logic.cache_manager import CacheManager
+from src.logic.bundle import metadata_hash, relocate
+from src.logic.cache_gc import (
+    DANGLING_LINK, MISSING_CRATE, MISSING_LINK, MOVED_CRATE, ORPHANED_LINK,
+    CacheCollector, check, disk_usage, load_data,
+)
+
+CRATE_DIR = Path(__file__).parents[1] / "crates/valid/ro-crate-with-file-author-location"
+FILES = ("data1.txt", "data2.txt")
+
+
+@pytest.fixture(autouse=True)
+def cache_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_manager, "ROCRATE_DATA_DIR", tmp_path / "rocrate-cache")
+    monkeypatch.setattr(cache_manager, "ARTIFACTS_DIR", tmp_path / "rocrate-cache/artifacts")
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    """A workspace holding one RO-Crate, and its cache as the plugin would build it."""
+    root = tmp_path / "workspace"
+    crate = root / "crates/one"
+    shutil.copytree(CRATE_DIR, crate)
+    manager = CacheManager(str(root))
+    artifacts = []
+    for name in FILES:
+        link = manager.artifacts_dir / name
+        link.symlink_to(crate / name)
+        artifacts.append({ "id": name, "pseudonym": name, "symbolic_link": str(link) })
+    data = {
+        "version": "1",
+        "rocrates": [{
+            "uuid": "x", "path": str(crate), "metadata": metadata_hash(crate), "valid": True,
+            "children": [], "issues": [], "artifacts": artifacts,
+        }],
+    }
+    manager.save_data_to_json(relocate(data, manager.workspace, manager.artifacts_dir, to_relative=True))
+    return manager
+
+
+def kinds(issues):
+    return sorted(issue["kind"] for issue in issues)
+
+
+def test_healthy_cache_has_no_issues(workspace):
+    assert check(workspace) == []
+
+
+def test_dangling_orphaned_and_missing_links(workspace):
+    crate = Path(workspace.workspace) / "crates/one"
+    (crate / "data1.txt").unlink()
+    (workspace.artifacts_dir / "data2.txt").unlink()
+    (workspace.artifacts_dir / "stale_file.txt").symlink_to(crate / "data2.txt")
+
+    issues = check(workspace)
+    assert kinds(issues) == [DANGLING_LINK, MISSING_LINK, ORPHANED_LINK]
+
+    report = CacheCollector(workspace).run()
+    assert kinds(report["repaired"]) == kinds(issues)
+    assert report["remaining"] is False
+    assert sorted(os.listdir(workspace.artifacts_dir)) == ["data2.txt"]
+    assert check(workspace) == []
+
+
+def test_missing_and_moved_crates(workspace):
+    root = Path(workspace.workspace)
+    shutil.move(root / "crates/one", root / "crates/renamed")
+
+    assert kinds(check(workspace)) == [DANGLING_LINK, DANGLING_LINK, MISSING_CRATE]
+    moved = check(workspace, paths=[str(root / "crates/renamed")])
+    assert moved[0] == { "kind": MOVED_CRATE, "path": str(root / "crates/one"), "to": str(root / "crates/renamed") }
+
+    report = CacheCollector(workspace).run()
+    assert len(report["repaired"]) == 3
+    assert load_data(workspace)["rocrates"] == []
+    assert os.listdir(workspace.artifacts_dir) == []
+
+
+def test_run_respects_budget_and_resumes(workspace):
+    for i in range(5):
+        (workspace.artifacts_dir / f"orphan{i}").symlink_to(workspace.artifacts_dir / "missing")
+
+    collector = CacheCollector(workspace)
+    assert collector.run(budget=0) == { "repaired": [], "errors": 0, "remaining": True }
+
+    collector.budget = 60
+    report = collector.run()
+    assert len(report["repaired"]) == 5
+    assert collector.cursor is None
+    assert sorted(os.listdir(workspace.artifacts_dir)) == list(FILES)
+
+
+def test_run_defers_to_builder(workspace):
+    (workspace.artifacts_dir / "orphan").symlink_to(workspace.artifacts_dir / "missing")
+    with workspace.build_lock():
+        assert CacheCollector(workspace).run() is None
+    assert (workspace.artifacts_dir / "orphan").is_symlink()
+
+
+def test_collect_in_background(workspace):
+    (workspace.artifacts_dir / "orphan").symlink_to(workspace.artifacts_dir / "missing")
+    reports = []
+    CacheCollector(workspace).start(on_repair=reports.append).join(timeout=10)
+    assert len(reports) == 1
+    assert not (workspace.artifacts_dir / "orphan").is_symlink()
+
+
+def test_no_cache_data(tmp_path):
+    manager = CacheManager(str(tmp_path))
+    (manager.artifacts_dir / "orphan").symlink_to(tmp_path / "missing")
+    assert check(manager) == []
+    assert CacheCollector(manager).run() == { "repaired": [], "errors": 0, "remaining": False }
+
+
+def test_disk_usage(workspace, tmp_path):
+    other = CacheManager(str(tmp_path / "deleted"))
+    (Path(other.data_dir) / "rocrate_data.json").write_text("x" * 1000)
+
+    usage = disk_usage(workspace)
+    by_id = { entry["id"]: entry for entry in usage["workspaces"] }
+    assert by_id[other.workspace_id]["exists"] is False
+    assert by_id[workspace.workspace_id]["current"] is True
+    assert usage["total"] == sum(entry["size"] for entry in usage["workspaces"])
+    assert workspace.load_workspaces()[other.workspace_id]["size"] >= 1000
+
+
+def test_cli_fsck_and_du(workspace, monkeypatch, capsys):
+    monkeypatch.setattr(cli, "CacheManager", CacheManager)
+    (workspace.artifacts_dir / "orphan").symlink_to(workspace.artifacts_dir / "missing")
+
+    assert cli.main(["fsck", "-d", workspace.workspace]) == 0
+    assert kinds(json.loads(capsys.readouterr().out)["issues"]) == [ORPHANED_LINK]
+    assert cli.main(["fsck", "--repair", "-d", workspace.workspace]) == 0
+    assert json.loads(capsys.readouterr().out)["repaired"] == 1
+
+    assert cli.main(["du", "-d", workspace.workspace]) == 0
+    assert len(json.loads(capsys.readouterr().out)["workspaces"]) == 1
@@ -0,0 +1,175 @@
+"""
+Unit tests for the cache manager module.
+"""
+import pytest
+import json
+import multiprocessing
+from src.logic import cache_manager
+from src.logic.cache_manager import CacheManager, FILENAME, workspace_id
+from src.logic.file_lock import FileLock, atomic_write
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_manager, "ROCRATE_DATA_DIR", tmp_path / "rocrate-cache")
+    monkeypatch.setattr(cache_manager, "ARTIFACTS_DIR", tmp_path / "rocrate-cache/artifacts")
+    return CacheManager()
+
+
+def _write_many(data_dir, artifacts_dir, writer, count):
+    cache_manager.ROCRATE_DATA_DIR = data_dir
+    cache_manager.ARTIFACTS_DIR = artifacts_dir
+    manager = CacheManager()
+    for i in range(count):
+        manager.save_data_to_json({ "version": str(i), "writer": writer, "rocrates": [] })
+
+
+def test_init_creates_directories(cache):
+    assert cache_manager.ROCRATE_DATA_DIR.is_dir()
+    assert cache_manager.ARTIFACTS_DIR.is_dir()
+
+
+def test_init_does_not_clear_existing_links(cache, tmp_path):
+    target = tmp_path / "target.txt"
+    target.write_text("data")
+    link = cache_manager.ARTIFACTS_DIR / "target_file.txt"
+    link.symlink_to(target)
+
+    CacheManager()
+
+    assert link.is_symlink()
+
+
+def test_save_and_load_round_trip(cache):
+    data = { "version": "1", "rocrates": [{ "path": "/a", "valid": True }] }
+    cache.save_data_to_json(data)
+    assert cache.load_data_from_json() == data
+
+
+def test_save_leaves_no_temporary_files(cache):
+    cache.save_data_to_json({ "version": "1", "rocrates": [] })
+    names = [path.name for path in cache_manager.ROCRATE_DATA_DIR.iterdir() if path.is_file()]
+    assert not [name for name in names if name.endswith(".tmp")]
+
+
+def test_load_missing_file_raises(cache):
+    with pytest.raises(FileNotFoundError):
+        cache.load_data_from_json()
+
+
+def test_build_lock_excludes_second_holder(cache):
+    with cache.build_lock():
+        assert not cache.build_lock().try_acquire()
+    lock = cache.build_lock()
+    assert lock.try_acquire()
+    lock.release()
+
+
+def test_build_lock_timeout(cache):
+    with cache.build_lock(), pytest.raises(TimeoutError):
+        cache.build_lock(timeout=0.1).acquire()
+
+
+def test_shared_locks_coexist(tmp_path):
+    path = tmp_path / "shared.lock"
+    with FileLock(path, shared=True):
+        other = FileLock(path, shared=True)
+        assert other.try_acquire()
+        assert not FileLock(path).try_acquire()
+        other.release()
+
+
+def test_atomic_write_replaces_contents(tmp_path):
+    path = tmp_path / "file.json"
+    atomic_write(path, "old")
+    atomic_write(path, b"new")
+    assert path.read_text() == "new"
+
+
+def test_concurrent_writers_never_corrupt_the_cache(cache):
+    processes = [
+        multiprocessing.Process(
+            target=_write_many,
+            args=(cache_manager.ROCRATE_DATA_DIR, cache_manager.ARTIFACTS_DIR, writer, 50),
+        )
+        for writer in range(3)
+    ]
+    for process in processes:
+        process.start()
+
+    # Every read taken while the writers are running must be a complete document.
+    while any(process.is_alive() for process in processes):
+        path = cache_manager.ROCRATE_DATA_DIR / FILENAME
+        if path.exists():
+            with open(path) as f:
+                assert "rocrates" in json.load(f)
+
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    assert cache.load_data_from_json()["version"] == "49"
+
+
+def test_workspace_id_is_stable_and_distinct(tmp_path):
+    (tmp_path / "one").mkdir()
+    (tmp_path / "two").mkdir()
+    assert workspace_id(tmp_path / "one") == workspace_id(str(tmp_path / "one"))
+    assert workspace_id(tmp_path / "one") != workspace_id(tmp_path / "two")
+
+
+def test_workspaces_have_separate_caches(cache, tmp_path):
+    one = CacheManager(tmp_path)
+    two = CacheManager(tmp_path / "rocrate-cache")
+    one.save_data_to_json({ "version": "1", "rocrates": [], "workspace": "one" })
+    two.save_data_to_json({ "version": "1", "rocrates": [], "workspace": "two" })
+
+    assert one.artifacts_dir != two.artifacts_dir
+    assert CacheManager(tmp_path).load_data_from_json()["workspace"] == "one"
+    assert CacheManager(tmp_path / "rocrate-cache").load_data_from_json()["workspace"] == "two"
+
+
+def test_least_recently_used_workspaces_are_evicted(cache, tmp_path):
+    directories = [tmp_path / name for name in ["a", "b", "c"]]
+    for directory in directories:
+        directory.mkdir()
+        CacheManager(directory).save_data_to_json({ "version": "1", "rocrates": [] })
+
+    current = CacheManager(directories[2], max_workspaces=2)
+
+    workspaces = current.load_workspaces()
+    assert workspace_id(directories[0]) not in workspaces
+    assert set(workspaces) == { workspace_id(directories[1]), workspace_id(directories[2]) }
+    assert not (cache_manager.ROCRATE_DATA_DIR / "workspaces" / workspace_id(directories[0])).exists()
+
+
+def test_size_budget_never_evicts_current_workspace(cache, tmp_path):
+    current = CacheManager(tmp_path, size_budget=0)
+    current.save_data_to_json({ "version": "1", "rocrates": [] })
+    CacheManager(tmp_path, size_budget=0)
+
+    assert current.data_dir.exists()
+    assert current.workspace_id in current.load_workspaces()
+
+
+def test_workspace_being_built_is_not_evicted(cache, tmp_path):
+    (tmp_path / "busy").mkdir()
+    busy = CacheManager(tmp_path / "busy")
+    busy.save_data_to_json({ "version": "1", "rocrates": [] })
+
+    with busy.build_lock():
+        CacheManager(tmp_path, max_workspaces=1)
+
+    assert busy.data_dir.exists()
+
+
+def test_workspace_in_use_is_not_evicted(cache, tmp_path):
+    (tmp_path / "serving").mkdir()
+    serving = CacheManager(tmp_path / "serving")
+    serving.save_data_to_json({ "version": "1", "rocrates": [] })
+
+    CacheManager(tmp_path, max_workspaces=1)
+    assert serving.data_dir.exists()
+
+    serving.close()
+    CacheManager(tmp_path, max_workspaces=1)
+    assert not serving.data_dir.exists()
@@ -0,0 +1,76 @@
+"""
+Unit tests for the kernel commands module.
+"""
+import pytest
+from src.logic.commands import Commands
+
+
+def query(type=None, limit=None):
+    return { "type": type, "limit": limit }
+
+
+@pytest.fixture
+def commands():
+    commands = Commands()
+    commands.register("query", query)
+    commands.register("echo", lambda *words: list(words))
+    return commands
+
+
+def test_is_command(commands):
+    assert commands.is_command("query type=File")
+    assert commands.is_command("  echo")
+    assert not commands.is_command("print('hello')")
+    assert not commands.is_command("")
+
+
+def test_parse(commands):
+    assert commands.parse('query type=File text="two words" extra') == ("query", ["extra"], { "type": "File", "text": "two words" })
+    assert commands.parse("1 + 1") is None
+
+
+def test_run(commands):
+    assert commands.run("query type=File limit=2") == { "type": "File", "limit": "2" }
+    assert commands.run("echo a 'b c'") == ["a", "b c"]
+
+
+def test_run_unknown_command(commands):
+    with pytest.raises(ValueError, match="Unknown command"):
+        commands.run("unknown")
+
+
+def test_run_invalid_arguments(commands):
+    with pytest.raises(ValueError, match="Invalid arguments"):
+        commands.run("query colour=red")
+
+
+def test_run_unbalanced_quotes(commands):
+    with pytest.raises(ValueError, match="Could not parse"):
+        commands.run('query text="unbalanced')
+
+
+def test_register_lazy(commands):
+    resolved = []
+
+    def resolve():
+        resolved.append(True)
+        return query
+
+    commands.register_lazy("lazy", resolve)
+    assert commands.is_command("lazy type=File")
+    assert "lazy" in commands.names()
+    assert resolved == []  # nothing is resolved until the command runs
+
+    assert commands.run("lazy type=File") == { "type": "File", "limit": None }
+    assert commands.run("lazy limit=2") == { "type": None, "limit": "2" }
+    assert resolved == [True]
+
+
+def test_keywords_map_to_parameters(commands):
+    def metrics(fmt="json", path=None):
+        return { "fmt": fmt, "path": path }
+
+    commands.register("metrics", metrics, { "format": "fmt" })
+    assert commands.run("metrics format=prometheus") == { "fmt": "prometheus", "path": None }
+    with pytest.raises(ValueError, match="Invalid arguments"):
+        commands.run("metrics fmt=prometheus")
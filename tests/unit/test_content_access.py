@@ -0,0 +1,132 @@
+"""
+Unit tests for the zero-copy content access module.
+"""
+import os
+import zipfile
+import threading
+import pytest
+from src.logic.content_access import ContentRegistry, StreamedContent
+from src.logic.zip_crate import ZipCrate
+
+DATA = bytes(range(256)) * 4096  # 1 MiB
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / "output.bin"
+    path.write_bytes(DATA)
+    return str(path)
+
+
+def make_zip(path, compression):
+    with zipfile.ZipFile(path, "w", compression=compression) as archive:
+        archive.writestr("ro-crate-metadata.json", '{"@graph": []}')
+        archive.writestr("output.bin", DATA)
+    return str(path)
+
+
+def test_read_returns_views(data_file):
+    registry = ContentRegistry()
+    with registry.open_file(data_file) as content:
+        view = content.read(100, 50)
+        assert isinstance(view, memoryview)
+        assert bytes(view) == DATA[100:150]
+        assert content.size == len(DATA)
+        assert bytes(content.read(len(DATA) - 5, 100)) == DATA[-5:]
+        assert bytes(content.read(len(DATA) + 5)) == b""
+        view.release()
+    with pytest.raises(ValueError):
+        content.read()
+
+
+def test_iter_chunks(data_file):
+    registry = ContentRegistry()
+    with registry.open_file(data_file) as content:
+        chunks = [bytes(chunk) for chunk in content.iter_chunks(300_000, offset=10)]
+    assert [len(chunk) for chunk in chunks] == [300_000, 300_000, 300_000, len(DATA) - 900_010]
+    assert b"".join(chunks) == DATA[10:]
+
+
+def test_mappings_are_shared_and_reference_counted(data_file):
+    registry = ContentRegistry()
+    first = registry.open_file(data_file)
+    second = registry.open_file(data_file)
+    assert registry.stats()["mappings"] == 1
+    assert registry.stats()["handles"] == 2
+
+    first.close()
+    first.close()  # closing twice releases once
+    assert registry.stats()["handles"] == 1
+    second.close()
+    assert len(registry) == 0
+
+
+def test_mapping_outlives_views_still_in_use(data_file):
+    registry = ContentRegistry()
+    content = registry.open_file(data_file)
+    view = content.read(0, 10)
+    content.close()
+    assert registry.stats()["released_in_use"] == 1
+    assert bytes(view) == DATA[:10]
+
+    view.release()
+    registry.open_file(data_file).close()
+    assert registry.stats()["released_in_use"] == 0
+
+
+def test_changed_file_gets_a_new_mapping(data_file):
+    registry = ContentRegistry()
+    with registry.open_file(data_file) as old:
+        with open(data_file + ".new", "wb") as f:
+            f.write(b"new content")
+        os.replace(data_file + ".new", data_file)
+        with registry.open_file(data_file) as new:
+            assert bytes(new.read()) == b"new content"
+            assert bytes(old.read(0, 3)) == DATA[:3]
+            assert len(registry) == 2
+
+
+def test_empty_file(tmp_path):
+    (tmp_path / "empty").write_bytes(b"")
+    with ContentRegistry().open_file(str(tmp_path / "empty")) as content:
+        assert content.size == 0
+        assert list(content.iter_chunks()) == []
+
+
+def test_concurrent_readers_share_one_mapping(data_file):
+    registry = ContentRegistry()
+    barrier = threading.Barrier(8)
+    results = []
+
+    def reader(number):
+        with registry.open_file(data_file) as content:
+            barrier.wait()
+            results.append(bytes(content.read(number * 1000, 10)))
+            assert registry.stats()["mappings"] == 1
+            barrier.wait()
+
+    threads = [threading.Thread(target=reader, args=(number,)) for number in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == sorted(DATA[n * 1000:n * 1000 + 10] for n in range(8))
+    assert len(registry) == 0
+
+
+def test_stored_zip_member_is_mapped_in_place(tmp_path):
+    path = make_zip(tmp_path / "crate.zip", zipfile.ZIP_STORED)
+    registry = ContentRegistry()
+    with ZipCrate(path) as crate, registry.open_member(crate, "output.bin") as content:
+        assert not isinstance(content, StreamedContent)
+        assert bytes(content.read(1000, 20)) == DATA[1000:1020]
+        assert content.size == len(DATA)
+
+
+def test_compressed_zip_member_is_streamed(tmp_path):
+    path = make_zip(tmp_path / "crate.zip", zipfile.ZIP_DEFLATED)
+    registry = ContentRegistry()
+    with ZipCrate(path) as crate, registry.open_member(crate, "output.bin") as content:
+        assert isinstance(content, StreamedContent)
+        assert content.read(1000, 20) == DATA[1000:1020]
+        assert b"".join(content.iter_chunks(100_000, offset=5)) == DATA[5:]
@@ -0,0 +1,120 @@
+"""
+Unit tests for the dataset summary module.
+"""
+import os
+import zipfile
+import pytest
+from src.logic import dataset_summary
+from src.logic.dataset_summary import DatasetSummaries, summarise_members
+
+
+def make_dataset(root):
+    (root / "images" / "raw").mkdir(parents=True)
+    (root / "data.csv").write_text("a,b\n1,2\n")
+    (root / "notes.txt").write_text("hello")
+    (root / "images" / "a.png").write_bytes(b"x" * 10)
+    (root / "images" / "raw" / "b.png").write_bytes(b"y" * 20)
+    return root
+
+
+@pytest.fixture
+def counted_scans(monkeypatch):
+    """Records the directories scanned by `scan_directory`."""
+    scanned = []
+    scan = dataset_summary.scan_directory
+
+    def counting_scan(path):
+        scanned.append(os.path.basename(path))
+        return scan(path)
+
+    monkeypatch.setattr(dataset_summary, "scan_directory", counting_scan)
+    return scanned
+
+
+def test_summarise(tmp_path):
+    dataset = make_dataset(tmp_path / "dataset")
+    summary = DatasetSummaries(tmp_path / "cache").summarise(dataset)
+
+    assert summary["bytes"] == 8 + 5 + 10 + 20
+    assert summary["files"] == 4
+    assert summary["directories"] == 2
+    assert summary["types"] == { "image/png": 2, "text/csv": 1, "text/plain": 1 }
+    assert list(summary["types"])[0] == "image/png"
+    assert summary["newest_modified"].endswith("Z")
+
+
+def test_summarise_not_a_directory(tmp_path):
+    (tmp_path / "file.txt").write_text("x")
+    with pytest.raises(ValueError):
+        DatasetSummaries(tmp_path / "cache").summarise(tmp_path / "file.txt")
+
+
+def test_only_changed_directories_are_rescanned(tmp_path, counted_scans):
+    dataset = make_dataset(tmp_path / "dataset")
+    summaries = DatasetSummaries(tmp_path / "cache")
+    summaries.summarise(dataset)
+    assert sorted(counted_scans) == ["dataset", "images", "raw"]
+
+    counted_scans.clear()
+    summaries.summarise(dataset)
+    assert counted_scans == []
+
+    (dataset / "images" / "raw" / "c.png").write_bytes(b"z" * 5)
+    counted_scans.clear()
+    summary = summaries.summarise(dataset)
+    assert counted_scans == ["raw"]
+    assert summary["files"] == 5
+    assert summary["types"]["image/png"] == 3
+
+    counted_scans.clear()
+    summaries.summarise(dataset, refresh=True)
+    assert sorted(counted_scans) == ["dataset", "images", "raw"]
+
+
+def test_removed_directories_are_forgotten(tmp_path):
+    dataset = make_dataset(tmp_path / "dataset")
+    summaries = DatasetSummaries(tmp_path / "cache")
+    summaries.summarise(dataset)
+
+    for path in (dataset / "images" / "raw").iterdir():
+        path.unlink()
+    (dataset / "images" / "raw").rmdir()
+    summary = summaries.summarise(dataset)
+
+    assert summary["files"] == 3
+    assert summary["directories"] == 1
+    assert str(dataset / "images" / "raw") not in summaries.records
+
+
+def test_summaries_persist(tmp_path, counted_scans):
+    dataset = make_dataset(tmp_path / "dataset")
+    first = DatasetSummaries(tmp_path / "cache").summarise(dataset)
+
+    counted_scans.clear()
+    second = DatasetSummaries(tmp_path / "cache").summarise(dataset)
+    assert counted_scans == []
+    assert second == first
+
+
+def test_symbolic_links_are_not_followed(tmp_path):
+    dataset = make_dataset(tmp_path / "dataset")
+    os.symlink(dataset, dataset / "loop")
+    summary = DatasetSummaries(tmp_path / "cache").summarise(dataset)
+    assert summary["files"] == 4
+
+
+def test_summarise_members(tmp_path):
+    archive_path = tmp_path / "crate.zip"
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        archive.writestr("crate/dataset/data.csv", "a,b\n")
+        archive.writestr("crate/dataset/images/a.png", b"x" * 10)
+        archive.writestr("crate/other.txt", "x")
+
+    with zipfile.ZipFile(archive_path) as archive:
+        members = [info for info in archive.infolist() if info.filename.startswith("crate/dataset/")]
+        summary = summarise_members(members, "crate/dataset/")
+
+    assert summary["bytes"] == 14
+    assert summary["files"] == 2
+    assert summary["directories"] == 1
+    assert summary["types"] == { "image/png": 1, "text/csv": 1 }
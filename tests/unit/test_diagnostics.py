@@ -0,0 +1,116 @@
+"""
+Unit tests for parsing the rocrate-validator's reports into diagnostics.
+"""
+import json
+from src.logic.diagnostics import (
+    STRUCTURE_PROFILE, parse_json_report, parse_report, parse_text_report, structure_issues, timeout_issues,
+)
+
+JSON_REPORT = {
+    "passed": False,
+    "issues": [
+        {
+            "severity": "REQUIRED",
+            "message": "The Root Data Entity MUST have a `datePublished` property",
+            "violatingEntity": "./",
+            "violatingProperty": "http://schema.org/datePublished",
+            "check": {
+                "identifier": "ro-crate-1.1_5.4",
+                "name": "Root Data Entity: `datePublished` property",
+                "severity": "REQUIRED",
+                "requirement": { "identifier": "ro-crate-1.1_5", "name": "Root Data Entity REQUIRED properties" },
+                "profile": { "identifier": "ro-crate-1.1", "name": "RO-Crate Metadata Specification 1.1" },
+            },
+        },
+        {
+            "severity": "RECOMMENDED",
+            "message": "The Root Data Entity SHOULD have a license",
+            "check": { "identifier": "ro-crate-1.1_6.1", "profile": "ro-crate-1.1" },
+        },
+    ],
+}
+
+TEXT_REPORT = """
+\x1b[1m╭─ [Profile: ro-crate-1.1] ─────────────────╮\x1b[0m
+│                                            │
+│  [REQUIRED] Root Data Entity REQUIRED properties
+│    ├── [ro-crate-1.1_5.4]: Root Data Entity: `datePublished` property
+│    │    Detected issues:
+│    │    - [Violating entity: ./] The Root Data Entity MUST have a `datePublished` property
+│  [RECOMMENDED] Root Data Entity RECOMMENDED properties
+│    ├── [ro-crate-1.1_6.1]: Root Data Entity: `license` property
+│    │    - The Root Data Entity SHOULD have a license
+╰────────────────────────────────────────────╯
+"""
+
+
+def test_parse_json_report():
+    issues = parse_json_report("Validating...\n" + json.dumps(JSON_REPORT))
+    assert issues[0] == {
+        "severity": "REQUIRED",
+        "profile": "ro-crate-1.1",
+        "requirement": "Root Data Entity REQUIRED properties",
+        "check": "ro-crate-1.1_5.4",
+        "focus_node": "./",
+        "message": "The Root Data Entity MUST have a `datePublished` property",
+    }
+    assert issues[1]["severity"] == "RECOMMENDED"
+    assert issues[1]["profile"] == "ro-crate-1.1"
+    assert issues[1]["focus_node"] is None
+
+
+def test_parse_json_report_rejects_other_output():
+    assert parse_json_report("no json here") is None
+    assert parse_json_report('{"something": "else"}') is None
+
+
+def test_parse_text_report():
+    issues = parse_text_report(TEXT_REPORT)
+    assert issues == [
+        {
+            "severity": "REQUIRED",
+            "profile": "ro-crate-1.1",
+            "requirement": "Root Data Entity REQUIRED properties",
+            "check": "ro-crate-1.1_5.4",
+            "focus_node": "./",
+            "message": "The Root Data Entity MUST have a `datePublished` property",
+        },
+        {
+            "severity": "RECOMMENDED",
+            "profile": "ro-crate-1.1",
+            "requirement": "Root Data Entity RECOMMENDED properties",
+            "check": "ro-crate-1.1_6.1",
+            "focus_node": None,
+            "message": "The Root Data Entity SHOULD have a license",
+        },
+    ]
+
+
+def test_parse_report_prefers_json():
+    issues = parse_report(json.dumps(JSON_REPORT).encode(), b"", 1)
+    assert [issue["check"] for issue in issues] == ["ro-crate-1.1_5.4", "ro-crate-1.1_6.1"]
+    assert parse_report(TEXT_REPORT.encode(), b"", 1)[0]["check"] == "ro-crate-1.1_5.4"
+
+
+def test_unparsable_failure_keeps_raw_output():
+    issues = parse_report(b"", b"Traceback: something broke", 1)
+    assert len(issues) == 1
+    assert issues[0]["message"] == "Traceback: something broke"
+
+
+def test_passing_validation_has_no_issues():
+    assert parse_report(b"RO-Crate is valid!", b"", 0) == []
+
+
+def test_structure_issues():
+    issues = structure_issues(["The metadata has no @context."])
+    assert issues[0]["severity"] == "REQUIRED"
+    assert issues[0]["profile"] == STRUCTURE_PROFILE
+    assert issues[0]["message"] == "The metadata has no @context."
+
+
+def test_timeout_issues():
+    issue, = timeout_issues(120, 3, quarantined=True)
+    assert issue["severity"] == "REQUIRED"
+    assert "120 seconds" in issue["message"] and "quarantined" in issue["message"]
+    assert "quarantined" not in timeout_issues(120, 1)[0]["message"]
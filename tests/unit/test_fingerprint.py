@@ -0,0 +1,71 @@
+"""
+Unit tests for content fingerprints and deterministic identifiers.
+"""
+import os
+import uuid
+import hashlib
+import zipfile
+from src.logic import fingerprint
+from src.logic.fingerprint import content_id, file_fingerprint, member_fingerprint
+
+
+def test_file_fingerprint_changes_with_content(tmp_path):
+    path = tmp_path / "data.txt"
+    path.write_text("one")
+    first = file_fingerprint(path)
+
+    assert file_fingerprint(path) == first
+    path.write_text("two")
+    assert file_fingerprint(path) != first
+
+
+def test_member_fingerprint_is_relocatable(tmp_path):
+    # The same archive in two checkouts gives its members the same fingerprints.
+    for name in ("one.zip", "two.zip"):
+        with zipfile.ZipFile(tmp_path / name, "w") as archive:
+            archive.writestr(zipfile.ZipInfo("data.txt", (2024, 1, 1, 0, 0, 0)), "content")
+    fingerprints = [
+        member_fingerprint(zipfile.ZipFile(tmp_path / name).getinfo("data.txt")) for name in ("one.zip", "two.zip")
+    ]
+    assert fingerprints[0] == fingerprints[1]
+
+
+def test_content_id_is_deterministic():
+    identifier = content_id("crates/one", "abc")
+
+    assert uuid.UUID(identifier).version == 5
+    assert content_id("crates/one", "abc") == identifier
+    assert content_id("crates/one", "abd") != identifier
+    assert content_id("crates/two", "abc") != identifier
+    # Parts are separated, so moving characters between them changes the identifier.
+    assert content_id("crates/on", "eabc") != identifier
+
+
+def test_file_fingerprint_hashes_the_whole_file(tmp_path):
+    path = tmp_path / "data.bin"
+    data = bytearray(1024 * 1024)
+    path.write_bytes(data)
+    first = file_fingerprint(path)
+
+    # An edit that keeps the size, away from the start, middle and end of the file.
+    data[len(data) // 4] = 1
+    path.write_bytes(data)
+    assert file_fingerprint(path) != first
+
+
+def test_file_fingerprint_is_memoised_once_settled(tmp_path, monkeypatch):
+    path = tmp_path / "data.txt"
+    path.write_text("one")
+    os.utime(path, (1, 1))
+    first = file_fingerprint(path)
+    reads = []
+    sha256 = hashlib.sha256
+    monkeypatch.setattr(fingerprint.hashlib, "sha256", lambda: reads.append(1) or sha256())
+    assert file_fingerprint(path) == first
+    assert reads == []
+
+    # A file modified just now is hashed again, as a second edit may keep its signature.
+    path.write_text("two")
+    file_fingerprint(path)
+    file_fingerprint(path)
+    assert len(reads) == 2
@@ -0,0 +1,80 @@
+"""
+Unit tests for the JSON codec.
+"""
+import io
+import json
+import pytest
+from src.logic import json_codec
+from src.logic.json_codec import GraphReader, iter_graph
+
+DOCUMENT = {
+    "@context": "https://w3id.org/ro/crate/1.1/context",
+    "@graph": [
+        { "@id": "ro-crate-metadata.json", "about": { "@id": "./" } },
+        { "@id": "./", "@type": "Dataset", "hasPart": [{ "@id": "data/é☃.csv" }] },
+        { "@id": "data/é☃.csv", "@type": "File", "contentSize": 12345678901, "ratio": 1.5e-3, "flags": [True, None] },
+    ],
+    "after": [1, 2],
+}
+
+
+@pytest.fixture(params=["orjson", "json"])
+def backend(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    monkeypatch.setattr(json_codec, "BACKEND", request.param)
+    return request.param
+
+
+def test_round_trip(backend):
+    data = json_codec.dumps(DOCUMENT)
+    assert isinstance(data, bytes)
+    assert json_codec.loads(data) == DOCUMENT
+    assert json_codec.loads(data.decode()) == DOCUMENT
+    assert json_codec.load(io.BytesIO(data)) == DOCUMENT
+
+
+def test_compact_and_indented_output(backend):
+    assert json_codec.dumps({ "b": [1, 2], "a": "x" }, sort_keys=True) == b'{"a":"x","b":[1,2]}'
+    indented = json_codec.dumps({ "a": [1] }, indent=True)
+    assert b"\n" in indented and json.loads(indented) == { "a": [1] }
+
+
+def test_falls_back_for_values_orjson_cannot_serialise(backend):
+    assert json_codec.loads(json_codec.dumps({ "big": 2 ** 70 })) == { "big": 2 ** 70 }
+
+
+def test_invalid_json_raises_value_error(backend):
+    with pytest.raises(ValueError):
+        json_codec.loads(b"{not json")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 1024 * 1024])
+@pytest.mark.parametrize("binary", [True, False])
+def test_graph_reader(chunk_size, binary):
+    text = json.dumps(DOCUMENT, ensure_ascii=False, indent=2)
+    f = io.BytesIO(text.encode()) if binary else io.StringIO(text)
+    reader = GraphReader(f, chunk_size)
+
+    assert list(reader) == DOCUMENT["@graph"]
+    assert reader.has_graph
+    assert reader.members == { "@context": DOCUMENT["@context"], "after": [1, 2] }
+
+
+@pytest.mark.parametrize("text, graph, members, has_graph", [
+    ('{}', [], {}, False),
+    ('{"@graph": []}', [], {}, True),
+    ('{"@graph": {"@id": "./"}}', [], { "@graph": { "@id": "./" } }, False),
+    ('{"a": 10, "@graph": [1, 20]}', [1, 20], { "a": 10 }, True),
+])
+def test_graph_reader_shapes(text, graph, members, has_graph):
+    reader = GraphReader(io.StringIO(text), 1)
+    assert list(reader) == graph
+    assert reader.members == members
+    assert reader.has_graph == has_graph
+
+
+@pytest.mark.parametrize("text", ['[1]', '{"@graph": [1 2]}', '{"a": 1', '', '{"@graph": [{"@id": "x"}'])
+def test_graph_reader_rejects_invalid_json(text):
+    with pytest.raises(ValueError):
+        list(iter_graph(io.StringIO(text), 2))
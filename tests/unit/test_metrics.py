@@ -0,0 +1,124 @@
+"""
+Unit tests for the metrics module.
+"""
+import threading
+import pytest
+from src.logic.metrics import MetricsRegistry
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def test_counter(registry):
+    requests = registry.counter("requests_total", "Requests.", ("result",))
+    requests.inc(result="hit")
+    requests.inc(2, result="hit")
+    requests.inc(result="miss")
+
+    assert requests.value(result="hit") == 3
+    assert requests.value(result="miss") == 1
+    with pytest.raises(ValueError):
+        requests.inc(-1, result="hit")
+    with pytest.raises(ValueError):
+        requests.inc(other="x")
+
+
+def test_gauge(registry):
+    artifacts = registry.gauge("artifacts", "Artifacts.")
+    artifacts.set(10)
+    artifacts.inc(5)
+    artifacts.dec(2)
+    assert artifacts.value() == 13
+
+
+def test_registration_is_idempotent(registry):
+    assert registry.counter("a_total", "A.") is registry.counter("a_total", "A.")
+    with pytest.raises(ValueError):
+        registry.gauge("a_total", "A.")
+
+
+def test_histogram_buckets_and_quantiles(registry):
+    latency = registry.histogram("latency_seconds", "Latency.", ("method",), buckets=(0.1, 1.0, 10.0))
+    for value in (0.05, 0.05, 0.5, 5.0, 50.0):
+        latency.observe(value, method="get")
+
+    assert latency.count(method="get") == 5
+    assert latency.quantile(0.2, method="get") == pytest.approx(0.05)
+    assert 0.1 <= latency.quantile(0.6, method="get") <= 1.0
+    assert latency.quantile(0.99, method="get") == 10.0
+    assert latency.quantile(0.5, method="other") is None
+
+    with latency.time(method="timed"):
+        pass
+    assert latency.count(method="timed") == 1
+
+
+def test_histogram_times_failures(registry):
+    latency = registry.histogram("latency_seconds", "Latency.")
+    with pytest.raises(RuntimeError):
+        with latency.time():
+            raise RuntimeError()
+    assert latency.count() == 1
+
+
+def test_render_prometheus_text(registry):
+    registry.counter("requests_total", "Requests served.", ("result",)).inc(result='say "hi"')
+    registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0)).observe(0.5)
+    text = registry.render()
+
+    assert "# HELP requests_total Requests served.\n# TYPE requests_total counter\n" in text
+    assert 'requests_total{result="say \\"hi\\""} 1\n' in text
+    assert "# TYPE latency_seconds histogram\n" in text
+    assert 'latency_seconds_bucket{le="0.1"} 0\n' in text
+    assert 'latency_seconds_bucket{le="1"} 1\n' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 1\n' in text
+    assert "latency_seconds_sum 0.5\nlatency_seconds_count 1\n" in text
+    assert "rocrate_process_uptime_seconds " in text
+
+
+def test_collectors(registry):
+    hits = { "value": 3 }
+    registry.collector("cache", lambda: [("cache_hits_total", "counter", "Hits.", {}, hits["value"])])
+    assert registry.snapshot()["cache_hits_total"]["samples"] == [{ "labels": {}, "value": 3 }]
+
+    hits["value"] = 4
+    assert "cache_hits_total 4\n" in registry.render()
+
+    registry.collector("broken", lambda: 1 / 0)
+    assert "cache_hits_total" in registry.snapshot()
+
+
+def test_snapshot_percentiles(registry):
+    latency = registry.histogram("latency_seconds", "Latency.", ("method",))
+    for _ in range(100):
+        latency.observe(0.02, method="get")
+    sample = registry.snapshot()["latency_seconds"]["samples"][0]
+    assert sample["labels"] == { "method": "get" }
+    assert sample["count"] == 100
+    assert 0.01 <= sample["p50"] <= 0.025
+
+
+def test_dump(registry, tmp_path):
+    registry.counter("requests_total", "Requests.").inc()
+    path = registry.dump(tmp_path / "metrics.prom")
+    assert "requests_total 1\n" in open(path).read()
+
+
+def test_concurrent_updates(registry):
+    requests = registry.counter("requests_total", "Requests.")
+    latency = registry.histogram("latency_seconds", "Latency.")
+
+    def work():
+        for _ in range(1000):
+            requests.inc()
+            latency.observe(0.001)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert requests.value() == 8000
+    assert latency.count() == 8000
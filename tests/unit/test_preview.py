@@ -0,0 +1,123 @@
+"""
+Unit tests for the artifact preview module.
+"""
+import io
+import os
+import struct
+import zlib
+import pytest
+from src.logic import preview as preview_module
+from src.logic.preview import (
+    PreviewCache, generate_preview, image_dimensions, sniff_media_type,
+)
+
+
+def png_bytes(width, height):
+    """A minimal, valid greyscale PNG."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    rows = b"".join(b"\x00" + bytes(width) for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b""))
+
+
+def jpeg_header(width, height, exif=4000):
+    """The start of a JPEG, with an APP1 (EXIF) segment before the start of frame."""
+    app1 = b"\xff\xe1" + struct.pack(">H", exif + 2) + bytes(exif)
+    sof = b"\xff\xc0" + struct.pack(">HBHH", 17, 8, height, width) + bytes(12)
+    return b"\xff\xd8" + app1 + sof
+
+
+def test_sniff_media_type():
+    assert sniff_media_type(png_bytes(1, 1)) == "image/png"
+    assert sniff_media_type(b"%PDF-1.7 ...") == "application/pdf"
+    assert sniff_media_type(b"a,b\n1,2\n", "data.csv") == "text/csv"
+    assert sniff_media_type(b"hello \xc3") == "text/plain"
+    assert sniff_media_type(b"\x00\x01\x02") == "application/octet-stream"
+
+
+def test_image_dimensions_from_headers():
+    assert image_dimensions(io.BytesIO(png_bytes(640, 480)), "image/png") == (640, 480)
+    assert image_dimensions(io.BytesIO(jpeg_header(1920, 1080)), "image/jpeg") == (1920, 1080)
+    assert image_dimensions(io.BytesIO(b"GIF89a" + struct.pack("<HH", 3, 7)), "image/gif") == (3, 7)
+    assert image_dimensions(io.BytesIO(b"\xff\xd8"), "image/jpeg") is None
+
+
+def test_text_preview_is_an_excerpt():
+    text = "".join(f"line {i}\n" for i in range(1000)).encode()
+    preview, thumbnail = generate_preview(io.BytesIO(text), len(text), "log.txt")
+
+    assert preview["kind"] == "text"
+    assert preview["excerpt"].splitlines() == [f"line {i}" for i in range(20)]
+    assert preview["truncated"] is True
+    assert thumbnail is None
+
+
+def test_binary_preview_is_hex():
+    data = bytes(range(256)) * 10
+    preview, _ = generate_preview(io.BytesIO(data), len(data))
+    assert preview["kind"] == "binary"
+    assert preview["hex"].split()[:3] == ["00", "01", "02"]
+    assert len(preview["hex"].split()) == 64
+
+
+def test_image_preview_without_pillow(monkeypatch):
+    monkeypatch.setattr(preview_module, "Image", None)
+    data = png_bytes(300, 200)
+    preview, thumbnail = generate_preview(io.BytesIO(data), len(data), "plot.png")
+    assert (preview["kind"], preview["width"], preview["height"]) == ("image", 300, 200)
+    assert thumbnail is None
+
+
+def test_image_thumbnail_is_downscaled():
+    image = pytest.importorskip("PIL.Image")
+    data = png_bytes(1024, 512)
+    preview, thumbnail = generate_preview(io.BytesIO(data), len(data), "plot.png")
+
+    assert (preview["width"], preview["height"]) == (1024, 512)
+    content, media_type = thumbnail
+    assert media_type == "image/jpeg"
+    assert image.open(io.BytesIO(content)).size == (256, 128)
+
+
+def test_preview_cache_round_trip(tmp_path):
+    cache = PreviewCache(str(tmp_path / "previews"))
+    assert cache.get("ab" * 32) is None
+
+    stored = cache.put("ab" * 32, { "kind": "image", "size": 10 }, (b"thumbnail", "image/png"))
+    assert stored["thumbnail"].startswith(str(tmp_path / "previews" / "ab"))
+    assert cache.get("ab" * 32) == stored
+
+    # A preview whose thumbnail has gone is regenerated.
+    os.unlink(stored["thumbnail"])
+    assert cache.get("ab" * 32) is None
+
+
+def test_preview_cache_evicts_least_recently_used(tmp_path):
+    cache = PreviewCache(str(tmp_path / "previews"), budget=10 ** 9)
+    for number, fingerprint in enumerate(("aa", "bb", "cc")):
+        cache.put(fingerprint * 32, { "kind": "binary" }, (bytes(1000), "image/png"))
+        os.utime(cache._path(fingerprint * 32), (number, number))
+        os.utime(cache._path(fingerprint * 32, ".png"), (number, number))
+
+    cache.get("aa" * 32)  # marks "aa" as the most recently used
+    cache.budget = cache.size() - 1
+    assert cache.evict() == 1
+    assert cache.get("bb" * 32) is None
+    assert cache.get("aa" * 32) is not None and cache.get("cc" * 32) is not None
+
+
+def test_preview_cache_walks_the_directory_once(tmp_path, monkeypatch):
+    PreviewCache(str(tmp_path / "previews")).put("aa" * 32, { "kind": "binary" }, (bytes(1000), "image/png"))
+    walks = []
+    walk = os.walk
+    monkeypatch.setattr(os, "walk", lambda *args: walks.append(1) or walk(*args))
+
+    cache = PreviewCache(str(tmp_path / "previews"), budget=2500)
+    for fingerprint in ("bb", "cc", "dd"):
+        cache.put(fingerprint * 32, { "kind": "binary" }, (bytes(1000), "image/png"))
+    assert len(walks) == 1
+    # The entry stored before the cache was opened counts towards the budget, and is evicted first.
+    assert cache.get("aa" * 32) is None and cache.get("bb" * 32) is None
+    assert cache.size() <= 2500
+    assert cache.size() == sum(size for _, size, _ in cache.entries().values())
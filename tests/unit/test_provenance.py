@@ -0,0 +1,83 @@
+"""
+Unit tests for the provenance module.
+"""
+import pytest
+import json
+from pathlib import Path
+from rocrate.rocrate import ROCrate
+from src.logic.provenance import ProvenanceGraph
+
+CRATE_DIR = Path(__file__).parents[1] / "crates/valid/workflow-run-crate"
+WORKFLOW = "Galaxy-Workflow-Hello_World.ga"
+INPUT = "inputs/abcdef.txt"
+OUTPUTS = ["outputs/Select_first_on_data_1_2.txt", "outputs/tac_on_data_360_1.txt"]
+
+
+def action(id, objects, results, instrument=None):
+    entity = {
+        "@id": id,
+        "@type": "CreateAction",
+        "object": [{ "@id": object } for object in objects],
+        "result": [{ "@id": result } for result in results],
+    }
+    if instrument:
+        entity["instrument"] = { "@id": instrument }
+    return entity
+
+
+@pytest.fixture
+def workflow_run():
+    return ProvenanceGraph.from_rocrate(ROCrate(str(CRATE_DIR)))
+
+
+@pytest.fixture
+def chain():
+    """raw.csv -> clean.csv -> (figure.png, summary.txt), with clean.csv also used by #report."""
+    return ProvenanceGraph.from_entities([
+        action("#clean", ["./raw.csv"], ["clean.csv"], instrument="clean.py"),
+        action("#plot", ["clean.csv"], ["figure.png", "summary.txt"]),
+        action("#report", ["summary.txt", "figure.png"], ["report.pdf"]),
+        { "@id": "raw.csv", "@type": "File" },
+    ])
+
+
+def test_workflow_run_inputs(workflow_run):
+    for output in OUTPUTS:
+        assert set(workflow_run.upstream(output)) == { WORKFLOW, INPUT, "#verbose-pv" }
+        assert workflow_run.producers(output)[0]["type"] == "CreateAction"
+
+
+def test_workflow_run_dependents(workflow_run):
+    assert workflow_run.downstream(INPUT) == OUTPUTS
+    assert workflow_run.downstream(WORKFLOW) == OUTPUTS
+    assert workflow_run.downstream(OUTPUTS[0]) == []
+
+
+def test_transitive_upstream(chain):
+    assert chain.upstream("report.pdf", transitive=False) == ["summary.txt", "figure.png"]
+    assert set(chain.upstream("report.pdf")) == { "summary.txt", "figure.png", "clean.csv", "raw.csv", "clean.py" }
+
+
+def test_transitive_downstream(chain):
+    assert chain.downstream("raw.csv", transitive=False) == ["clean.csv"]
+    assert set(chain.downstream("./raw.csv")) == { "clean.csv", "figure.png", "summary.txt", "report.pdf" }
+
+
+def test_unknown_entity(chain):
+    assert chain.upstream("unknown") == []
+    assert chain.downstream("unknown") == []
+    assert chain.producers("unknown") == []
+
+
+def test_cycles_terminate():
+    graph = ProvenanceGraph.from_entities([action("#a", ["x"], ["y"]), action("#b", ["y"], ["x"])])
+    assert graph.upstream("x") == ["y"]
+    assert graph.downstream("x") == ["y"]
+
+
+def test_round_trip_through_the_cache(chain):
+    restored = ProvenanceGraph.from_dict(json.loads(json.dumps(chain.to_dict())))
+    assert restored.upstream("report.pdf") == chain.upstream("report.pdf")
+    assert restored.downstream("raw.csv") == chain.downstream("raw.csv")
+    assert restored.producers("clean.csv") == chain.producers("clean.csv")
+    assert ProvenanceGraph.from_dict(None).upstream("report.pdf") == []
@@ -0,0 +1,127 @@
+"""
+Unit tests for the query engine module.
+"""
+import pytest
+from src.logic.query_engine import ArtifactIndex, parse_date, tokenize
+
+
+def make_artifact(id, type="File", encoding_format=None, author=None, date=None, size=None, description=""):
+    return {
+        "id": id,
+        "name": "",
+        "type": type,
+        "description": description,
+        "pseudonym": id,
+        "encoding_format": encoding_format or [],
+        "author": author or [],
+        "date": date,
+        "size": size,
+    }
+
+
+@pytest.fixture
+def index():
+    rocrates = [
+        {
+            "path": "/data/workflow-run-crate",
+            "artifacts": [
+                make_artifact("inputs/abcdef.txt", encoding_format=["text/plain"], size=10),
+                make_artifact("outputs/result.csv", encoding_format=["text/csv"], size=2000,
+                              date="2018-09-19T17:01:07+10:00", description="Reversed lines"),
+                make_artifact("workflow.ga", type=["File", "SoftwareSourceCode", "ComputationalWorkflow"],
+                              author=["#alice", "Alice"]),
+            ],
+        },
+        {
+            "path": "/data/ro-crate-with-web-resources",
+            "artifacts": [
+                make_artifact("survey-responses-2019.csv", encoding_format=["text/csv"], size=500,
+                              date="2019-01-01", description="Survey responses from 2019"),
+                make_artifact("lots_of_little_files/", type="Dataset"),
+            ],
+        },
+        { "path": "/data/invalid", "artifacts": None },
+    ]
+    return ArtifactIndex.from_rocrates(rocrates)
+
+
+def ids(results):
+    return [artifact["id"] for artifact in results]
+
+
+def test_no_filters_returns_everything(index):
+    assert len(index.query()) == 5
+
+
+def test_filter_by_type(index):
+    assert ids(index.query(entity_type="Dataset")) == ["lots_of_little_files/"]
+    assert ids(index.query(entity_type="computationalworkflow")) == ["workflow.ga"]
+    assert len(index.query(entity_type="File")) == 4
+
+
+def test_filter_by_encoding_format(index):
+    assert ids(index.query(encoding_format="text/csv")) == ["outputs/result.csv", "survey-responses-2019.csv"]
+
+
+def test_filter_by_crate(index):
+    assert ids(index.query(encoding_format="text/csv", crate="workflow-run-crate")) == ["outputs/result.csv"]
+    assert len(index.query(crate="/data/ro-crate-with-web-resources/")) == 2
+    assert index.query(crate="unknown") == []
+
+
+def test_filter_by_author(index):
+    assert ids(index.query(author="Alice")) == ["workflow.ga"]
+    assert ids(index.query(author="#alice")) == ["workflow.ga"]
+
+
+def test_free_text(index):
+    assert ids(index.query(text="survey")) == ["survey-responses-2019.csv"]
+    assert ids(index.query(text="reversed LINES")) == ["outputs/result.csv"]
+    assert index.query(text="reversed survey") == []
+
+
+def test_size_range(index):
+    assert ids(index.query(min_size=100)) == ["outputs/result.csv", "survey-responses-2019.csv"]
+    assert ids(index.query(min_size=10, max_size=500)) == ["inputs/abcdef.txt", "survey-responses-2019.csv"]
+
+
+def test_date_range(index):
+    assert ids(index.query(since="2019-01-01")) == ["survey-responses-2019.csv"]
+    assert ids(index.query(until="2018-12-31")) == ["outputs/result.csv"]
+
+
+@pytest.mark.parametrize("bounds", [{ "since": "2024-13-01" }, { "until": "yesterday" }])
+def test_invalid_date_bounds_are_rejected(index, bounds):
+    with pytest.raises(ValueError, match="Invalid date"):
+        index.query(**bounds)
+
+
+def test_date_only_until_includes_the_whole_day():
+    index = ArtifactIndex.from_rocrates([{ "path": "/data/crate", "artifacts": [
+        make_artifact("morning.csv", date="2018-09-19T00:00:00Z"),
+        make_artifact("evening.csv", date="2018-09-19T23:30:00Z"),
+        make_artifact("next.csv", date="2018-09-20T00:00:00Z"),
+    ]}])
+    assert ids(index.query(until="2018-09-19")) == ["morning.csv", "evening.csv"]
+    assert ids(index.query(since="2018-09-19", until="2018-09-19")) == ["morning.csv", "evening.csv"]
+    assert ids(index.query(until="2018-09-19T23:30:00Z")) == ["morning.csv", "evening.csv"]
+    assert ids(index.query(until="2018-09-20T00:00:00Z")) == ["morning.csv", "evening.csv", "next.csv"]
+
+
+def test_limit(index):
+    assert len(index.query(entity_type="File", limit=2)) == 2
+
+
+def test_results_record_their_crate(index):
+    assert index.query(text="survey")[0]["crate"] == "/data/ro-crate-with-web-resources"
+
+
+def test_parse_date():
+    assert parse_date("2019-01-01T00:00:00Z") == parse_date("2019-01-01")
+    assert parse_date("not a date") is None
+    assert parse_date(None) is None
+
+
+def test_tokenize():
+    assert tokenize("Survey-responses_2019.csv") == {"survey", "responses", "2019", "csv"}
+    assert tokenize(None) == set()
@@ -0,0 +1,125 @@
+"""
+Unit tests for the remote resolver module, run against a local stub HTTP server.
+"""
+import pytest
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.logic.remote_resolver import RemoteResolver, is_remote
+
+ETAG = '"v1"'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    requests = []
+    delay = 0.0
+
+    def do_HEAD(self):
+        StubHandler.requests.append((self.path, self.headers.get("If-None-Match")))
+        time.sleep(StubHandler.delay)
+
+        if self.path == "/missing":
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", "1234")
+        self.send_header("ETag", ETAG)
+        self.send_header("Last-Modified", "Wed, 21 Oct 2015 07:28:00 GMT")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    StubHandler.requests = []
+    StubHandler.delay = 0.0
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_is_remote():
+    assert is_remote("https://zenodo.org/record/3541888/files/ro-crate-1.0.0.pdf")
+    assert is_remote("HTTP://example.org/data.csv")
+    assert not is_remote("survey-responses-2019.csv")
+    assert not is_remote(None)
+
+
+def test_resolve_fetches_metadata(server, tmp_path):
+    resolver = RemoteResolver(tmp_path, offline=False)
+    result = resolver.resolve([f"{server}/data.csv"])[f"{server}/data.csv"]
+
+    assert result["status"] == 200
+    assert result["content_type"] == "text/csv"
+    assert result["content_length"] == 1234
+    assert result["etag"] == ETAG
+    assert not result["from_cache"]
+
+
+def test_resolve_ignores_local_ids(server, tmp_path):
+    assert RemoteResolver(tmp_path, offline=False).resolve(["data.csv"]) == {}
+    assert StubHandler.requests == []
+
+
+def test_resolve_uses_conditional_requests(server, tmp_path):
+    url = f"{server}/data.csv"
+    RemoteResolver(tmp_path, offline=False).resolve([url])
+    result = RemoteResolver(tmp_path, offline=False).resolve([url])[url]
+
+    assert StubHandler.requests[-1] == ("/data.csv", ETAG)
+    assert result["from_cache"]
+    assert result["content_length"] == 1234
+
+
+def test_resolve_is_concurrent(server, tmp_path):
+    StubHandler.delay = 0.2
+    urls = [f"{server}/file{i}.csv" for i in range(20)]
+
+    start = time.monotonic()
+    results = RemoteResolver(tmp_path, offline=False, concurrency=20).resolve(urls)
+
+    assert len(results) == 20
+    assert time.monotonic() - start < 20 * StubHandler.delay / 2
+
+
+def test_offline_mode_makes_no_requests(server, tmp_path):
+    url = f"{server}/data.csv"
+    RemoteResolver(tmp_path, offline=False).resolve([url])
+    StubHandler.requests = []
+
+    results = RemoteResolver(tmp_path, offline=True).resolve([url, f"{server}/unseen.csv"])
+
+    assert StubHandler.requests == []
+    assert results[url]["etag"] == ETAG
+    assert results[url]["offline"]
+    assert results[f"{server}/unseen.csv"]["status"] is None
+
+
+def test_unreachable_resource_reports_error(tmp_path):
+    url = "http://127.0.0.1:9/unreachable.csv"
+    result = RemoteResolver(tmp_path, offline=False, timeout=2).resolve([url])[url]
+
+    assert result["status"] is None
+    assert result["error"]
+
+
+def test_missing_resource_reports_status(server, tmp_path):
+    url = f"{server}/missing"
+    assert RemoteResolver(tmp_path, offline=False).resolve([url])[url]["status"] == 404
+
+
+async def test_resolve_inside_running_event_loop(server, tmp_path):
+    url = f"{server}/data.csv"
+    assert RemoteResolver(tmp_path, offline=False).resolve([url])[url]["status"] == 200
@@ -0,0 +1,46 @@
+"""
+Unit tests for the RO-Crate manager module.
+"""
+import sys
+import shutil
+import pytest
+from pathlib import Path
+from src.logic.rocrate_manager import ROCratesManager
+
+CRATE_DIR = Path(__file__).parents[1] / "crates/valid/workflow-run-crate"
+WORKFLOW = "Galaxy-Workflow-Hello_World.ga"
+INPUT = "inputs/abcdef.txt"
+OUTPUTS = ["outputs/Select_first_on_data_1_2.txt", "outputs/tac_on_data_360_1.txt"]
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    """A manager, not set up, over a workspace holding the workflow run RO-Crate."""
+    # The cache module the manager uses, which may be imported as `logic` rather than `src.logic`.
+    cache_manager = sys.modules[ROCratesManager.__init__.__globals__["CacheManager"].__module__]
+    monkeypatch.setattr(cache_manager, "ROCRATE_DATA_DIR", tmp_path / "rocrate-cache")
+    monkeypatch.setattr(cache_manager, "ARTIFACTS_DIR", tmp_path / "rocrate-cache/artifacts")
+    shutil.copytree(CRATE_DIR, tmp_path / "workspace/workflow-run-crate")
+    return ROCratesManager(str(tmp_path / "workspace"), offline=True, setup=False)
+
+
+def index_rocrate(manager, path):
+    """Builds the manager's index from the cache entry of the RO-Crate at `path`."""
+    info = manager.make_rocrate_info(str(path), path / "ro-crate-metadata.json", manager.load_rocrate(str(path)))
+    manager.build_index([info])
+    return info
+
+
+def test_provenance_from_the_cache_entries(manager):
+    path = Path(manager.directory) / "workflow-run-crate"
+    info = index_rocrate(manager, path)
+    assert info["provenance"] is not None
+    assert list(manager.provenance) == [str(path)]
+
+    for output in OUTPUTS:
+        [lineage] = manager.inputs(output)
+        assert lineage["crate"] == str(path)
+        assert { WORKFLOW, INPUT } <= set(lineage["inputs"])
+
+    [lineage] = manager.dependents(INPUT)
+    assert lineage["outputs"] == OUTPUTS
@@ -3,8 +3,10 @@ Unit tests for the scanner module.
 """
 import pytest
 import tempfile
+from unittest.mock import patch
 import os
-from src.logic.scanner import scanner
+import json
+from src.logic.scanner import scanner, scan_crates
 
 
 def test_none_input_returns_empty_list():
@@ -104,4 +106,91 @@ def test_large_number_rocrates_returns_correct_number_dirs():
         
         assert len(scanner(str(temp_dir))) == 1000
 
+
+def write_metadata(directory, parts=(), entities=()):
+    os.makedirs(directory, exist_ok=True)
+    graph = [
+        { "@id": "ro-crate-metadata.json", "@type": "CreativeWork", "about": { "@id": "./" } },
+        { "@id": "./", "@type": "Dataset", "hasPart": [{ "@id": part } for part in parts] },
+        *entities,
+    ]
+    with open(os.path.join(directory, "ro-crate-metadata.json"), "w") as f:
+        json.dump({ "@context": "https://w3id.org/ro/crate/1.1/context", "@graph": graph }, f)
+
+
+def test_nested_rocrate_is_recorded_as_child():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        write_metadata(temp_dir)
+        write_metadata(os.path.join(temp_dir, "nested"))
+
+        assert scanner(str(temp_dir)) == [temp_dir]
+        assert scan_crates(str(temp_dir)) == { temp_dir: [os.path.join(temp_dir, "nested")] }
+
+
+def test_payload_directories_are_not_walked():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        write_metadata(temp_dir, parts=["lots_of_little_files/", "inputs/abcdef.txt"])
+        # These would be reported if the payload directories were walked.
+        write_metadata(os.path.join(temp_dir, "lots_of_little_files", "deep"))
+        write_metadata(os.path.join(temp_dir, "inputs", "deep"))
+
+        walked = []
+        original_walk = os.walk
+
+        def recording_walk(top):
+            for root, dirs, files in original_walk(top):
+                walked.append(root)
+                yield root, dirs, files
+
+        with patch("os.walk", recording_walk):
+            assert scan_crates(str(temp_dir)) == { temp_dir: [] }
+        assert walked == [temp_dir]
+
+
+def test_payload_directory_holding_rocrate_is_walked():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        write_metadata(temp_dir, parts=["sub/"])
+        write_metadata(os.path.join(temp_dir, "sub"))
+
+        assert scan_crates(str(temp_dir)) == { temp_dir: [os.path.join(temp_dir, "sub")] }
+
+
+def test_payload_declared_as_rocrate_is_walked():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        subcrate = { "@id": "sub/", "@type": "Dataset", "conformsTo": { "@id": "https://w3id.org/ro/crate" } }
+        write_metadata(temp_dir, parts=["sub/"], entities=[subcrate])
+        write_metadata(os.path.join(temp_dir, "sub", "deeper"))
+
+        assert scan_crates(str(temp_dir)) == { temp_dir: [os.path.join(temp_dir, "sub", "deeper")] }
+
+
+def test_rocrate_declared_two_levels_down_is_found():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data = { "@id": "data/", "@type": "Dataset", "hasPart": [{ "@id": "data/runs/" }] }
+        subcrate = { "@id": "data/runs/", "@type": "Dataset", "conformsTo": { "@id": "https://w3id.org/ro/crate/1.1" } }
+        write_metadata(temp_dir, parts=["data/", "results/"], entities=[data, subcrate])
+        write_metadata(os.path.join(temp_dir, "data", "runs"))
+        # Not declared, so its payload directory is not walked.
+        write_metadata(os.path.join(temp_dir, "results", "runs"))
+
+        assert scan_crates(str(temp_dir)) == { temp_dir: [os.path.join(temp_dir, "data", "runs")] }
+
+
+def test_malformed_metadata_walks_everything():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with open(os.path.join(temp_dir, "ro-crate-metadata.json"), "w") as f:
+            f.write("{ not json")
+        write_metadata(os.path.join(temp_dir, "one", "nested"))
+
+        assert scan_crates(str(temp_dir)) == { temp_dir: [os.path.join(temp_dir, "one", "nested")] }
+
+
+def test_sibling_rocrates_are_independent():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        write_metadata(os.path.join(temp_dir, "one"), parts=["data/"])
+        write_metadata(os.path.join(temp_dir, "two"))
+        os.makedirs(os.path.join(temp_dir, "one", "data"))
+
+        assert scan_crates(str(temp_dir)) == { os.path.join(temp_dir, "one"): [], os.path.join(temp_dir, "two"): [] }
+
 # TODO: test that exceptions are raised
@@ -0,0 +1,151 @@
+"""
+Unit tests for the scheduler module.
+"""
+import time
+import zipfile
+import threading
+import pytest
+from concurrent.futures import CancelledError
+from src.logic.scheduler import (
+    BACKGROUND, DOCUMENT, RECENT, REQUESTED,
+    PriorityScheduler, RecentCrates, entity_ids, may_hold, referenced_crates,
+)
+
+
+@pytest.fixture
+def gated():
+    """A scheduler with one worker, held on its first key until `release` is set."""
+    started, release = threading.Event(), threading.Event()
+    order = []
+
+    def process(key):
+        if key == "first":
+            started.set()
+            release.wait(10)
+        order.append(key)
+        return key.upper()
+
+    scheduler = PriorityScheduler(process, workers=1)
+    scheduler.submit("first")
+    started.wait(10)
+    return scheduler, release, order
+
+
+def test_runs_most_urgent_first(gated):
+    scheduler, release, order = gated
+    scheduler.submit("background1", BACKGROUND)
+    scheduler.submit("recent", RECENT)
+    scheduler.submit("background2", BACKGROUND)
+    scheduler.submit("document", DOCUMENT)
+    release.set()
+
+    assert scheduler.join(timeout=10)
+    assert order == ["first", "document", "recent", "background1", "background2"]
+    assert scheduler.wait("recent") == "RECENT"
+
+
+def test_promote(gated):
+    scheduler, release, order = gated
+    for key in ("a", "b", "c"):
+        scheduler.submit(key, BACKGROUND)
+    assert scheduler.promote(["c", "unknown"], REQUESTED) == ["c"]
+    assert scheduler.pending() == ["first", "c", "a", "b"]
+    scheduler.submit("c", BACKGROUND)  # never demoted
+    release.set()
+
+    assert scheduler.join(timeout=10)
+    assert order == ["first", "c", "a", "b"]
+    assert scheduler.pending() == []
+
+
+def test_wait_for_one_key(gated):
+    scheduler, release, order = gated
+    scheduler.submit("other", BACKGROUND)
+    with pytest.raises(TimeoutError):
+        scheduler.wait("other", timeout=0.05)
+    release.set()
+    assert scheduler.wait("other", timeout=10) == "OTHER"
+    with pytest.raises(KeyError):
+        scheduler.wait("unknown")
+
+
+def test_errors_are_kept():
+    done = []
+
+    def process(key):
+        raise ValueError(key)
+
+    scheduler = PriorityScheduler(process, on_done=lambda key, result, error: done.append((key, type(error))))
+    scheduler.submit("broken")
+    with pytest.raises(ValueError):
+        scheduler.wait("broken", timeout=10)
+    assert done == [("broken", ValueError)]
+
+
+def test_cancel(gated):
+    scheduler, release, order = gated
+    scheduler.submit("queued")
+    scheduler.cancel()
+    release.set()
+    assert scheduler.join(timeout=10)
+    assert order == ["first"]
+    with pytest.raises(CancelledError):
+        scheduler.wait("queued")
+
+
+def test_workers_run_concurrently():
+    running, peak = [], []
+    lock = threading.Lock()
+
+    def process(key):
+        with lock:
+            running.append(key)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(key)
+
+    scheduler = PriorityScheduler(process, workers=3)
+    for i in range(6):
+        scheduler.submit(i)
+    assert scheduler.join(timeout=10)
+    assert max(peak) == 3
+
+
+def test_referenced_crates(tmp_path):
+    paths = [str(tmp_path / "crates/survey"), str(tmp_path / "crates/model.zip"), str(tmp_path / "other")]
+    text = "See the results in crates/survey, and `query crate=model.zip`."
+    assert referenced_crates(text, paths, str(tmp_path)) == paths[:2]
+
+
+def test_entity_ids():
+    assert entity_ids("data_file.csv") == { "data_file.csv", "data.csv" }
+    assert entity_ids("run_workflow.ga") == { "run_workflow.ga", "run.ga" }
+    assert entity_ids("notes_file.unknown") == { "notes_file.unknown", "notes" }
+
+
+def test_may_hold(tmp_path):
+    crate = tmp_path / "crate"
+    (crate / "results").mkdir(parents=True)
+    (crate / "results/data.csv").write_text("a\n")
+    assert may_hold(str(crate), "results/data_file.csv")
+    assert not may_hold(str(crate), "missing.csv")
+
+    archive = tmp_path / "crate.zip"
+    with zipfile.ZipFile(archive, "w") as f:
+        f.writestr("crate/data.csv", "a\n")
+    assert may_hold(str(archive), "data_file.csv")
+    assert not may_hold(str(archive), "missing.csv")
+
+
+def test_recent_crates(tmp_path, monkeypatch):
+    recent = RecentCrates(str(tmp_path))
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now - 10)
+    recent.touch("/crates/a")
+    monkeypatch.setattr(time, "time", lambda: now)
+    recent.touch("/crates/b")
+    recent.touch("/crates/a")  # within the touch interval, not recorded again
+
+    assert RecentCrates(str(tmp_path)).recent(["/crates/a", "/crates/b", "/crates/c"]) == ["/crates/b", "/crates/a"]
+    assert recent.recent(["/crates/a"], now=now + 30 * 24 * 60 * 60) == []
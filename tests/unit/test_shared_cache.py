@@ -0,0 +1,106 @@
+"""
+Unit tests for the shared cache module.
+"""
+import os
+import sys
+import stat
+import subprocess
+from pathlib import Path
+from src.logic.shared_cache import (
+    ARTIFACTS, VALIDATION, SharedCache, local_artifacts, portable_artifacts, rocrate_key,
+)
+
+SRC_DIR = Path(__file__).resolve().parents[2] / "src"
+
+# Writes, then reads back, the validation of 20 RO-Crates, half of them shared with the
+# other writer, printing the keys whose object could not be read.
+WRITER = """
+import sys
+from logic.shared_cache import SharedCache
+cache = SharedCache(sys.argv[1])
+offset = int(sys.argv[2])
+for i in range(offset, offset + 20):
+    cache.put_validation(f"/crates/crate{i}", "metadata", i % 2 == 0, [{ "message": "x" * 1000 }] * i)
+for i in range(offset, offset + 20):
+    if cache.get_validation(f"/crates/crate{i}", "metadata") is None:
+        print(i)
+"""
+
+
+def test_round_trip(tmp_path):
+    cache = SharedCache(tmp_path / "shared")
+    assert cache.get_validation("/crates/a", "metadata") is None
+    assert cache.put_validation("/crates/a", "metadata", False, [{ "message": "missing name" }])
+    assert not cache.put_validation("/crates/a", "metadata", True, [])  # already stored
+
+    shared = SharedCache(tmp_path / "shared")
+    assert shared.get_validation("/crates/a", "metadata") == { "valid": False, "issues": [{ "message": "missing name" }] }
+    assert shared.get_validation("/crates/a", "changed") is None
+    assert shared.get_validation("/crates/a", None) is None
+
+
+def test_objects_are_readable_by_everyone(tmp_path):
+    cache = SharedCache(tmp_path / "shared")
+    cache.put(VALIDATION, "ab" * 32, {})
+    mode = os.stat(cache._path(VALIDATION, "ab" * 32)).st_mode
+    assert mode & stat.S_IROTH and not mode & stat.S_IWUSR
+    assert os.stat(cache._path(VALIDATION, "ab" * 32).parent).st_mode & stat.S_IWGRP
+
+
+def test_mismatched_objects_are_ignored(tmp_path):
+    cache = SharedCache(tmp_path / "shared")
+    key = rocrate_key("/crates/a", "metadata")
+    cache.put(ARTIFACTS, key, { "artifacts": [], "provenance": None })
+    # An object stored under another key (e.g. copied by hand) is not served.
+    path = cache._path(VALIDATION, key)
+    path.parent.mkdir(parents=True)
+    path.write_bytes(cache._path(ARTIFACTS, key).read_bytes())
+    assert cache.get(VALIDATION, key) is None
+
+    corrupt = cache._path(VALIDATION, "cd" * 32)
+    corrupt.parent.mkdir(parents=True)
+    corrupt.write_text("{ truncated")
+    assert cache.get(VALIDATION, "cd" * 32) is None
+
+
+def test_artifacts_are_keyed_by_their_data(tmp_path):
+    cache = SharedCache(tmp_path / "shared")
+    artifacts = [{ "id": "data.csv", "fingerprint": "before", "size": 10 }]
+    assert cache.put_artifacts("/crates/a", "metadata", "data", str(tmp_path / "artifacts"), artifacts, None)
+    assert cache.get_artifacts("/crates/a", "metadata", "data", str(tmp_path / "artifacts"))["artifacts"] == artifacts
+    # The same metadata with changed files is not served the stale records.
+    assert cache.get_artifacts("/crates/a", "metadata", "changed", str(tmp_path / "artifacts")) is None
+    assert rocrate_key("/crates/a", "metadata", "data") != rocrate_key("/crates/a", "metadata")
+
+
+def test_portable_artifacts(tmp_path):
+    artifacts = [
+        { "id": "data.csv", "symbolic_link": str(tmp_path / "alice/artifacts/crate/data.csv") },
+        { "id": "notes.txt", "archive": { "path": str(tmp_path / "crates/crate.zip"), "member": "notes.txt" } },
+    ]
+    portable = portable_artifacts(artifacts, str(tmp_path / "crates/crate.zip"), str(tmp_path / "alice/artifacts"))
+    assert portable[0]["symbolic_link"] == os.path.join("crate", "data.csv")
+    assert artifacts[0]["symbolic_link"] == str(tmp_path / "alice/artifacts/crate/data.csv")
+
+    local = local_artifacts(portable, str(tmp_path / "crates/crate.zip"), str(tmp_path / "bob/artifacts"))
+    assert local[0]["symbolic_link"] == str(tmp_path / "bob/artifacts/crate/data.csv")
+    assert local[1]["archive"] == artifacts[1]["archive"]
+
+
+def test_concurrent_writers(tmp_path):
+    root = tmp_path / "shared"
+    env = dict(os.environ, PYTHONPATH=str(SRC_DIR))
+    writers = [
+        subprocess.Popen([sys.executable, "-c", WRITER, str(root), str(offset)], cwd=tmp_path, env=env,
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        for offset in (0, 10)
+    ]
+    for writer in writers:
+        out, err = writer.communicate(timeout=60)
+        assert writer.returncode == 0, err
+        assert out.split() == []
+
+    cache = SharedCache(root)
+    for i in range(30):
+        assert cache.get_validation(f"/crates/crate{i}", "metadata")["valid"] == (i % 2 == 0)
+    assert [path.name for path in root.rglob("*") if path.name.endswith(".tmp")] == []
@@ -0,0 +1,50 @@
+"""
+Regression tests for the plugin's startup: importing the entry point must be fast and free
+of side effects, as Stencila waits for it before its handshake with the plugin.
+"""
+import os
+import sys
+import subprocess
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[2] / "src"
+# Modules that are only loaded once a document needs the RO-Crates.
+DEFERRED_MODULES = ("rocrate", "logic.rocrate_manager", "logic.cache_manager", "stencila_types.shortcuts")
+# The plugin's own share of the import time (excluding the Stencila libraries), in ms. It is
+# about 50ms, the budget leaves room for slow machines while catching eager heavy imports.
+IMPORT_BUDGET_MS = 500
+
+
+def import_plugin(directory):
+    env = dict(os.environ, PYTHONPATH=str(SRC_DIR), XDG_CACHE_HOME=str(directory / "cache"))
+    code = "import sys, plugin_python_template.plugin; print('\\n'.join(sys.modules))"
+    return subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=directory, env=env,
+                          capture_output=True, text=True, check=True)
+
+
+def test_import_defers_heavy_modules(tmp_path):
+    modules = set(import_plugin(tmp_path).stdout.split())
+    assert "plugin_python_template.plugin" in modules
+    assert [module for module in DEFERRED_MODULES if module in modules] == []
+
+
+def test_import_has_no_side_effects(tmp_path):
+    import_plugin(tmp_path)
+    # Neither the cache directories nor the log file are created on import.
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_import_time_budget(tmp_path):
+    total = base = None
+    for line in import_plugin(tmp_path).stderr.splitlines():
+        if "|" not in line or not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0 and name.strip() == "plugin_python_template.plugin":
+            total = int(cumulative)
+        elif depth == 1 and name.strip().startswith("stencila_"):
+            # The Stencila libraries the plugin is built on, which every plugin imports.
+            base = (base or 0) + int(cumulative)
+    assert total is not None
+    assert (total - (base or 0)) / 1000 < IMPORT_BUDGET_MS
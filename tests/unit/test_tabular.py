@@ -0,0 +1,157 @@
+"""
+Unit tests for the tabular artifact loader.
+"""
+import io
+import math
+import pytest
+from src.logic.tabular import (
+    INTEGER, NUMBER, STRING, TableCache, load_table, tabular_delimiter,
+)
+from src.logic.fingerprint import file_fingerprint
+
+
+def write(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def test_tabular_delimiter():
+    assert tabular_delimiter("text/csv") == ","
+    assert tabular_delimiter(["text/plain", "text/tab-separated-values"]) == "\t"
+    assert tabular_delimiter("text/csv; charset=utf-8") == ","
+    assert tabular_delimiter([], "outputs/data.TSV") == "\t"
+    assert tabular_delimiter("text/plain", "outputs/data.txt") is None
+
+
+def test_load_table_infers_column_types(tmp_path):
+    path = write(tmp_path / "data.csv", "id,value,label\n1,2.5,a\n2,3,b\n3,-1e3,c\n")
+    table = load_table(path)
+
+    assert table.names == ["id", "value", "label"]
+    assert table.num_rows == 3
+    assert [column.type for column in table.columns] == [INTEGER, NUMBER, STRING]
+    assert table.column("value").to_list() == [2.5, 3.0, -1000.0]
+    assert (table.column("value").minimum, table.column("value").maximum) == (-1000.0, 3.0)
+    assert table.rows(1, 2) == [[2, 3.0, "b"]]
+
+
+def test_types_are_promoted_across_chunks(tmp_path):
+    lines = [f"{i},{i}" for i in range(10)] + ["1.5,x"]
+    path = write(tmp_path / "data.csv", "a,b\n" + "\n".join(lines) + "\n")
+    table = load_table(path, chunk_rows=4)
+
+    assert table.column("a").type == NUMBER
+    assert table.column("a").to_list()[-2:] == [9.0, 1.5]
+    assert table.column("b").type == STRING
+    assert table.column("b").to_list()[:2] == ["0", "1"]
+    assert table.column("b").to_list()[-1] == "x"
+
+
+def test_empty_values_are_nulls(tmp_path):
+    path = write(tmp_path / "data.tsv", "a\tb\n1\tx\n\t\n3\ty\n")
+    table = load_table(path, delimiter="\t")
+
+    assert table.column("a").type == NUMBER
+    assert table.column("a").to_list() == [1.0, None, 3.0]
+    assert table.column("a").nulls == 1
+    assert (table.column("a").minimum, table.column("a").maximum) == (1.0, 3.0)
+    assert table.column("b").to_list() == ["x", None, "y"]
+
+
+def test_ragged_rows_and_header_names(tmp_path):
+    path = write(tmp_path / "data.csv", "a,,a\n1,2\n\n4,5,6,7\n")
+    table = load_table(path)
+
+    assert table.names == ["a", "column_2", "a_3"]
+    assert table.rows() == [[1, 2, None], [4, 5, 6.0]]
+
+
+def test_load_table_from_binary_file_object():
+    table = load_table(io.BytesIO(b"x,y\n1,caf\xc3\xa9\n"))
+    assert table.rows() == [[1, "café"]]
+
+
+def test_empty_file(tmp_path):
+    table = load_table(write(tmp_path / "empty.csv", ""))
+    assert table.num_rows == 0
+    assert table.columns == []
+
+
+def test_numeric_columns_are_contiguous_buffers(tmp_path):
+    table = load_table(write(tmp_path / "data.csv", "a,b\n1,1.5\n2,2.5\n"))
+    assert memoryview(table.column("a").values).format == "q"
+    assert memoryview(table.column("b").values).format == "d"
+    assert table.column("a").nbytes == 16
+
+
+def test_to_numpy_shares_buffer(tmp_path):
+    numpy = pytest.importorskip("numpy")
+    table = load_table(write(tmp_path / "data.csv", "a\n1\n2\n"))
+    values = table.column("a").to_numpy()
+    assert values.dtype == numpy.int64
+    assert values.tolist() == [1, 2]
+
+
+def test_table_cache_reuses_tables(tmp_path):
+    path = write(tmp_path / "data.csv", "a\n1\n2\n")
+    cache = TableCache()
+    loads = []
+
+    def loader():
+        loads.append(path)
+        return load_table(path)
+
+    first = cache.get_or_load(file_fingerprint(path), loader)
+    second = cache.get_or_load(file_fingerprint(path), loader)
+    assert first is second
+    assert len(loads) == 1
+    assert cache.stats()["hits"] == 1
+
+    # A changed file has a new fingerprint, so it is parsed again.
+    write(tmp_path / "data.csv", "a\n1\n2\n3\n")
+    assert cache.get_or_load(file_fingerprint(path), loader).num_rows == 3
+    assert len(loads) == 2
+
+
+def test_table_cache_evicts_least_recently_used(tmp_path):
+    tables = {
+        key: load_table(io.StringIO("a\n" + "\n".join(map(str, range(100)))))
+        for key in ("one", "two", "three")
+    }
+    size = tables["one"].nbytes
+    cache = TableCache(budget=2 * size)
+
+    cache.put("one", tables["one"])
+    cache.put("two", tables["two"])
+    cache.get("one")
+    cache.put("three", tables["three"])
+
+    assert "one" in cache and "three" in cache and "two" not in cache
+    assert cache.nbytes == 2 * size
+    assert cache.evictions == 1
+
+
+def test_table_cache_skips_tables_over_budget():
+    table = load_table(io.StringIO("a\n1\n2\n"))
+    cache = TableCache(budget=1)
+    cache.put("big", table)
+    assert len(cache) == 0
+
+
+def test_number_column_nan_is_not_a_range_bound():
+    table = load_table(io.StringIO("a\n1.5\n\n2.5\n"))
+    column = table.column("a")
+    assert not math.isnan(column.minimum) and column.maximum == 2.5
+
+
+def test_max_rows_keeps_the_first_rows_with_whole_file_statistics():
+    lines = [f"{i},{i}" for i in range(10)] + ["-5,x", "", "7,"]
+    table = load_table(io.StringIO("a,b\n" + "\n".join(lines) + "\n"), chunk_rows=4, max_rows=3)
+
+    assert (table.num_rows, table.kept_rows) == (12, 3)
+    assert table.rows() == [[0, "0"], [1, "1"], [2, "2"]]
+    a, b = table.columns
+    assert (a.type, a.minimum, a.maximum) == (INTEGER, -5, 9)
+    assert (b.type, b.nulls) == (STRING, 1)
+    assert table.describe()["kept_rows"] == 3
+    assert load_table(io.StringIO("a\n1\n2\n"), max_rows=0).num_rows == 2
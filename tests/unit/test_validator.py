@@ -1,9 +1,29 @@
+import io
 import pytest
 import os
+import sys
+import time
 import tempfile
+import threading
+import subprocess
 from unittest.mock import patch, MagicMock
 from pathlib import Path
-from src.logic.validator import Validator, ValidatorCommand
+from src.logic.validator import (
+    QUARANTINE_AFTER, ROCRATE_VALIDATOR_DIR, ValidationCancelled, Validator, ValidatorCommand, check_structure,
+    check_structure_stream, run_process,
+)
+from src.logic import validator as validator_module
+
+CRATES_DIR = Path(__file__).parents[1] / "crates"
+
+# The smallest metadata that passes the structural check.
+MINIMAL_METADATA = """{
+  "@context": "https://w3id.org/ro/crate/1.1/context",
+  "@graph": [
+    {"@id": "ro-crate-metadata.json", "@type": "CreativeWork", "about": {"@id": "./"}},
+    {"@id": "./", "@type": "Dataset"}
+  ]
+}"""
 
 
 def test_setup_non_existent_rocrate_validator_directory():
@@ -27,9 +47,9 @@ def test_valid_rocrate(validator):
     with tempfile.TemporaryDirectory() as temp_dir:
         ro_crate_path = os.path.join(temp_dir, "ro-crate-metadata.json")
         with open(ro_crate_path, 'w') as f:
-            f.write("{}")
+            f.write(MINIMAL_METADATA)
 
-        with patch('subprocess.run', return_value=MagicMock(returncode=0)):
+        with patch('src.logic.validator.run_process', return_value=MagicMock(returncode=0)):
             validator.validate_rocrate(temp_dir)
 
         assert validator.valid_rocrates == [temp_dir]
@@ -40,9 +60,9 @@ def test_invalid_rocrate(validator):
     with tempfile.TemporaryDirectory() as temp_dir:
         ro_crate_path = os.path.join(temp_dir, "ro-crate-metadata.json")
         with open(ro_crate_path, 'w') as f:
-            f.write("{}")
+            f.write(MINIMAL_METADATA)
 
-        with patch('subprocess.run', return_value=MagicMock(returncode=1)):
+        with patch('src.logic.validator.run_process', return_value=MagicMock(returncode=1)):
             validator.validate_rocrate(temp_dir)
 
         assert validator.valid_rocrates == []
@@ -84,17 +104,17 @@ def test_valid_rocrates(validator):
         
         ro_crate_path = os.path.join(temp_dir, "one/ro-crate-metadata.json")
         with open(ro_crate_path, 'w') as f:
-            f.write("{}")
+            f.write(MINIMAL_METADATA)
             
         ro_crate_path = os.path.join(temp_dir, "two/ro-crate-metadata.json")
         with open(ro_crate_path, 'w') as f:
-            f.write("{}")
+            f.write(MINIMAL_METADATA)
             
         ro_crate_path = os.path.join(temp_dir, "three/ro-crate-metadata.json")
         with open(ro_crate_path, 'w') as f:
-            f.write("{}")
+            f.write(MINIMAL_METADATA)
 
-        with patch('subprocess.run', return_value=MagicMock(returncode=0)):
+        with patch('src.logic.validator.run_process', return_value=MagicMock(returncode=0)):
             validator.validate_rocrate(os.path.join(temp_dir, "one"))
             validator.validate_rocrate(os.path.join(temp_dir, "two"))
             validator.validate_rocrate(os.path.join(temp_dir, "three"))
@@ -110,9 +130,9 @@ def test_valid_rocrate_multiple_directories(validator):
         
         ro_crate_path = os.path.join(temp_dir, "one/ro-crate-metadata.json")
         with open(ro_crate_path, 'w') as f:
-            f.write("{}")
+            f.write(MINIMAL_METADATA)
 
-        with patch('subprocess.run', return_value=MagicMock(returncode=0)):
+        with patch('src.logic.validator.run_process', return_value=MagicMock(returncode=0)):
             validator.validate_rocrate(os.path.join(temp_dir, "one"))
         
         assert validator.valid_rocrates == [os.path.join(temp_dir, "one")]
@@ -121,24 +141,256 @@ def test_valid_rocrate_multiple_directories(validator):
 def test_get_help(validator):
     with patch('subprocess.run') as mock_run:
         validator.get_help()
-        mock_run.assert_called_once_with(ValidatorCommand.HELP.value, check=True, stdout=-1, stderr=-1)
+        mock_run.assert_called_once_with(ValidatorCommand.HELP.value, check=True, cwd=ROCRATE_VALIDATOR_DIR, stdout=-1, stderr=-1)
 
 
 def test_validate_invalid_rocrate(validator):
-    with patch('subprocess.run') as mock_run:
+    with patch('src.logic.validator.run_process') as mock_run:
         with tempfile.TemporaryDirectory() as temp_dir:
             validator.validate_rocrate(temp_dir)
-            mock_run.assert_called_once_with(ValidatorCommand.VALIDATE.value + [temp_dir], stdout=-1, stderr=-1)
+            # There is no metadata, so the validator is never run.
+            mock_run.assert_not_called()
+            assert validator.invalid_rocrates == [temp_dir]
 
 
 def test_validate_valid_rocrate(validator):
-    with patch('subprocess.run') as mock_run:
+    with patch('src.logic.validator.run_process') as mock_run:
         mock_run.return_value = MagicMock(returncode=0)
         with tempfile.TemporaryDirectory() as temp_dir:
             ro_crate_path = os.path.join(temp_dir, "ro-crate-metadata.json")
             with open(ro_crate_path, 'w') as f:
-                f.write("{}")
+                f.write(MINIMAL_METADATA)
             
             validator.validate_rocrate(ro_crate_path)
 
-            mock_run.assert_called_once_with(ValidatorCommand.VALIDATE.value + [os.path.join(temp_dir, "ro-crate-metadata.json")], stdout=-1, stderr=-1)
+            mock_run.assert_called_once_with(ValidatorCommand.VALIDATE.value + ValidatorCommand.JSON_OUTPUT.value + [os.path.join(temp_dir, "ro-crate-metadata.json")],
+                timeout=validator.timeout, memory_limit=validator.memory_limit, cancel=None, cwd=ROCRATE_VALIDATOR_DIR)
+
+
+def test_validations_are_timed_by_result(validator, tmp_path):
+    (tmp_path / "ro-crate-metadata.json").write_text(MINIMAL_METADATA)
+    seconds = validator_module.VALIDATION_SECONDS
+    valid, malformed = seconds.count(result="valid"), seconds.count(result="malformed")
+
+    with patch('src.logic.validator.run_process', return_value=MagicMock(returncode=0, stdout=b"", stderr=b"")):
+        validator.validate_rocrate(str(tmp_path))
+    validator.validate_rocrate(str(CRATES_DIR / "invalid/ro-crate-invalid"))
+
+    assert seconds.count(result="valid") == valid + 1
+    assert seconds.count(result="malformed") == malformed + 1
+
+
+def test_invalid_test_crate_is_rejected_without_the_validator(validator):
+    path = str(CRATES_DIR / "invalid/ro-crate-invalid")
+    with patch('src.logic.validator.run_process') as mock_run:
+        validator.validate_rocrate(path)
+        mock_run.assert_not_called()
+    assert validator.invalid_rocrates == [path]
+    assert "metadata descriptor" in validator.problems[path][0]
+
+
+def test_valid_test_crates_pass_the_precheck(validator):
+    for path in (CRATES_DIR / "valid").iterdir():
+        assert validator.precheck(str(path)) == [], path
+
+
+@pytest.mark.parametrize("metadata, problem", [
+    ("{", "not valid JSON"),
+    ("[]", "JSON object"),
+    ('{"@context": "x"}', "no @graph"),
+    ('{"@graph": []}', "no @context"),
+    ('{"@context": "x", "@graph": [{"@id": "./", "@type": "Dataset"}]}', "no metadata descriptor"),
+    ('{"@context": "x", "@graph": [{"@id": "ro-crate-metadata.json"}]}', "not about a root"),
+    ('{"@context": "x", "@graph": [{"@id": "ro-crate-metadata.json", "about": {"@id": "./"}}]}', "not in the @graph"),
+    ('{"@context": "x", "@graph": [{"@id": "ro-crate-metadata.json", "about": {"@id": "./"}},'
+     ' {"@id": "./", "@type": "File"}]}', "not a Dataset"),
+])
+def test_check_structure_problems(metadata, problem):
+    problems = check_structure(metadata)
+    assert any(problem in found for found in problems), problems
+
+
+def test_check_structure_accepts_minimal_metadata():
+    assert check_structure(MINIMAL_METADATA) == []
+
+
+def test_precheck_reads_zipped_crates(validator, tmp_path):
+    import zipfile
+    with zipfile.ZipFile(tmp_path / "crate.zip", "w") as archive:
+        archive.writestr("crate/ro-crate-metadata.json", MINIMAL_METADATA)
+    assert validator.precheck(str(tmp_path / "crate.zip")) == []
+
+
+def test_validation_issues_are_recorded(validator, tmp_path):
+    (tmp_path / "ro-crate-metadata.json").write_text(MINIMAL_METADATA)
+    report = b'{"issues": [{"severity": "REQUIRED", "message": "Missing name", "violatingEntity": "./",' \
+             b' "check": {"identifier": "ro-crate-1.1_5.2", "profile": {"identifier": "ro-crate-1.1"}}}]}'
+
+    with patch('src.logic.validator.run_process', return_value=MagicMock(returncode=1, stdout=report, stderr=b"")):
+        validator.validate_rocrate(str(tmp_path))
+
+    assert validator.invalid_rocrates == [str(tmp_path)]
+    issue = validator.issues[str(tmp_path)][0]
+    assert (issue["check"], issue["focus_node"], issue["message"]) == ("ro-crate-1.1_5.2", "./", "Missing name")
+
+
+def test_structure_problems_are_recorded_as_issues(validator):
+    path = str(CRATES_DIR / "invalid/ro-crate-invalid")
+    validator.validate_rocrate(path)
+    assert validator.issues[path][0]["profile"] == "ro-crate-structure"
+
+
+def test_falls_back_to_text_report(validator, tmp_path):
+    (tmp_path / "ro-crate-metadata.json").write_text(MINIMAL_METADATA)
+    results = [
+        MagicMock(returncode=2, stdout=b"", stderr=b"Error: No such option: --output-format"),
+        MagicMock(returncode=0, stdout=b"RO-Crate is valid!", stderr=b""),
+        MagicMock(returncode=0, stdout=b"RO-Crate is valid!", stderr=b""),
+    ]
+    with patch('src.logic.validator.run_process', side_effect=results) as mock_run:
+        validator.validate_rocrate(str(tmp_path))
+        validator.validate_rocrate(str(tmp_path))
+
+    assert mock_run.call_args_list[1].args[0] == ValidatorCommand.VALIDATE.value + [str(tmp_path)]
+    assert mock_run.call_count == 3  # the JSON option is only tried once
+    assert validator.valid_rocrates == [str(tmp_path), str(tmp_path)]
+    assert validator.issues[str(tmp_path)] == []
+
+
+def test_deferred_setup(tmp_path):
+    (tmp_path / "ro-crate-metadata.json").write_text(MINIMAL_METADATA)
+    with patch.object(Validator, "setup", return_value=None) as setup:
+        validator = Validator(setup=False)
+        validator.record("cached", True, [])
+        validator.validate_rocrate(str(CRATES_DIR / "invalid/ro-crate-invalid"))  # rejected by the precheck
+        assert setup.call_count == 0
+
+        with patch('src.logic.validator.run_process', return_value=MagicMock(returncode=0, stdout=b"", stderr=b"")):
+            validator.validate_rocrate(str(tmp_path))
+            validator.validate_rocrate(str(tmp_path))
+        assert setup.call_count == 1
+
+
+def test_setup_keeps_the_working_directory(tmp_path):
+    cwd = os.getcwd()
+    with patch('os.path.isdir', return_value=True), patch('subprocess.run') as mock_run:
+        Validator()
+    assert os.getcwd() == cwd
+    assert mock_run.call_args.kwargs["cwd"] == ROCRATE_VALIDATOR_DIR
+
+
+def test_concurrent_validations(validator, tmp_path):
+    # Worker threads validate RO-Crates at once, none of their results may be lost.
+    paths = []
+    for i in range(40):
+        (tmp_path / str(i)).mkdir()
+        (tmp_path / str(i) / "ro-crate-metadata.json").write_text(MINIMAL_METADATA)
+        paths.append(str(tmp_path / str(i)))
+
+    def run(command, **kwargs):
+        time.sleep(0.001)
+        return MagicMock(returncode=int(Path(command[-1]).name) % 2, stdout=b"", stderr=b"")
+
+    with patch('src.logic.validator.run_process', side_effect=run):
+        threads = [threading.Thread(target=lambda part=paths[i::4]: [validator.validate_rocrate(path) for path in part])
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert sorted(validator.valid_rocrates) == sorted(path for path in paths if int(Path(path).name) % 2 == 0)
+    assert len(validator.invalid_rocrates) == 20 and len(validator.issues) == 40
+
+
+def test_record(validator):
+    validator.record("crate", False, [{"message": "cached"}])
+    assert validator.invalid_rocrates == ["crate"]
+    assert validator.issues["crate"] == [{"message": "cached"}]
+
+
+def test_run_process():
+    result = run_process([sys.executable, "-c", "print('out')"], timeout=30)
+    assert result.returncode == 0
+    assert result.stdout.strip() == b"out"
+
+
+def test_run_process_timeout():
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        run_process([sys.executable, "-c", "import time; time.sleep(30)"], timeout=0.5)
+    assert time.monotonic() - start < 10
+
+
+def test_run_process_cancel():
+    cancel = threading.Event()
+    threading.Timer(0.3, cancel.set).start()
+    start = time.monotonic()
+    with pytest.raises(ValidationCancelled):
+        run_process([sys.executable, "-c", "import time; time.sleep(30)"], timeout=60, cancel=cancel)
+    assert time.monotonic() - start < 10
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="memory limits are only set on POSIX")
+def test_run_process_memory_limit():
+    allocate = [sys.executable, "-c", "bytearray(1024 * 1024 * 1024)"]
+    assert run_process(allocate, timeout=30, memory_limit=256 * 1024 * 1024).returncode != 0
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="memory limits are only set on POSIX")
+def test_run_process_memory_limit_from_threads():
+    # The limit is set without a `preexec_fn`, so validations can run from worker threads.
+    allocate = [sys.executable, "-c", "import sys; bytearray(int(sys.argv[1]))"]
+    results = {}
+
+    def run(size):
+        results[size] = run_process(allocate + [str(size)], timeout=30, memory_limit=256 * 1024 * 1024).returncode
+
+    threads = [threading.Thread(target=run, args=(size,)) for size in (1024, 1024 ** 3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results[1024] == 0 and results[1024 ** 3] != 0
+
+
+def test_timeouts_quarantine_the_rocrate(validator, tmp_path):
+    (tmp_path / "ro-crate-metadata.json").write_text(MINIMAL_METADATA)
+    path = str(tmp_path)
+    timeout = subprocess.TimeoutExpired(["rocrate-validator"], validator.timeout)
+    with patch('src.logic.validator.run_process', side_effect=timeout) as mock_run:
+        for _ in range(QUARANTINE_AFTER + 2):
+            validator.validate_rocrate(path)
+
+    assert mock_run.call_count == QUARANTINE_AFTER  # the circuit is open after that
+    assert validator.is_quarantined(path)
+    assert validator.invalid_rocrates == [path] * (QUARANTINE_AFTER + 2)
+    assert "quarantined" in validator.issues[path][0]["message"]
+
+
+def test_completed_validation_resets_the_timeouts(validator, tmp_path):
+    (tmp_path / "ro-crate-metadata.json").write_text(MINIMAL_METADATA)
+    validator.timeouts[str(tmp_path)] = QUARANTINE_AFTER - 1
+    with patch('src.logic.validator.run_process', return_value=MagicMock(returncode=0, stdout=b"", stderr=b"")):
+        validator.validate_rocrate(str(tmp_path))
+    assert str(tmp_path) not in validator.timeouts
+    assert validator.valid_rocrates == [str(tmp_path)]
+
+
+@pytest.mark.parametrize("metadata", [
+    MINIMAL_METADATA,
+    '{"@graph": []}',
+    '{"@context": {}, "@graph": [{"@id": "ro-crate-metadata.json", "about": {"@id": "./"}}]}',
+    '{"@context": {}, "@graph": [{"@id": "ro-crate-metadata.json", "about": {"@id": "./"}}, {"@id": "./", "@type": "File"}]}',
+    '{"@context": {}, "@graph": [{"@id": "./", "@type": "Dataset"}]}',
+    '{"@context": {}}',
+])
+def test_streamed_check_matches_check_structure(metadata):
+    assert check_structure_stream(io.BytesIO(metadata.encode())) == check_structure(metadata)
+
+
+def test_precheck_streams_large_metadata(validator, tmp_path, monkeypatch):
+    (tmp_path / "ro-crate-metadata.json").write_text(MINIMAL_METADATA)
+    monkeypatch.setattr(validator_module, "STREAM_THRESHOLD", 10)
+    with patch.object(validator_module, "check_structure", side_effect=AssertionError("not streamed")):
+        assert validator.precheck(str(tmp_path)) == []
@@ -0,0 +1,165 @@
+"""
+Unit tests for the workflow index module.
+"""
+import io
+import json
+import pytest
+from pathlib import Path
+from src.logic import workflow_index
+from src.logic.workflow_index import WorkflowIndex, is_workflow, parse_workflow, summarise_workflow
+
+GALAXY_WORKFLOW = Path(__file__).parents[1] / "crates/valid/workflow-run-crate/Galaxy-Workflow-Hello_World.ga"
+
+CWL_WORKFLOW = {
+    "cwlVersion": "v1.2",
+    "$graph": [
+        {
+            "class": "CommandLineTool",
+            "id": "#sort.cwl",
+            "inputs": [{ "id": "#sort.cwl/lines", "type": "File" }],
+            "outputs": [{ "id": "#sort.cwl/sorted", "type": "File" }],
+        },
+        {
+            "class": "Workflow",
+            "id": "#main",
+            "label": "Sort and count",
+            "inputs": [
+                { "id": "#main/lines", "type": "File", "doc": "The lines to sort." },
+                { "id": "#main/reverse", "type": ["null", "boolean"] },
+            ],
+            "outputs": [{ "id": "#main/counts", "type": "File", "outputSource": "#main/count/counts" }],
+            "steps": [
+                {
+                    "id": "#main/sort",
+                    "run": "#sort.cwl",
+                    "in": [{ "id": "#main/sort/lines", "source": "#main/lines" }],
+                    "out": ["#main/sort/sorted"],
+                },
+                {
+                    "id": "#main/count",
+                    "run": "#count.cwl",
+                    "in": [
+                        { "id": "#main/count/input", "source": "#main/sort/sorted" },
+                        { "id": "#main/count/unique", "default": True },
+                    ],
+                    "out": [{ "id": "#main/count/counts" }],
+                },
+            ],
+        },
+    ],
+}
+
+CWL_YAML = """#!/usr/bin/env cwl-runner
+cwlVersion: v1.2
+class: Workflow
+inputs:
+  message: string
+  count:
+    type: int
+    default: 2
+outputs:
+  echoed:
+    type: File
+    outputSource: echo/output
+steps:
+  echo:
+    run: echo.cwl
+    in:
+      text: message
+      times: count
+    out: [output]
+"""
+
+
+def test_parse_galaxy():
+    graph = parse_workflow(GALAXY_WORKFLOW.read_bytes(), GALAXY_WORKFLOW.name)
+
+    assert graph["format"] == "galaxy"
+    assert graph["name"] == "Hello World"
+    assert graph["inputs"] == [{
+        "id": "simple_input", "type": "data", "description": "A simple set of lines in a text file", "optional": False,
+    }]
+    assert [step["label"] for step in graph["steps"]] == ["Reverse dataset", "Select last lines"]
+    reverse, select = graph["steps"]
+    assert reverse["tool"] == "toolshed.g2.bx.psu.edu/repos/bgruening/text_processing/tp_tac/1.1.0"
+    assert reverse["inputs"] == [{ "name": "infile", "source": "simple_input" }]
+    assert reverse["parameters"]["infile"] == "<runtime>"
+    assert select["inputs"] == [{ "name": "input", "source": "1/outfile" }]
+    assert select["parameters"]["lineNum"] == "2"
+    assert graph["outputs"] == [
+        { "id": "reversed", "source": "1/outfile" },
+        { "id": "last_lines", "source": "2/out_file1" },
+    ]
+    assert summarise_workflow(graph) == { "format": "galaxy", "inputs": 1, "steps": 2, "outputs": 2 }
+
+
+def test_parse_packed_cwl():
+    graph = parse_workflow(json.dumps(CWL_WORKFLOW).encode(), "workflow.cwl")
+
+    assert graph["format"] == "cwl"
+    assert graph["name"] == "Sort and count"
+    assert graph["inputs"] == [
+        { "id": "lines", "type": "File", "description": "The lines to sort.", "optional": False },
+        { "id": "reverse", "type": "boolean?", "description": None, "optional": True },
+    ]
+    sort, count = graph["steps"]
+    assert sort["tool"] == "sort.cwl"
+    assert sort["inputs"] == [{ "name": "lines", "source": "lines" }]
+    assert sort["outputs"] == ["sorted"]
+    assert count["inputs"] == [{ "name": "input", "source": "sort/sorted" }]
+    assert count["outputs"] == ["counts"]
+    assert count["parameters"] == { "unique": True }
+    assert graph["outputs"] == [{ "id": "counts", "type": "File", "source": "count/counts" }]
+
+
+def test_parse_cwl_yaml():
+    pytest.importorskip("yaml")
+    graph = parse_workflow(CWL_YAML.encode(), "echo.cwl")
+
+    assert [(item["id"], item["type"], item["optional"]) for item in graph["inputs"]] == [
+        ("message", "string", False), ("count", "int", True),
+    ]
+    assert graph["steps"][0]["inputs"] == [
+        { "name": "text", "source": "message" }, { "name": "times", "source": "count" },
+    ]
+    assert graph["outputs"][0]["source"] == "echo/output"
+
+
+def test_cwl_yaml_needs_pyyaml(monkeypatch):
+    monkeypatch.setattr(workflow_index, "yaml", None)
+    with pytest.raises(ImportError):
+        parse_workflow(CWL_YAML.encode(), "echo.cwl")
+
+
+def test_unsupported_workflow():
+    with pytest.raises(ValueError):
+        parse_workflow(b'{"nextflow": true}', "main.nf.json")
+
+
+def test_is_workflow():
+    assert is_workflow(["File", "SoftwareSourceCode", "ComputationalWorkflow"])
+    assert not is_workflow("File")
+
+
+def test_index_parses_once(tmp_path):
+    index = WorkflowIndex(tmp_path / "workflows")
+    data = GALAXY_WORKFLOW.read_bytes()
+    opened = []
+
+    def opener():
+        opened.append(1)
+        return io.BytesIO(data)
+
+    first = index.index("ab" * 32, len(data), opener, GALAXY_WORKFLOW.name)
+    second = WorkflowIndex(tmp_path / "workflows").index("ab" * 32, len(data), opener, GALAXY_WORKFLOW.name)
+    assert len(opened) == 1
+    assert second == first
+    assert first["fingerprint"] == "ab" * 32
+
+
+def test_index_stores_errors(tmp_path):
+    index = WorkflowIndex(tmp_path / "workflows")
+    graph = index.index("cd" * 32, 3, lambda: io.BytesIO(b"???"), "broken.ga")
+    assert graph["format"] is None
+    assert graph["error"]
+    assert index.get("cd" * 32) == graph
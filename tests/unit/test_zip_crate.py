@@ -0,0 +1,106 @@
+"""
+Unit tests for the zipped RO-Crate module.
+"""
+import pytest
+import os
+import zipfile
+from pathlib import Path
+from src.logic.zip_crate import ZipCrate, is_zipped_crate
+from src.logic.scanner import scanner
+
+CRATE_DIR = Path(__file__).parents[1] / "crates/valid/workflow-run-crate"
+INPUT = b"".join(f"line {i}\n".encode() for i in range(1000))
+
+
+def make_zip(path, compression=zipfile.ZIP_DEFLATED, prefix=""):
+    with zipfile.ZipFile(path, "w", compression=compression) as archive:
+        for file in CRATE_DIR.rglob("*"):
+            if file.is_file():
+                archive.write(file, prefix + file.relative_to(CRATE_DIR).as_posix())
+        # The crate's payload is not checked in, so stand in for its input file.
+        archive.writestr(prefix + "inputs/abcdef.txt", INPUT)
+    return str(path)
+
+
+@pytest.fixture(params=[zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def zipped_crate(request, tmp_path):
+    return make_zip(tmp_path / "crate.zip", compression=request.param)
+
+
+def test_is_zipped_crate(zipped_crate, tmp_path):
+    assert is_zipped_crate(zipped_crate)
+
+    with zipfile.ZipFile(tmp_path / "other.zip", "w") as archive:
+        archive.writestr("readme.txt", "not a crate")
+    assert not is_zipped_crate(tmp_path / "other.zip")
+
+    (tmp_path / "broken.zip").write_text("not a zip")
+    assert not is_zipped_crate(tmp_path / "broken.zip")
+
+
+def test_data_entities(zipped_crate):
+    with ZipCrate(zipped_crate) as crate:
+        ids = [entity.id for entity in crate.data_entities]
+        assert ids == [
+            "Galaxy-Workflow-Hello_World.ga",
+            "inputs/abcdef.txt",
+            "outputs/Select_first_on_data_1_2.txt",
+            "outputs/tac_on_data_360_1.txt",
+        ]
+        assert crate.data_entities[1].get("encodingFormat") == "text/plain"
+
+
+def test_read_whole_member(zipped_crate):
+    with ZipCrate(zipped_crate) as crate:
+        assert bytes(crate.read("inputs/abcdef.txt")) == INPUT
+        assert crate.size("inputs/abcdef.txt") == len(INPUT)
+
+
+def test_read_byte_range(zipped_crate):
+    with ZipCrate(zipped_crate) as crate:
+        assert bytes(crate.read("inputs/abcdef.txt", 100, 50)) == INPUT[100:150]
+        assert bytes(crate.read("inputs/abcdef.txt", len(INPUT) - 10)) == INPUT[-10:]
+        assert bytes(crate.read("inputs/abcdef.txt", len(INPUT) + 10)) == b""
+
+
+def test_members_of_directory(tmp_path):
+    with ZipCrate(make_zip(tmp_path / "crate.zip", prefix="crate/")) as crate:
+        assert [info.filename for info in crate.members("inputs/")] == ["crate/inputs/abcdef.txt"]
+        assert crate.members("./inputs") == crate.members("inputs/")
+        assert crate.members("missing/") == []
+
+
+def test_stored_members_are_memory_mapped(tmp_path):
+    path = make_zip(tmp_path / "stored.zip", compression=zipfile.ZIP_STORED)
+    with ZipCrate(path) as crate:
+        data = crate.read("inputs/abcdef.txt")
+        assert isinstance(data, memoryview)
+        data.release()
+
+
+def test_crate_in_top_level_directory(tmp_path):
+    path = make_zip(tmp_path / "nested.zip", prefix="workflow-run-crate/")
+    with ZipCrate(path) as crate:
+        assert crate.member_name("inputs/abcdef.txt") == "workflow-run-crate/inputs/abcdef.txt"
+        assert bytes(crate.read("./inputs/abcdef.txt")) == INPUT
+
+
+def test_open_streams_member(zipped_crate):
+    with ZipCrate(zipped_crate) as crate, crate.open("inputs/abcdef.txt") as f:
+        assert f.read() == INPUT
+
+
+def test_missing_metadata_raises(tmp_path):
+    with zipfile.ZipFile(tmp_path / "other.zip", "w") as archive:
+        archive.writestr("readme.txt", "not a crate")
+    with pytest.raises(FileNotFoundError):
+        ZipCrate(tmp_path / "other.zip")
+
+
+def test_scanner_detects_zipped_crates(tmp_path):
+    os.makedirs(tmp_path / "one")
+    (tmp_path / "one/ro-crate-metadata.json").write_text("{}")
+    zipped = make_zip(tmp_path / "two.zip")
+
+    assert scanner(str(tmp_path)) == [str(tmp_path / "one")]
+    assert sorted(scanner(str(tmp_path), include_zipped=True)) == sorted([str(tmp_path / "one"), zipped])